@@ -0,0 +1,41 @@
+import uuid
+
+from django.db import models
+from users.models import User
+from products.models import Product
+
+class Cart(models.Model):
+    """
+    A shopping cart. Signed-in customers have one each; anonymous carts are
+    found by ``token`` (sent as the X-Cart-Token header) and are merged into
+    the customer's cart on login.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='cart')
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Cart of {self.user_id}" if self.user_id else f"Anonymous cart {self.token}"
+    
+    @property
+    def cache_key(self):
+        return cart_cache_key(user_id=self.user_id, token=self.token)
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cart_items')
+    quantity = models.PositiveIntegerField()
+    added_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['added_at', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} in cart {self.cart_id}"
+
+def cart_cache_key(user_id=None, token=None):
+    return f'cart:user:{user_id}' if user_id else f'cart:anon:{token}'
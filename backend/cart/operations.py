@@ -0,0 +1,194 @@
+"""
+Server-side carts. A read prices the whole cart with one query joined to
+the products and is cached per owner until the cart or one of its products
+changes; writes apply a batch of lines in one transaction.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from ecommerce.db import upsert_options
+from orders.pricing import price_cart
+from orders.stock import UnknownProducts
+from products.cache import generations, get_cache
+from products.models import Product, ProductImage
+from .models import Cart, CartItem, cart_cache_key
+
+MAX_QUANTITY = 99
+CART_TOKEN_HEADER = 'X-Cart-Token'
+
+
+def request_cart_token(request):
+    """The anonymous cart token sent with ``request``, or None when it is missing or malformed."""
+    value = request.headers.get(CART_TOKEN_HEADER)
+    if not value and isinstance(request.data, dict):
+        value = request.data.get('cart_token')
+    try:
+        return uuid.UUID(str(value)) if value else None
+    except ValueError:
+        return None
+
+
+def owner(user):
+    return user if user is not None and user.is_authenticated else None
+
+
+def find_cart(user=None, token=None):
+    """The signed-in user's cart, otherwise the anonymous cart for ``token``; None when there is none."""
+    if owner(user) is not None:
+        return Cart.objects.filter(user=user).first()
+    if token is not None:
+        return Cart.objects.filter(token=token, user__isnull=True).first()
+    return None
+
+
+def get_or_create_cart(user=None, token=None):
+    if owner(user) is not None:
+        return Cart.objects.get_or_create(user=user)[0]
+    # An unknown token gets a fresh cart with a new token
+    return find_cart(token=token) or Cart.objects.create()
+
+
+def forget(*keys):
+    transaction.on_commit(lambda: get_cache().delete_many(keys))
+
+
+def update_items(cart, quantities, replace=False, strict=True):
+    """
+    Apply ``{product_id: quantity}`` to ``cart`` in one transaction: the
+    quantities are added to what the cart holds or, with ``replace``, become
+    the new quantities, 0 removing the line. Lines are capped at
+    MAX_QUANTITY. Unknown or inactive products raise UnknownProducts, or are
+    skipped when ``strict`` is off; removing them always works.
+    """
+    with transaction.atomic():
+        # Touching the cart row locks it, so concurrent batches for one cart apply in turn
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+        adding = [pk for pk, quantity in quantities.items() if quantity > 0]
+        known = set(Product.objects.filter(pk__in=adding, is_active=True).values_list('pk', flat=True))
+        missing = set(adding) - known
+        if missing and strict:
+            raise UnknownProducts(missing)
+
+        current = {}
+        if not replace:
+            current = dict(CartItem.objects.filter(cart=cart, product_id__in=adding).values_list('product_id', 'quantity'))
+        wanted = {
+            pk: min(quantity + current.get(pk, 0), MAX_QUANTITY)
+            for pk, quantity in quantities.items() if pk not in missing
+        }
+
+        removed = [pk for pk, quantity in wanted.items() if quantity == 0]
+        if removed:
+            CartItem.objects.filter(cart=cart, product_id__in=removed).delete()
+        lines = [CartItem(cart=cart, product_id=pk, quantity=quantity) for pk, quantity in wanted.items() if quantity]
+        if lines:
+            # On MySQL only unique_cart_product can collide
+            CartItem.objects.bulk_create(lines, **upsert_options(CartItem, ['cart', 'product'], ['quantity']))
+        forget(cart.cache_key)
+
+
+def clear_cart(cart):
+    CartItem.objects.filter(cart=cart).delete()
+    forget(cart.cache_key)
+
+
+def merge_anonymous_cart(user, token):
+    """
+    Fold the anonymous cart for ``token`` into ``user``'s cart on login:
+    quantities of products in both are added up. When the user has no cart
+    yet the anonymous one simply becomes theirs.
+    """
+    if token is None:
+        return
+    with transaction.atomic():
+        anonymous = Cart.objects.select_for_update().filter(token=token, user__isnull=True).first()
+        if anonymous is None:
+            return
+        cart = Cart.objects.filter(user=user).first()
+        if cart is None:
+            anonymous.user = user
+            anonymous.save(update_fields=['user', 'updated_at'])
+        else:
+            update_items(cart, dict(anonymous.items.values_list('product_id', 'quantity')), strict=False)
+            anonymous.delete()
+        forget(cart_cache_key(token=token), cart_cache_key(user_id=user.pk))
+
+
+def load_lines(**lookup):
+    """Cart lines with their product, category and primary image, in one query."""
+    primary_image = ProductImage.objects.filter(product=OuterRef('product'), is_primary=True).values('image')[:1]
+    return list(
+        CartItem.objects.filter(**lookup).select_related('product__category').annotate(image=Subquery(primary_image))
+    )
+
+
+def money(value):
+    return str(value)
+
+
+def build_payload(lines, token=None):
+    """
+    The priced cart. Lines for inactive products or beyond the stock are
+    listed with ``purchasable`` false and left out of the totals.
+    """
+    purchasable = {line.pk for line in lines if line.product.is_active and line.quantity <= line.product.quantity}
+    quote = price_cart((line.product, line.quantity) for line in lines if line.pk in purchasable)
+    payload = {
+        'items': [
+            {
+                'product': line.product_id,
+                'name': line.product.name,
+                'slug': line.product.slug,
+                'image': default_storage.url(line.image) if line.image else None,
+                'price': money(line.product.price),
+                'quantity': line.quantity,
+                'available': line.product.quantity,
+                'purchasable': line.pk in purchasable,
+                'line_total': money(line.product.price * line.quantity),
+            }
+            for line in lines
+        ],
+        'item_count': sum(line.quantity for line in lines),
+        'subtotal': money(quote.subtotal),
+        'tax': money(quote.tax),
+        'shipping_cost': money(quote.shipping_cost),
+        'total': money(quote.total),
+    }
+    if token is not None:
+        payload['token'] = str(token)
+    return payload
+
+
+def read_cart(user=None, token=None, refresh=False):
+    """
+    The priced cart of ``user``, or the anonymous cart for ``token``. The
+    payload is cached per owner together with the cache generations of its
+    products, so a write to the cart or a change to any of its products
+    (price, stock, status) makes the next read reprice it. ``refresh``
+    reprices without looking at the cache, for responses to writes.
+    """
+    user = owner(user)
+    if user is None and token is None:
+        return build_payload([])
+
+    cache = get_cache()
+    key = cart_cache_key(user_id=user.pk if user else None, token=token)
+    entry = None if refresh else cache.get(key)
+    if entry is not None:
+        tokens, versions, payload = entry
+        if generations(tokens) == versions:
+            return payload
+
+    if user is not None:
+        lines = load_lines(cart__user=user)
+    else:
+        lines = load_lines(cart__token=token, cart__user__isnull=True)
+    payload = build_payload(lines, token=None if user else token)
+    tokens = [f'product:{line.product_id}' for line in lines]
+    cache.set(key, (tokens, generations(tokens), payload), settings.CART_CACHE_TIMEOUT)
+    return payload
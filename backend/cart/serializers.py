@@ -0,0 +1,21 @@
+from rest_framework import serializers
+from .operations import MAX_QUANTITY
+
+MAX_BATCH_SIZE = 100
+
+class CartLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, max_value=MAX_QUANTITY)
+
+class CartItemsSerializer(serializers.Serializer):
+    """A batch of cart lines; repeated products are merged."""
+    items = CartLineSerializer(many=True, allow_empty=False, max_length=MAX_BATCH_SIZE)
+    
+    def quantities(self, replace):
+        quantities = {}
+        for line in self.validated_data['items']:
+            if replace:
+                quantities[line['product']] = line['quantity']
+            else:
+                quantities[line['product']] = quantities.get(line['product'], 0) + line['quantity']
+        return quantities
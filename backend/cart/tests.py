@@ -0,0 +1,153 @@
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from products.models import Category, Product
+from users.models import User, Vendor
+from .models import Cart, CartItem
+from .operations import read_cart
+
+
+class CartTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        vendor_user = User.objects.create_user(email='vendor@example.com', password='pass12345', name='Vendor', role='vendor')
+        vendor = Vendor.objects.create(user=vendor_user, business_name='Spice World')
+        spices = Category.objects.create(name='Spices', slug='spices')
+        cls.turmeric = Product.objects.create(
+            vendor=vendor, category=spices, name='Turmeric', slug='turmeric', price=Decimal('150.00'), quantity=5
+        )
+        cls.pepper = Product.objects.create(
+            vendor=vendor, category=spices, name='Pepper', slug='pepper', price=Decimal('90.00'), quantity=2
+        )
+        cls.customer = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def lines(self, payload):
+        return {item['product']: item['quantity'] for item in payload['items']}
+
+    def write(self, method, path, items=None, **extra):
+        # Cached carts are dropped when the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            data = {'items': items} if items is not None else None
+            return getattr(self.client, method)(path, data, format='json', **extra)
+
+
+class CartApiTests(CartTestMixin, TestCase):
+    def test_anonymous_cart_batches(self):
+        response = self.write('post', '/api/cart/items/', [
+            {'product': self.turmeric.id, 'quantity': 1},
+            {'product': self.pepper.id, 'quantity': 1},
+            {'product': self.turmeric.id, 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(self.lines(data), {self.turmeric.id: 2, self.pepper.id: 1})
+        self.assertEqual((data['subtotal'], data['tax'], data['total']), ('390.00', '70.20', '460.20'))
+
+        headers = {'HTTP_X_CART_TOKEN': data['token']}
+        data = self.write('patch', '/api/cart/items/', [
+            {'product': self.turmeric.id, 'quantity': 0},
+            {'product': self.pepper.id, 'quantity': 2},
+        ], **headers).json()
+        self.assertEqual(self.lines(data), {self.pepper.id: 2})
+        self.assertEqual(self.lines(self.client.get('/api/cart/', **headers).json()), {self.pepper.id: 2})
+        self.assertEqual(Cart.objects.count(), 1)
+
+        data = self.write('delete', f'/api/cart/items/{self.pepper.id}/', **headers).json()
+        self.assertEqual((data['items'], data['total']), ([], '0.00'))
+
+    def test_lines_upsert_without_conflict_targets(self):
+        # MySQL upserts on any unique key
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            data = self.write('post', '/api/cart/items/', [{'product': self.turmeric.id, 'quantity': 1}]).json()
+        self.assertEqual(self.lines(data), {self.turmeric.id: 1})
+
+    def test_list_bodies_are_rejected(self):
+        response = self.client.post('/api/cart/items/', [{'product': self.turmeric.id, 'quantity': 1}], format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            '/api/auth/login/', ['customer@example.com', 'pass12345'], format='json', HTTP_X_CART_TOKEN=str(uuid.uuid4())
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_unknown_products_and_bad_quantities(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.post('/api/cart/items/', {'items': [{'product': 999999, 'quantity': 1}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/cart/items/', {'items': [{'product': self.pepper.id, 'quantity': 100}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_unavailable_lines_are_left_out_of_the_totals(self):
+        self.client.force_authenticate(self.customer)
+        self.write('post', '/api/cart/items/', [
+            {'product': self.turmeric.id, 'quantity': 1},
+            {'product': self.pepper.id, 'quantity': 3},
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.turmeric.is_active = False
+            self.turmeric.save()
+        data = self.client.get('/api/cart/').json()
+        self.assertEqual([item['purchasable'] for item in data['items']], [False, False])
+        self.assertEqual(data['total'], '0.00')
+
+    def test_login_merges_the_anonymous_cart(self):
+        Cart.objects.create(user=self.customer).items.create(product=self.turmeric, quantity=1)
+        token = self.write('post', '/api/cart/items/', [
+            {'product': self.turmeric.id, 'quantity': 2},
+            {'product': self.pepper.id, 'quantity': 1},
+        ]).json()['token']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/auth/login/', {'email': 'customer@example.com', 'password': 'pass12345'},
+                format='json', HTTP_X_CART_TOKEN=token,
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Cart.objects.count(), 1)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.lines(self.client.get('/api/cart/').json()), {self.turmeric.id: 3, self.pepper.id: 1})
+
+    def test_anonymous_cart_becomes_the_customers(self):
+        token = self.client.post(
+            '/api/cart/items/', {'items': [{'product': self.pepper.id, 'quantity': 1}]}, format='json'
+        ).json()['token']
+        self.client.post(
+            '/api/auth/login/', {'email': 'customer@example.com', 'password': 'pass12345', 'cart_token': token},
+            format='json',
+        )
+        self.assertEqual(Cart.objects.get().user, self.customer)
+
+
+class CartCacheTests(CartTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Cart.objects.create(user=self.customer).items.create(product=self.turmeric, quantity=2)
+
+    def test_reads_are_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            read_cart(self.customer)
+        with self.assertNumQueries(0):
+            self.assertEqual(read_cart(self.customer)['subtotal'], '300.00')
+
+    def test_product_changes_reprice_the_cart(self):
+        read_cart(self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.turmeric.price = Decimal('100.00')
+            self.turmeric.save()
+        self.assertEqual(read_cart(self.customer)['subtotal'], '200.00')
+
+    def test_writes_drop_the_cached_cart(self):
+        self.client.force_authenticate(self.customer)
+        self.client.get('/api/cart/')
+        self.write('post', '/api/cart/items/', [{'product': self.pepper.id, 'quantity': 1}])
+        self.assertEqual(self.lines(read_cart(self.customer)), {self.turmeric.id: 2, self.pepper.id: 1})
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import cart, cart_items, cart_item
+
+urlpatterns = [
+    path('', cart, name='cart'),
+    path('items/', cart_items, name='cart_items'),
+    path('items/<int:product_id>/', cart_item, name='cart_item'),
+]
@@ -0,0 +1,52 @@
+from django.http import JsonResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from orders.stock import UnknownProducts
+from .operations import (
+    clear_cart, find_cart, get_or_create_cart, read_cart, request_cart_token, update_items,
+)
+from .serializers import CartItemsSerializer
+
+# Signed-in customers use their own cart; anonymous visitors send the token
+# from a previous response in the X-Cart-Token header.
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([AllowAny])
+def cart(request):
+    token = request_cart_token(request)
+    if request.method == 'DELETE':
+        existing = find_cart(request.user, token)
+        if existing is not None:
+            clear_cart(existing)
+        return Response(read_cart(request.user, token, refresh=True))
+    return Response(read_cart(request.user, token))
+
+@api_view(['POST', 'PATCH'])
+@permission_classes([AllowAny])
+def cart_items(request):
+    """
+    Apply a batch of ``items`` (``[{"product", "quantity"}]``): POST adds
+    the quantities to the cart, PATCH sets them, 0 removing the line.
+    Responds with the repriced cart.
+    """
+    serializer = CartItemsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    replace = request.method == 'PATCH'
+    
+    current = get_or_create_cart(request.user, request_cart_token(request))
+    try:
+        update_items(current, serializer.quantities(replace), replace=replace)
+    except UnknownProducts as error:
+        return JsonResponse({"error": f"Unknown products: {error.ids}"}, status=400)
+    return Response(read_cart(request.user, current.token, refresh=True))
+
+@api_view(['DELETE'])
+@permission_classes([AllowAny])
+def cart_item(request, product_id):
+    token = request_cart_token(request)
+    existing = find_cart(request.user, token)
+    if existing is not None:
+        update_items(existing, {product_id: 0}, replace=True)
+    return Response(read_cart(request.user, token, refresh=True))
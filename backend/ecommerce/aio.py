@@ -0,0 +1,66 @@
+"""
+Helpers for the async views that ecommerce.asgi_urls routes to when the
+project is served over ASGI.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+
+def async_get(fallback):
+    """
+    Serve GET with the decorated coroutine and any other method with the
+    synchronous DRF view ``fallback``, so a route keeps its writes (and its
+    405s) when its reads go async.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method == 'GET':
+                return await view(request, *args, **kwargs)
+            return await sync_to_async(fallback)(request, *args, **kwargs)
+        # DRF views do their own CSRF checks for session authentication
+        wrapper.csrf_exempt = getattr(fallback, 'csrf_exempt', False)
+        return wrapper
+    return decorator
+
+
+def render(data, status=200):
+    """``data`` rendered like a DRF Response, so the async and sync views serve the same bytes."""
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(renderer.render(data), content_type=renderer.media_type, status=status)
+
+
+async def authenticate(request):
+    """
+    A DRF Request for ``request`` whose user is authenticated the way the
+    DRF views do it, off the event loop since that may query. Raises the
+    authenticator's AuthenticationFailed for a bad token.
+    """
+    request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    await sync_to_async(lambda: request.user)()
+    return request
+
+
+async def fetch(queryset):
+    """The rows of ``queryset``, prefetches included, evaluated off the event loop."""
+    return [row async for row in queryset]
+
+
+async def in_thread(func, *args):
+    """
+    Run the blocking ``func`` in a worker thread with a database connection
+    of its own, closed afterwards. Django's async ORM runs every query of a
+    request on one thread in turn; this lets a query overlap with them.
+    Only committed rows are visible to it.
+    """
+    def call():
+        try:
+            return func(*args)
+        finally:
+            connections.close_all()
+    return await sync_to_async(call, thread_sensitive=False)()
@@ -0,0 +1,19 @@
+"""
+URLconf for ASGI servers, selected by ecommerce.asgi: the hot reads go to
+async views ahead of the routes in ecommerce.urls, which serve the rest.
+"""
+from django.urls import path
+
+from orders import async_views as orders
+from products import async_views as products
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/products/', products.products, name='products'),
+    path('api/products/<int:product_id>/', products.product_detail, name='product_detail'),
+    path('api/products/featured/', products.featured_products, name='featured_products'),
+    path('api/products/categories/', products.categories, name='categories'),
+    path('api/orders/', orders.orders, name='orders'),
+    path('api/orders/<int:order_id>/', orders.order_detail, name='order_detail'),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,16 @@
+from django.db import connections, router
+
+
+def upsert_options(model, unique_fields, update_fields):
+    """
+    ``bulk_create`` options for inserting ``model`` rows or, when one
+    collides on ``unique_fields``, updating its ``update_fields``. MySQL
+    cannot name the conflict target (ON DUPLICATE KEY UPDATE fires on any
+    unique key), so there ``unique_fields`` must be backed by a unique
+    constraint and the model's other unique keys must not collide.
+    """
+    features = connections[router.db_for_write(model)].features
+    options = {'update_conflicts': True, 'update_fields': update_fields}
+    if features.supports_update_conflicts_with_target:
+        options['unique_fields'] = unique_fields
+    return options
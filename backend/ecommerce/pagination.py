@@ -0,0 +1,188 @@
+import asyncio
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .aio import fetch, in_thread
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def table_estimate(queryset):
+    """The planner's row estimate for an unfiltered table, or None where there is none."""
+    if queryset.query.where:
+        return None
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'mysql':
+        sql = 'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def approximate_count(queryset, limit):
+    """
+    ``(count, exact)`` for ``queryset``. Counting stops after ``limit`` rows;
+    beyond that the table statistics are used when the query is unfiltered,
+    otherwise the count is reported as ``limit``.
+    """
+    counted = queryset.order_by()[:limit + 1].count()
+    if counted <= limit:
+        return counted, True
+    return max(table_estimate(queryset) or 0, limit), False
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on the queryset's ordering, ``(-created_at, -id)`` by
+    default. The cursor holds the ordering values of the row at the page
+    boundary, so each page is one indexed range scan however deep it is.
+
+    Query parameters: ``cursor`` (opaque, taken from ``next``/``previous``),
+    ``page_size`` (up to ``max_page_size``) and ``count=true`` for an
+    approximate total. Orderings must be on concrete model fields; the
+    primary key is appended when it is not already the last one.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    max_page_size = 100
+    count_limit = 10000
+    default_ordering = ('-created_at', '-id')
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering or self.default_ordering)
+        pk_name = queryset.model._meta.pk.name
+        ordering = [field.replace('pk', pk_name) if field.lstrip('-') == 'pk' else field for field in ordering]
+        if ordering[-1].lstrip('-') != pk_name:
+            ordering.append(('-' if ordering[-1].startswith('-') else '') + pk_name)
+        return ordering
+
+    def encode_cursor(self, row, reverse):
+        values = []
+        for field in self.ordering:
+            value = getattr(row, field.lstrip('-'))
+            values.append(value if isinstance(value, int) else (value.isoformat() if hasattr(value, 'isoformat') else str(value)))
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            values = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, payload['v'], strict=True)
+            ]
+            return values, bool(payload['r'])
+        except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+            raise NotFound('Invalid cursor')
+
+    def after(self, values, reverse):
+        """Rows strictly past ``values`` in the ordering (or before them when ``reverse``)."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            condition |= equal & Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+            equal &= Q(**{name: value})
+        # The redundant bound on the leading column gives the planner a range
+        # to seek to; the OR alone is not index-friendly.
+        leading = self.ordering[0]
+        lookup = 'lte' if leading.startswith('-') != reverse else 'gte'
+        return Q(**{f"{leading.lstrip('-')}__{lookup}": values[0]}) & condition
+
+    def prepare(self, queryset, request):
+        """
+        Read the request's page parameters and return the queryset in page
+        order, for counting, and the query for the page itself.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.values, self.reverse = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*self.ordering)
+        self.count = self.count_exact = None
+        self.counting = request.query_params.get(self.count_query_param, '').lower() in TRUE_VALUES
+
+        page = queryset
+        if self.values is not None:
+            page = page.filter(self.after(self.values, self.reverse))
+        if self.reverse:
+            page = page.reverse()
+        return queryset, page[:self.page_size + 1]
+
+    def finish(self, rows):
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.has_next = more if not self.reverse else self.values is not None
+        self.has_previous = more if self.reverse else self.values is not None
+        self.first = rows[0] if rows else None
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, page = self.prepare(queryset, request)
+        if self.counting:
+            self.count, self.count_exact = approximate_count(queryset, self.count_limit)
+        return self.finish(list(page))
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset for async views; a requested count runs concurrently with the page."""
+        queryset, page = self.prepare(queryset, request)
+        if not self.counting:
+            return self.finish(await fetch(page))
+        rows, (self.count, self.count_exact) = await asyncio.gather(
+            fetch(page), in_thread(approximate_count, queryset, self.count_limit)
+        )
+        return self.finish(rows)
+
+    def link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, reverse))
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.link(self.last, False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self.link(self.first, True)
+
+    def get_paginated_response(self, data):
+        payload = {}
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_exact'] = self.count_exact
+        payload.update(next=self.get_next_link(), previous=self.get_previous_link(), results=data)
+        return Response(payload)
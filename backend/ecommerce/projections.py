@@ -0,0 +1,30 @@
+"""
+Formatters for the fast read paths (products.projections and friends),
+which build response payloads from ``values_list`` rows instead of running
+serializers. Each renders a value exactly as the DRF field would.
+"""
+from decimal import Decimal
+
+from rest_framework import serializers
+
+CENT = Decimal('0.01')
+
+# DateTimeField resolves the output format and time zone per call, as the serializers do
+datetime_string = serializers.DateTimeField().to_representation
+
+
+def money(value):
+    """A two-place DecimalField."""
+    return None if value is None else '{:f}'.format(value.quantize(CENT))
+
+
+def timestamp(value):
+    return None if value is None else datetime_string(value)
+
+
+def file_url(storage, name, request=None):
+    """A FileField or ImageField from the stored file name; absolute when there is a request."""
+    if not name:
+        return None
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
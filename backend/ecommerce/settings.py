@@ -2,10 +2,13 @@
 Django settings for ecommerce project.
 """
 
+import importlib.util
 import os
 from pathlib import Path
 from datetime import timedelta
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -35,6 +38,7 @@ INSTALLED_APPS = [
     'users',
     'products',
     'orders',
+    'cart',
 ]
 
 MIDDLEWARE = [
@@ -48,7 +52,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'ecommerce.urls'
+# ecommerce.asgi switches to ecommerce.asgi_urls, whose hot reads are async views
+ROOT_URLCONF = os.environ.get('DJANGO_ROOT_URLCONF', 'ecommerce.urls')
 
 TEMPLATES = [
     {
@@ -115,6 +120,33 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing (users.hashers). New passwords are hashed with
+# PASSWORD_HASHER; hashes made with another hasher or other costs are
+# replaced when their user logs in
+PASSWORD_HASHER = os.environ.get(
+    'PASSWORD_HASHER', 'argon2' if importlib.util.find_spec('argon2') else 'scrypt'
+)
+PASSWORD_HASHING = {
+    # OWASP's minimum: 19 MiB, 2 passes, 1 lane
+    'argon2': {'time_cost': 2, 'memory_cost': 19 * 1024, 'parallelism': 1},
+    # 16 MiB
+    'scrypt': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+    # Django's default, for hashes stored before the switch
+    'pbkdf2': {'iterations': 600000},
+    # Processes hashing for each server process; 0 hashes in the request thread
+    'processes': int(os.environ.get('PASSWORD_HASHING_PROCESSES', 0)),
+}
+_PASSWORD_HASHERS = {
+    'argon2': 'users.hashers.Argon2PasswordHasher',
+    'scrypt': 'users.hashers.ScryptPasswordHasher',
+    'pbkdf2': 'users.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [
+    _PASSWORD_HASHERS[PASSWORD_HASHER],
+    *[path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER],
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -138,12 +170,22 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # orjson-backed when it is installed, the stdlib json module otherwise
+    'DEFAULT_RENDERER_CLASSES': (
+        'ecommerce.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'ecommerce.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'ecommerce.pagination.KeysetPagination',
     'PAGE_SIZE': 10,
 }
 
@@ -163,6 +205,59 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Revoked tokens (users.revocation): how often each process reads new
+# revocations, in seconds, and how many it keeps in memory
+JWT_REVOCATION_SYNC_INTERVAL = 5
+JWT_REVOCATION_CACHE_SIZE = 10000
+# Blacklisted refresh tokens (users.blacklist): the tokens expiring on one
+# day that each process's Bloom filter for that day is sized for, at 1%
+# false positives (about 1.2 MB per million)
+JWT_BLACKLIST_BLOOM_CAPACITY = 1000000
+
+# Caching
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at e.g.
+# django.core.cache.backends.filebased.FileBasedCache or
+# django.core.cache.backends.redis.RedisCache (needs the redis package)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Public catalog response cache (products.cache)
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 300
+CATALOG_CACHE_LOCK_TIMEOUT = 5
+
+# Product search index (products.search); one file per host, shared by all workers
+SEARCH_INDEX_PATH = os.environ.get('SEARCH_INDEX_PATH', os.path.join(BASE_DIR, 'search_index', 'products.idx'))
+
+# Order pricing
+# GST rate per category slug; 'default' applies to everything else
+ORDER_TAX_RATES = {
+    'default': '0.18',
+}
+# (minimum order value, shipping cost) tiers; the highest matching tier applies
+ORDER_SHIPPING_RATES = [
+    ('0', '0'),
+]
+
+# Order numbers
+ORDER_NUMBER_GENERATOR = 'orders.numbering.SnowflakeOrderNumberGenerator'
+# Unique per running process (0-1023) so numbers never collide; defaults to a
+# hash of host name and process id, whose rare collisions checkout retries
+ORDER_NUMBER_WORKER_ID = os.environ.get('ORDER_NUMBER_WORKER_ID')
+
+# Seconds a checkout's stock reservation holds units before expiring
+STOCK_RESERVATION_TTL = 15 * 60
+
+# Priced carts are cached per customer (cart.operations)
+CART_CACHE_TIMEOUT = 600
+
+# Vendors' counts of order lines per status (orders.fulfillment)
+FULFILLMENT_COUNTS_CACHE_TIMEOUT = 600
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Vite default port
@@ -171,3 +266,6 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Anonymous carts are identified by this header
+CORS_ALLOW_HEADERS = (*default_headers, 'x-cart-token')
+
@@ -9,6 +9,7 @@ urlpatterns = [
     path('api/admin/', include('users.admin_urls')),
     path('api/products/', include('products.urls')),
     path('api/orders/', include('orders.urls')),
+    path('api/cart/', include('cart.urls')),
 ]
 
 # Serve media files in development
@@ -0,0 +1,49 @@
+"""
+Async versions of the order reads, routed by ecommerce.asgi_urls. Placing
+an order (POST) is handed to the DRF view in orders.views.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework.exceptions import APIException
+
+from ecommerce.aio import async_get, authenticate, fetch, render
+from ecommerce.pagination import KeysetPagination
+from . import views
+from .models import Order
+from .projections import order_payloads, order_rows, summary_payloads, summary_rows
+
+
+async def customer(request):
+    """The authenticated DRF request, or the error response to send instead."""
+    try:
+        request = await authenticate(request)
+    except APIException as error:
+        return None, render({'detail': error.detail}, status=error.status_code)
+    if not request.user.is_authenticated:
+        return None, JsonResponse({"error": "Authentication required"}, status=401)
+    return request, None
+
+
+@async_get(views.orders)
+async def orders(request):
+    request, error = await customer(request)
+    if error is not None:
+        return error
+    paginator = KeysetPagination()
+    try:
+        page = await paginator.apaginate_queryset(summary_rows(Order.objects.filter(user=request.user)), request)
+    except APIException as error:
+        return render({'detail': error.detail}, status=error.status_code)
+    return render(paginator.get_paginated_response(summary_payloads(page)).data)
+
+
+@async_get(views.order_detail)
+async def order_detail(request, order_id):
+    request, error = await customer(request)
+    if error is not None:
+        return error
+    rows = await fetch(order_rows(Order.objects.filter(user=request.user, pk=order_id)))
+    payloads = await sync_to_async(order_payloads)(rows)
+    if payloads:
+        return render(payloads[0])
+    return JsonResponse({"error": "Order not found"}, status=404)
@@ -0,0 +1,120 @@
+"""
+Vendor order fulfillment. A vendor works on its own lines of customer
+orders: they are listed grouped by order, newest order first, and updated
+in bulk. The vendor's counts of lines per status are cached until one of
+its lines is added or changes.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from ecommerce.pagination import KeysetPagination
+from ecommerce.projections import money, timestamp
+from products.cache import generations, get_cache, invalidate
+from .models import OrderItem
+from .projections import ADDRESS_FIELDS, address
+
+STATUSES = [status for status, _ in OrderItem.STATUS_CHOICES]
+ITEM_COLUMNS = (
+    'id', 'order_id', 'product_id', 'product__name', 'quantity', 'price', 'total', 'status', 'tracking_number',
+    'order__order_number', 'order__payment_status', 'order__payment_method', 'order__user__name',
+    *(f'order__shipping_address__{field}' for field in ADDRESS_FIELDS),
+)
+SHIPPING = slice(ITEM_COLUMNS.index('order__shipping_address__id'), len(ITEM_COLUMNS))
+
+
+def counts_token(vendor_id):
+    return f'fulfillment:{vendor_id}'
+
+
+def invalidate_counts(*vendor_ids):
+    invalidate(*[counts_token(vendor_id) for vendor_id in set(vendor_ids)])
+
+
+def status_counts(vendor):
+    """``{status: lines}`` over all of ``vendor``'s lines."""
+    cache = get_cache()
+    key = f'fulfillment:counts:{vendor.pk}'
+    # Read before counting: an update committed meanwhile makes this entry stale
+    versions = generations([counts_token(vendor.pk)])
+    entry = cache.get(key)
+    if entry is not None and entry[0] == versions:
+        return entry[1]
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update(
+        OrderItem.objects.filter(vendor=vendor).order_by().values_list('status').annotate(lines=Count('id'))
+    )
+    cache.set(key, (versions, counts), settings.FULFILLMENT_COUNTS_CACHE_TIMEOUT)
+    return counts
+
+
+class VendorOrderPagination(KeysetPagination):
+    """
+    Pages of a vendor's orders, read from the (vendor, order date, order)
+    index; the two values identify an order, so no id is appended.
+    """
+    default_ordering = ('-order_created_at', '-order_id')
+
+    def get_ordering(self, queryset):
+        return list(self.default_ordering)
+
+
+def vendor_orders(vendor, status=None):
+    """The orders with lines of ``vendor`` (in ``status``), one row each, for VendorOrderPagination."""
+    lines = OrderItem.objects.filter(vendor=vendor)
+    if status is not None:
+        lines = lines.filter(status=status)
+    return lines.values_list('order_created_at', 'order_id', named=True).distinct()
+
+
+def order_groups(vendor, orders, status=None):
+    """The page of ``orders`` with ``vendor``'s lines (in ``status``) under each, in one query."""
+    lines = OrderItem.objects.filter(vendor=vendor, order_id__in=[order.order_id for order in orders])
+    if status is not None:
+        lines = lines.filter(status=status)
+    items = defaultdict(list)
+    details = {}
+    for row in lines.order_by('id').values_list(*ITEM_COLUMNS):
+        (pk, order_id, product_id, product_name, quantity, price, total, line_status, tracking_number,
+         order_number, payment_status, payment_method, customer) = row[:SHIPPING.start]
+        details[order_id] = (order_number, payment_status, payment_method, customer, address(row[SHIPPING]))
+        items[order_id].append({
+            'id': pk,
+            'product': product_id,
+            'product_name': product_name,
+            'quantity': quantity,
+            'price': money(price),
+            'total': money(total),
+            'status': line_status,
+            'tracking_number': tracking_number,
+        })
+    groups = []
+    for order in orders:
+        if order.order_id not in details:
+            # Its lines left ``status`` between the two queries
+            continue
+        order_number, payment_status, payment_method, customer, shipping_address = details[order.order_id]
+        groups.append({
+            'order': order.order_id,
+            'order_number': order_number,
+            'created_at': timestamp(order.order_created_at),
+            'customer': customer,
+            'payment_status': payment_status,
+            'payment_method': payment_method,
+            'shipping_address_details': shipping_address,
+            'items': items[order.order_id],
+        })
+    return groups
+
+
+def update_lines(vendor, changes, items=(), orders=()):
+    """
+    Apply ``changes`` (status, tracking_number) to ``vendor``'s lines with
+    the ids ``items`` and all its lines of the ``orders``, in one UPDATE.
+    Returns the number of lines updated.
+    """
+    updated = OrderItem.objects.filter(vendor=vendor).filter(Q(pk__in=items) | Q(order_id__in=orders)).update(**changes)
+    if updated:
+        invalidate_counts(vendor.pk)
+    return updated
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from orders.rollups import backfill
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollup tables from order history in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        processed = 0
+        for processed in backfill(chunk_size=options['chunk_size']):
+            self.stdout.write(f'{processed} orders processed')
+        self.stdout.write(self.style.SUCCESS(f'Rollups rebuilt from {processed} orders'))
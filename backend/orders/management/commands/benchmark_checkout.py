@@ -0,0 +1,137 @@
+import random
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from rest_framework import serializers
+
+from orders.models import Order, OrderItem
+from orders.serializers import OrderCreateSerializer, StockReservationSerializer
+from orders.stock import release_reservation
+from products.models import Product
+from users.models import User, Vendor
+
+RETRIES = 20
+
+
+class GaveUp(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulate concurrent checkouts (reserve, then pay or abandon) against a few scarce products '
+        'and check that nothing is oversold.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--products', type=int, default=5)
+        parser.add_argument('--stock', type=int, default=200, help='Units of each product.')
+        parser.add_argument('--abandon', type=float, default=0.2, help='Share of reservations released unpaid.')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated rows after the run.')
+
+    def save(self, serializer_class, user, data):
+        serializer = serializer_class(data=data, context={'request': SimpleNamespace(user=user)})
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def retry(self, action):
+        """Run ``action``, retrying lock timeouts with backoff the way a client would."""
+        for attempt in range(RETRIES):
+            try:
+                return action(), attempt
+            except OperationalError:
+                time.sleep(random.uniform(0, min(0.5, 0.005 * 2 ** attempt)))
+        raise GaveUp()
+
+    def checkout(self, user, products, abandon, seed):
+        rng = random.Random(seed)
+        items = [{'product': pk, 'quantity': rng.randint(1, 3)} for pk in rng.sample(products, rng.randint(1, 2))]
+        started = time.perf_counter()
+        retries = 0
+        try:
+            try:
+                held, retries = self.retry(lambda: self.save(StockReservationSerializer, user, {'items': items}))
+            except serializers.ValidationError:
+                return 'rejected', time.perf_counter() - started, retries
+            if rng.random() < abandon:
+                _, more = self.retry(lambda: release_reservation(user, held['reservation']))
+                return 'abandoned', time.perf_counter() - started, retries + more
+            data = {'payment_method': 'card', 'items': items, 'reservation': held['reservation']}
+            _, more = self.retry(lambda: self.save(OrderCreateSerializer, user, data))
+            return 'sold', time.perf_counter() - started, retries + more
+        except GaveUp:
+            return 'gave_up', time.perf_counter() - started, RETRIES
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        vendor_user = User.objects.create(email=f'bench-{tag}-vendor@example.com', name='Bench Vendor', role='vendor')
+        vendor = Vendor.objects.create(user=vendor_user, business_name='Bench Vendor', is_approved=True)
+        products = [
+            Product.objects.create(
+                vendor=vendor, name=f'Flash Sale {i}', slug=f'bench-{tag}-flash-{i}',
+                price=Decimal('99.00'), quantity=options['stock'],
+            ).pk
+            for i in range(options['products'])
+        ]
+        User.objects.bulk_create([
+            User(email=f'bench-{tag}-buyer{i}@example.com', name=f'Buyer {i}') for i in range(options['workers'])
+        ])
+        buyers = list(User.objects.filter(email__startswith=f'bench-{tag}-buyer'))
+        # One buyer per worker thread: a new reservation replaces the buyer's previous one
+        free_buyers = iter(buyers)
+        pool = threading.local()
+
+        def run(seed):
+            if not hasattr(pool, 'user'):
+                pool.user = next(free_buyers)
+            return self.checkout(pool.user, products, options['abandon'], seed)
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                results = list(executor.map(run, range(options['checkouts'])))
+            elapsed = time.perf_counter() - started
+
+            outcomes = {}
+            for outcome, _, _ in results:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            latencies = sorted(latency for _, latency, _ in results)
+            self.stdout.write(
+                f"{options['checkouts']} checkouts in {elapsed:.1f}s ({options['checkouts'] / elapsed:.0f}/s) "
+                f"with {options['workers']} workers on {connection.vendor}: {outcomes}"
+            )
+            self.stdout.write(
+                f'latency p50 {statistics.median(latencies) * 1000:.1f}ms, '
+                f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms, '
+                f'{sum(retries for _, _, retries in results)} lock retries'
+            )
+
+            sold = dict(
+                OrderItem.objects.filter(product_id__in=products).values_list('product_id').annotate(Sum('quantity'))
+            )
+            remaining = dict(Product.objects.filter(pk__in=products).values_list('pk', 'quantity'))
+            wrong = [
+                pk for pk in products
+                if remaining[pk] < 0 or remaining[pk] + sold.get(pk, 0) != options['stock']
+            ]
+            self.stdout.write(f'units sold {sorted(sold.values())}, remaining {sorted(remaining.values())}')
+            if wrong:
+                self.stderr.write(self.style.ERROR(f'Stock does not add up for products {wrong}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('No product was oversold'))
+        finally:
+            if not options['keep']:
+                Order.objects.filter(user__in=buyers).delete()
+                User.objects.filter(email__startswith=f'bench-{tag}-').delete()
@@ -0,0 +1,23 @@
+import timeit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = 'Measure order number generation throughput for the configured generator.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        generator = import_string(settings.ORDER_NUMBER_GENERATOR)(worker_id=1)
+        count = options['count']
+        timings = timeit.repeat(generator, number=count, repeat=options['repeat'])
+        best = min(timings)
+        self.stdout.write(
+            f'{settings.ORDER_NUMBER_GENERATOR}: {best / count * 1e9:.0f} ns/id, '
+            f'{count / best:,.0f} ids/s (best of {options["repeat"]})'
+        )
@@ -0,0 +1,29 @@
+import random
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from orders.pricing import price_cart
+from products.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = 'Measure how long the pricing engine takes to price a cart of unsaved products.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=200)
+        parser.add_argument('--number', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        categories = [Category(id=i, slug=slug) for i, slug in enumerate(('food', 'bakery', 'spices', 'herbal', 'cleaning'), 1)]
+        cart = [
+            (Product(price=Decimal(rng.randint(100, 99999)) / 100, category=rng.choice(categories)), rng.randint(1, 5))
+            for _ in range(options['lines'])
+        ]
+        price_cart(cart)  # warm the rate caches
+
+        number = options['number']
+        best = min(timeit.repeat(lambda: price_cart(cart, discount=Decimal('25')), number=number, repeat=5))
+        self.stdout.write(f"{options['lines']}-line cart: {best / number * 1e6:.1f} us per quote")
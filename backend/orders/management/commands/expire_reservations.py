@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.stock import SWEEP_BATCH_SIZE, sweep_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Delete expired stock reservations, once or every --interval seconds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep running, sweeping every this many seconds.')
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            removed = sweep_expired_reservations(batch_size=options['batch_size'])
+            if removed or not options['interval']:
+                self.stdout.write(f'{removed} expired reservations removed')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def copy_order_fields(apps, schema_editor):
+    # Existing lines take their order's date, fulfillment status and tracking number
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    order = Order.objects.filter(pk=models.OuterRef('order_id'))
+    OrderItem.objects.update(
+        order_created_at=models.Subquery(order.values('created_at')[:1]),
+        status=models.Subquery(order.values('status')[:1]),
+        tracking_number=models.Subquery(order.values('tracking_number')[:1]),
+    )
+    # Items have no refunded status; a refunded line is not shipped any more
+    OrderItem.objects.filter(status='refunded').update(status='cancelled')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='order_created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='tracking_number',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['vendor', '-order_created_at', '-order'], name='orderitem_vendor_created_idx'),
+        ),
+        migrations.RunPython(copy_order_fields, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,25 @@
 from django.db import models
+from django.db.models import Prefetch
 from users.models import User, Address
-from products.models import Product
+from products.models import Product, ProductImage
+
+class OrderQuerySet(models.QuerySet):
+    def for_serialization(self):
+        """
+        Load everything OrderSerializer renders in a fixed number of queries:
+        addresses are joined, items are prefetched with their product, and
+        each product's primary image is projected into ``primary_images``.
+        """
+        items = OrderItem.objects.select_related('product').prefetch_related(
+            Prefetch(
+                'product__images',
+                queryset=ProductImage.objects.filter(is_primary=True),
+                to_attr='primary_images',
+            )
+        )
+        return self.select_related('shipping_address', 'billing_address').prefetch_related(
+            Prefetch('items', queryset=items)
+        )
 
 class Order(models.Model):
     STATUS_CHOICES = (
@@ -43,22 +62,91 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = OrderQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            # A customer's order history, newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
     
     def __str__(self):
         return self.order_number
 
+class OrderItemQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        copy_order_dates(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
 class OrderItem(models.Model):
+    # Fulfillment of the line by its vendor; see orders.fulfillment
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('shipped', 'Shipped'),
+        ('delivered', 'Delivered'),
+        ('cancelled', 'Cancelled'),
+    )
+    
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     vendor = models.ForeignKey('users.Vendor', on_delete=models.CASCADE)
     quantity = models.IntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     total = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    tracking_number = models.CharField(max_length=100, blank=True, null=True)
+    # The order's created_at, copied on save and bulk_create so a vendor's
+    # lines are indexed by order date
+    order_created_at = models.DateTimeField()
+    
+    objects = OrderItemQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['vendor', '-order_created_at', '-order'], name='orderitem_vendor_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in Order {self.order.order_number}"
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'order', 'order_id', 'order_created_at'} & set(update_fields):
+            copy_order_dates([self])
+        super().save(*args, **kwargs)
+
+def copy_order_dates(items):
+    """Set each item's ``order_created_at`` from its order; orders not loaded are read in one query."""
+    unloaded = {item.order_id for item in items if not OrderItem.order.is_cached(item)}
+    dates = dict(Order.objects.filter(pk__in=unloaded).values_list('pk', 'created_at')) if unloaded else {}
+    for item in items:
+        item.order_created_at = item.order.created_at if OrderItem.order.is_cached(item) else dates[item.order_id]
+
+class StockReservation(models.Model):
+    """
+    Units held for a user's checkout until ``expires_at``, managed by
+    orders.stock. A product's available stock is its quantity minus its
+    unexpired holds; expired rows are removed by expire_reservations.
+    """
+    token = models.UUIDField(db_index=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'expires_at'], name='reservation_product_idx'),
+            models.Index(fields=['expires_at'], name='reservation_expiry_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} held until {self.expires_at}"
 
 class Payment(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='payments')
@@ -71,3 +159,41 @@ class Payment(models.Model):
     def __str__(self):
         return f"Payment {self.payment_id} for Order {self.order.order_number}"
 
+
+class DailySales(models.Model):
+    """Orders placed and net paid orders per day (by order date), maintained by orders.rollups."""
+    date = models.DateField(unique=True)
+    placed_orders = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunded_orders = models.IntegerField(default=0)
+    refunds = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        ordering = ['date']
+        verbose_name_plural = 'Daily sales'
+    
+    def __str__(self):
+        return f"Sales on {self.date}"
+
+class DailyVendorProductSales(models.Model):
+    """Net paid units and revenue per vendor, product and day, maintained by orders.rollups."""
+    date = models.DateField()
+    vendor = models.ForeignKey('users.Vendor', on_delete=models.CASCADE, related_name='daily_sales')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        ordering = ['date']
+        verbose_name_plural = 'Daily vendor product sales'
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'date', 'product'], name='unique_vendor_product_day'),
+        ]
+        indexes = [
+            # All products' sales over recent days
+            models.Index(fields=['date', 'product'], name='vendor_product_sales_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} sales for vendor {self.vendor_id} on {self.date}"
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import socket
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.module_loading import import_string
+
+# 2024-01-01T00:00:00Z in milliseconds; 41 timestamp bits last until ~2093.
+EPOCH_MS = 1704067200000
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+# A 63-bit id needs at most 13 base-36 digits.
+ENCODED_WIDTH = 13
+
+
+def encode_base36(value, width=ENCODED_WIDTH):
+    digits = []
+    while value:
+        value, remainder = divmod(value, 36)
+        digits.append(ALPHABET[remainder])
+    return ''.join(reversed(digits)).rjust(width, '0')
+
+
+class SnowflakeOrderNumberGenerator:
+    """
+    Time-ordered order numbers: a millisecond timestamp, a worker id and a
+    per-worker sequence packed into 63 bits and written as fixed-width
+    base 36. Numbers from one worker are strictly increasing and sort the
+    same as strings, so ``order_number`` inserts land at the end of the
+    unique index instead of all over it. Workers with distinct ids never
+    collide; two that share an id can, which ``create_numbered`` retries.
+    """
+
+    def __init__(self, worker_id=None, prefix='ORD', clock=None):
+        if worker_id is None:
+            worker_id = default_worker_id()
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f'worker_id must be between 0 and {MAX_WORKER_ID}')
+        self.worker_id = worker_id
+        self.prefix = prefix
+        self.clock = clock or (lambda: time.time_ns() // 1_000_000)
+        self.last_timestamp = -1
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def next_id(self):
+        with self.lock:
+            timestamp = self.clock()
+            if timestamp < self.last_timestamp:
+                # The wall clock stepped back: keep counting on the last tick.
+                timestamp = self.last_timestamp
+            if timestamp == self.last_timestamp:
+                self.sequence = (self.sequence + 1) & MAX_SEQUENCE
+                if self.sequence == 0:
+                    timestamp = self.wait_for_next_tick(timestamp)
+            else:
+                self.sequence = 0
+            self.last_timestamp = timestamp
+            return ((timestamp - EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self.sequence
+
+    def wait_for_next_tick(self, timestamp):
+        now = self.clock()
+        while now <= timestamp:
+            time.sleep(0.0001)
+            now = self.clock()
+        return now
+
+    def __call__(self):
+        return self.prefix + encode_base36(self.next_id())
+
+
+def default_worker_id():
+    worker_id = getattr(settings, 'ORDER_NUMBER_WORKER_ID', None)
+    if worker_id is None:
+        # Without an explicit id, a hash of host and pid: usually distinct, not always
+        key = f'{socket.gethostname()}:{os.getpid()}'.encode()
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') & MAX_WORKER_ID
+    return int(worker_id)
+
+
+@lru_cache(maxsize=None)
+def _generator_for(pid):
+    path = getattr(settings, 'ORDER_NUMBER_GENERATOR', 'orders.numbering.SnowflakeOrderNumberGenerator')
+    return import_string(path)()
+
+
+def generate_order_number():
+    # Keyed on the pid so forked workers build their own generator.
+    return _generator_for(os.getpid())()
+
+
+def create_numbered(create, attempts=3):
+    """
+    ``create(order_number)`` in a savepoint, called again with a new number
+    when the one it got is already taken, which two workers sharing an id
+    can cause. Other integrity errors are raised as they are.
+    """
+    for attempt in range(attempts):
+        order_number = generate_order_number()
+        try:
+            with transaction.atomic():
+                return create(order_number)
+        except IntegrityError:
+            from .models import Order
+            if attempt == attempts - 1 or not Order.objects.filter(order_number=order_number).exists():
+                raise
@@ -0,0 +1,104 @@
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0')
+
+
+def to_money(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+@lru_cache(maxsize=None)
+def tax_rates():
+    """``{category slug: rate}`` parsed once from ORDER_TAX_RATES; 'default' applies otherwise."""
+    return {slug: Decimal(str(rate)) for slug, rate in settings.ORDER_TAX_RATES.items()}
+
+
+@lru_cache(maxsize=None)
+def shipping_rates():
+    """ORDER_SHIPPING_RATES as ``(minimum, cost)`` Decimal pairs, highest minimum first."""
+    tiers = [(Decimal(str(minimum)), Decimal(str(cost))) for minimum, cost in settings.ORDER_SHIPPING_RATES]
+    return sorted(tiers, reverse=True)
+
+
+@receiver(setting_changed)
+def clear_rate_cache(setting, **kwargs):
+    if setting in ('ORDER_TAX_RATES', 'ORDER_SHIPPING_RATES'):
+        tax_rates.cache_clear()
+        shipping_rates.cache_clear()
+
+
+class PricedLine:
+    __slots__ = ('product', 'quantity', 'unit_price', 'total')
+
+    def __init__(self, product, quantity, unit_price, total):
+        self.product = product
+        self.quantity = quantity
+        self.unit_price = unit_price
+        self.total = total
+
+
+class Quote:
+    __slots__ = ('lines', 'subtotal', 'discount', 'tax', 'shipping_cost', 'total')
+
+    def __init__(self, lines, subtotal, discount, tax, shipping_cost):
+        self.lines = lines
+        self.subtotal = subtotal
+        self.discount = discount
+        self.tax = tax
+        self.shipping_cost = shipping_cost
+        self.total = subtotal - discount + tax + shipping_cost
+
+
+def shipping_cost_for(amount):
+    for minimum, cost in shipping_rates():
+        if amount >= minimum:
+            return cost
+    return ZERO
+
+
+def price_cart(lines, discount=ZERO):
+    """
+    Price ``(product, quantity)`` pairs from the products' stored prices.
+
+    Line totals and the undiscounted tax are accumulated in a single pass.
+    An order-level ``discount`` (capped at the subtotal) is spread over the
+    lines in proportion to their value, so GST is charged on the discounted
+    amount. Rounding to paise happens once, on the totals. Products need
+    ``category`` loaded to pick their rate.
+    """
+    rates = tax_rates()
+    default_rate = rates.get('default', ZERO)
+
+    priced = []
+    subtotal = ZERO
+    full_tax = ZERO
+    rate_by_category = {None: default_rate}
+    for product, quantity in lines:
+        unit_price = product.price
+        line_total = unit_price * quantity
+        priced.append(PricedLine(product, quantity, unit_price, line_total))
+        subtotal += line_total
+        rate = rate_by_category.get(product.category_id)
+        if rate is None:
+            rate = rates.get(product.category.slug, default_rate)
+            rate_by_category[product.category_id] = rate
+        full_tax += rate * line_total
+
+    discount = to_money(min(max(Decimal(discount), ZERO), subtotal))
+    tax = ZERO
+    if subtotal:
+        tax = full_tax * (subtotal - discount) / subtotal
+
+    return Quote(
+        priced,
+        subtotal=to_money(subtotal),
+        discount=discount,
+        tax=to_money(tax),
+        shipping_cost=shipping_cost_for(subtotal - discount),
+    )
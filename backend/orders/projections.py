@@ -0,0 +1,114 @@
+"""
+Fast read path for order lists: what OrderSerializer renders, built from
+``values_list`` rows. OrderProjectionTests keeps the two in step; change
+them together. Order history pages use the lighter summaries at the end.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from ecommerce.projections import file_url, money, timestamp
+from products.models import ProductImage
+from .models import OrderItem
+
+ADDRESS_FIELDS = ('id', 'address_line1', 'address_line2', 'city', 'state', 'postal_code', 'country', 'is_default')
+COLUMNS = (
+    'id', 'order_number', 'user_id', 'status', 'payment_status', 'payment_method', 'subtotal',
+    'shipping_cost', 'tax', 'discount', 'total', 'notes', 'tracking_number', 'created_at',
+    *(f'shipping_address__{field}' for field in ADDRESS_FIELDS),
+    *(f'billing_address__{field}' for field in ADDRESS_FIELDS),
+)
+# Where each address's columns sit in a row
+SHIPPING = slice(COLUMNS.index('shipping_address__id'), COLUMNS.index('shipping_address__id') + len(ADDRESS_FIELDS))
+BILLING = slice(COLUMNS.index('billing_address__id'), COLUMNS.index('billing_address__id') + len(ADDRESS_FIELDS))
+
+image_storage = ProductImage._meta.get_field('image').storage
+
+
+def order_rows(queryset):
+    """``queryset`` as named rows for order_payloads, with both addresses joined; pageable like the orders."""
+    return queryset.values_list(*COLUMNS, named=True)
+
+
+def address(values):
+    return dict(zip(ADDRESS_FIELDS, values)) if values[0] is not None else None
+
+
+def item_payloads(order_ids):
+    """The items of each order, with their product's primary image, in one query."""
+    primary_image = ProductImage.objects.filter(product=OuterRef('product'), is_primary=True).values('image')[:1]
+    items = defaultdict(list)
+    for pk, order_id, product_id, product_name, image, vendor_id, quantity, price, total in OrderItem.objects.filter(
+        order_id__in=order_ids
+    ).annotate(image=Subquery(primary_image)).values_list(
+        'id', 'order_id', 'product_id', 'product__name', 'image', 'vendor_id', 'quantity', 'price', 'total'
+    ):
+        items[order_id].append({
+            'id': pk,
+            'product': product_id,
+            'product_details': {'id': product_id, 'name': product_name, 'image': file_url(image_storage, image)},
+            'vendor': vendor_id,
+            'quantity': quantity,
+            'price': money(price),
+            'total': money(total),
+        })
+    return items
+
+
+def order_payloads(rows):
+    """``OrderSerializer(orders, many=True).data`` for the orders in ``rows``."""
+    rows = list(rows)
+    if not rows:
+        return []
+    items = item_payloads([row.id for row in rows])
+    return [
+        {
+            'id': row.id,
+            'order_number': row.order_number,
+            'user': row.user_id,
+            'shipping_address': row.shipping_address__id,
+            'shipping_address_details': address(row[SHIPPING]),
+            'billing_address': row.billing_address__id,
+            'billing_address_details': address(row[BILLING]),
+            'status': row.status,
+            'payment_status': row.payment_status,
+            'payment_method': row.payment_method,
+            'subtotal': money(row.subtotal),
+            'shipping_cost': money(row.shipping_cost),
+            'tax': money(row.tax),
+            'discount': money(row.discount),
+            'total': money(row.total),
+            'notes': row.notes,
+            'tracking_number': row.tracking_number,
+            'created_at': timestamp(row.created_at),
+            'items': items.get(row.id, []),
+        }
+        for row in rows
+    ]
+
+
+SUMMARY_COLUMNS = ('id', 'order_number', 'status', 'payment_status', 'total', 'created_at', 'item_count')
+
+
+def summary_rows(queryset):
+    """``queryset`` as named rows for summary_payloads, with each order's item count; one query, pageable."""
+    item_count = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(
+        count=Count('*')
+    ).values('count')
+    return queryset.annotate(item_count=Coalesce(Subquery(item_count), 0)).values_list(*SUMMARY_COLUMNS, named=True)
+
+
+def summary_payloads(rows):
+    return [
+        {
+            'id': row.id,
+            'order_number': row.order_number,
+            'status': row.status,
+            'payment_status': row.payment_status,
+            'total': money(row.total),
+            'item_count': row.item_count,
+            'created_at': timestamp(row.created_at),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,179 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySales, DailyVendorProductSales, Order, OrderItem
+
+PAID = 'paid'
+REFUNDED = 'refunded'
+
+DAILY_KEY = ('date',)
+VENDOR_PRODUCT_KEY = ('date', 'vendor_id', 'product_id')
+
+
+def increment(model, key_fields, rows, batch_size=500):
+    """
+    Add ``{key: {field: delta}}`` to rollup rows, creating missing rows
+    first. Each batch is one INSERT ... ignore-conflicts plus one UPDATE of
+    ``field = field + CASE ...``, so concurrent writers never lose updates.
+    Keys are processed in sorted order to keep lock order consistent.
+    """
+    items = sorted(rows.items())
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        model.objects.bulk_create(
+            [model(**dict(zip(key_fields, key))) for key, _ in batch],
+            ignore_conflicts=True,
+        )
+        match = Q()
+        cases = defaultdict(list)
+        for key, deltas in batch:
+            condition = Q(**dict(zip(key_fields, key)))
+            match |= condition
+            for field, delta in deltas.items():
+                cases[field].append(When(condition, then=Value(delta)))
+        model.objects.filter(match).update(**{
+            field: F(field) + Case(*whens, default=Value(0), output_field=model._meta.get_field(field))
+            for field, whens in cases.items()
+        })
+
+
+def transition(old_status, new_status):
+    """
+    How an order's payment status change moves it in the rollups, as
+    ``(paid, refunded)``: each +1 when it enters that status, -1 when it
+    leaves it, else 0. The backfill applies it from no status at all, so
+    both paths count every order by its current status.
+    """
+    def moved(status):
+        return (new_status == status) - (old_status == status)
+    return moved(PAID), moved(REFUNDED)
+
+
+def apply_order_placed(created_at):
+    """Count an order created at ``created_at`` in its day's placed orders."""
+    increment(DailySales, DAILY_KEY, {(timezone.localdate(created_at),): {'placed_orders': 1}})
+
+
+def line_totals(order_id):
+    """An order's units and revenue per vendor and product."""
+    return list(
+        OrderItem.objects.filter(order_id=order_id).order_by().values('vendor_id', 'product_id').annotate(
+            units=Sum('quantity'), revenue=Sum('total')
+        )
+    )
+
+
+def sale_deltas(created_at, total, lines, paid, refunded, placed=0):
+    """
+    The ``(daily, vendor_product)`` rollup deltas of moving an order by
+    ``paid`` and ``refunded`` (see transition) and ``placed``; ``lines``
+    are its line_totals, needed only when ``paid`` is set.
+    """
+    day = timezone.localdate(created_at)
+    daily = {
+        'orders': paid, 'revenue': paid * total,
+        'refunded_orders': refunded, 'refunds': refunded * total,
+    }
+    if placed:
+        daily['placed_orders'] = placed
+
+    vendor_product = {}
+    if paid:
+        vendor_product = {
+            (day, line['vendor_id'], line['product_id']): {
+                'units': paid * line['units'],
+                'revenue': paid * line['revenue'],
+            }
+            for line in lines
+        }
+    return {(day,): daily}, vendor_product
+
+
+def apply_deltas(daily, vendor_product):
+    with transaction.atomic():
+        increment(DailySales, DAILY_KEY, daily)
+        increment(DailyVendorProductSales, VENDOR_PRODUCT_KEY, vendor_product)
+
+
+def apply_payment_change(order_id, old_status, new_status):
+    """Fold one order's payment status change into the daily rollups."""
+    paid, refunded = transition(old_status, new_status)
+    if not (paid or refunded):
+        return
+    order = Order.objects.only('created_at', 'total').get(pk=order_id)
+    lines = line_totals(order_id) if paid else []
+    apply_deltas(*sale_deltas(order.created_at, order.total, lines, paid, refunded))
+
+
+def order_sales(order_id):
+    """
+    What an order counts for in the rollups, for apply_order_deleted. Read
+    it before the delete: the order's items are deleted along with it.
+    """
+    sales = Order.objects.filter(pk=order_id).values('created_at', 'total', 'payment_status').first()
+    if sales is not None:
+        paid, _ = transition(sales['payment_status'], None)
+        sales['lines'] = line_totals(order_id) if paid else []
+    return sales
+
+
+def apply_order_deleted(sales):
+    """Take a deleted order, as order_sales read it, back out of every rollup it was counted in."""
+    paid, refunded = transition(sales['payment_status'], None)
+    apply_deltas(*sale_deltas(sales['created_at'], sales['total'], sales['lines'], paid, refunded, placed=-1))
+
+
+def backfill(chunk_size=5000):
+    """
+    Rebuild both rollup tables from order history, ``chunk_size`` orders at
+    a time. Run while payment statuses are not changing, since incremental
+    updates made during the rebuild could be counted twice. Yields the
+    number of orders processed after each chunk.
+    """
+    DailySales.objects.all().delete()
+    DailyVendorProductSales.objects.all().delete()
+
+    processed = 0
+    last_id = 0
+    while True:
+        ids = list(Order.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+
+        daily = defaultdict(dict)
+        totals = Order.objects.filter(pk__in=ids).annotate(day=TruncDate('created_at')).order_by().values(
+            'day', 'payment_status'
+        ).annotate(count=Count('id'), amount=Sum('total'))
+        paid_statuses = set()
+        for row in totals:
+            paid, refunded = transition(None, row['payment_status'])
+            if paid:
+                paid_statuses.add(row['payment_status'])
+            deltas = {
+                'placed_orders': row['count'],
+                'orders': paid * row['count'], 'revenue': paid * row['amount'],
+                'refunded_orders': refunded * row['count'], 'refunds': refunded * row['amount'],
+            }
+            day = daily[(row['day'],)]
+            for field, delta in deltas.items():
+                day[field] = day.get(field, 0) + delta
+
+        items = OrderItem.objects.filter(order_id__in=ids, order__payment_status__in=paid_statuses).annotate(
+            day=TruncDate('order__created_at')
+        ).order_by().values('day', 'vendor_id', 'product_id').annotate(units=Sum('quantity'), revenue=Sum('total'))
+        vendor_product = {
+            (row['day'], row['vendor_id'], row['product_id']): {'units': row['units'], 'revenue': row['revenue']}
+            for row in items
+        }
+
+        with transaction.atomic():
+            increment(DailySales, DAILY_KEY, daily)
+            increment(DailyVendorProductSales, VENDOR_PRODUCT_KEY, vendor_product)
+
+        processed += len(ids)
+        last_id = ids[-1]
+        yield processed
@@ -1,6 +1,13 @@
+from django.db import transaction
 from rest_framework import serializers
+from .fulfillment import invalidate_counts
 from .models import Order, OrderItem, Payment
+from .numbering import create_numbered
+from .pricing import price_cart
+from .stock import InsufficientStock, UnknownProducts, decrement_stock, reserve_stock, short_products
+from users.models import Address
 from users.serializers import AddressSerializer
+from products.models import Product
 from products.serializers import ProductSerializer
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -12,10 +19,16 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'product_details', 'vendor', 'total']
     
     def get_product_details(self, obj):
+        product = obj.product
+        # Projected by Order.objects.for_serialization(); otherwise one query
+        primary_images = getattr(product, 'primary_images', None)
+        if primary_images is None:
+            primary_images = product.images.filter(is_primary=True)[:1]
+        image = next(iter(primary_images), None)
         return {
-            'id': obj.product.id,
-            'name': obj.product.name,
-            'image': obj.product.images.filter(is_primary=True).first().image.url if obj.product.images.filter(is_primary=True).exists() else None
+            'id': product.id,
+            'name': product.name,
+            'image': image.image.url if image else None
         }
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -43,72 +56,139 @@ class OrderSerializer(serializers.ModelSerializer):
             return AddressSerializer(obj.billing_address).data
         return None
 
+def validate_items(items):
+    if not items:
+        raise serializers.ValidationError("An order needs at least one item.")
+    for item in items:
+        try:
+            item['product'] = int(item['product'])
+            item['quantity'] = int(item['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise serializers.ValidationError("Each item needs a product id and a quantity.")
+        if item['quantity'] < 1:
+            raise serializers.ValidationError("Item quantities must be positive.")
+    return items
+
+def merge_quantities(items):
+    """``{product_id: quantity}`` with repeated lines for the same product merged."""
+    quantities = {}
+    for item in items:
+        quantities[item['product']] = quantities.get(item['product'], 0) + item['quantity']
+    return quantities
+
 class OrderCreateSerializer(serializers.ModelSerializer):
     items = serializers.ListField(
         child=serializers.DictField(),
         write_only=True
     )
+    # Token from StockReservationSerializer; its held units are used first
+    reservation = serializers.UUIDField(required=False, write_only=True)
     
     class Meta:
         model = Order
         fields = [
             'shipping_address', 'billing_address', 'payment_method',
-            'notes', 'items'
+            'notes', 'items', 'reservation'
         ]
     
+    def get_fields(self):
+        fields = super().get_fields()
+        # Only the customer's own addresses can be shipped or billed to
+        addresses = Address.objects.filter(user=self.context['request'].user)
+        fields['shipping_address'].queryset = addresses
+        fields['billing_address'].queryset = addresses
+        return fields
+    
+    def validate_items(self, items):
+        return validate_items(items)
+    
     def create(self, validated_data):
         items_data = validated_data.pop('items')
+        reservation = validated_data.pop('reservation', None)
         user = self.context['request'].user
+        quantities = merge_quantities(items_data)
         
-        # Calculate order totals
-        subtotal = sum(item['price'] * item['quantity'] for item in items_data)
-        shipping_cost = 0  # Could be calculated based on location, weight, etc.
-        tax = subtotal * 0.18  # 18% GST
-        total = subtotal + shipping_cost + tax
+        try:
+            with transaction.atomic():
+                products = Product.objects.filter(is_active=True).select_related('category').in_bulk(quantities.keys())
+                missing = set(quantities) - set(products)
+                if missing:
+                    raise serializers.ValidationError({'items': f"Unknown products: {sorted(missing)}"})
+                
+                decrement_stock(quantities, user=user, reservation=reservation)
+                quote = price_cart((products[pk], quantity) for pk, quantity in quantities.items())
+                order = self.create_order(user, quote, validated_data)
+        except InsufficientStock:
+            names = short_products(quantities, user=user, reservation=reservation)
+            raise serializers.ValidationError({'items': f"Insufficient stock for: {', '.join(names)}"})
         
-        # Generate order number
-        import random
-        import string
-        order_number = ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
-        
-        # Create order
-        order = Order.objects.create(
+        return order
+    
+    def create_order(self, user, quote, validated_data):
+        # Totals come from the stored product prices, never from the client
+        order = create_numbered(lambda order_number: Order.objects.create(
             user=user,
             order_number=order_number,
-            subtotal=subtotal,
-            shipping_cost=shipping_cost,
-            tax=tax,
-            total=total,
+            subtotal=quote.subtotal,
+            shipping_cost=quote.shipping_cost,
+            tax=quote.tax,
+            discount=quote.discount,
+            total=quote.total,
             **validated_data
-        )
+        ))
         
-        # Create order items
-        for item_data in items_data:
-            product_id = item_data['product']
-            quantity = item_data['quantity']
-            price = item_data['price']
-            
-            from products.models import Product
-            product = Product.objects.get(id=product_id)
-            
-            OrderItem.objects.create(
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 order=order,
-                product=product,
-                vendor=product.vendor,
-                quantity=quantity,
-                price=price,
-                total=price * quantity
+                product=line.product,
+                vendor_id=line.product.vendor_id,
+                quantity=line.quantity,
+                price=line.unit_price,
+                total=line.total,
             )
-            
-            # Update product quantity
-            product.quantity -= quantity
-            product.save()
+            for line in quote.lines
+        ])
+        # bulk_create sends no signals
+        invalidate_counts(*[line.product.vendor_id for line in quote.lines])
         
         return order
 
+class StockReservationSerializer(serializers.Serializer):
+    """Holds the items of a checkout while the customer pays; see orders.stock."""
+    items = serializers.ListField(child=serializers.DictField(), write_only=True)
+    reservation = serializers.UUIDField(read_only=True)
+    expires_at = serializers.DateTimeField(read_only=True)
+    
+    def validate_items(self, items):
+        return validate_items(items)
+    
+    def create(self, validated_data):
+        quantities = merge_quantities(validated_data['items'])
+        try:
+            token, expires_at = reserve_stock(self.context['request'].user, quantities)
+        except UnknownProducts as error:
+            raise serializers.ValidationError({'items': f"Unknown products: {error.ids}"})
+        except InsufficientStock as error:
+            raise serializers.ValidationError({'items': f"Insufficient stock for: {', '.join(error.names)}"})
+        return {'reservation': token, 'expires_at': expires_at}
+
 class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = ['id', 'order', 'payment_id', 'amount', 'status', 'payment_method', 'created_at']
         read_only_fields = ['id', 'created_at']
 
+
+class FulfillmentUpdateSerializer(serializers.Serializer):
+    """A vendor's bulk update of its lines, chosen by id (``items``) and/or by order (``orders``)."""
+    items = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+    orders = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+    status = serializers.ChoiceField(choices=OrderItem.STATUS_CHOICES, required=False)
+    tracking_number = serializers.CharField(max_length=100, required=False, allow_blank=True, allow_null=True)
+    
+    def validate(self, attrs):
+        if not attrs.get('items') and not attrs.get('orders'):
+            raise serializers.ValidationError("Choose the lines to update with items or orders")
+        if 'status' not in attrs and 'tracking_number' not in attrs:
+            raise serializers.ValidationError("Nothing to update: give a status or a tracking_number")
+        return attrs
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .fulfillment import invalidate_counts
+from .models import Order, OrderItem
+from .rollups import apply_order_deleted, apply_order_placed, apply_payment_change, order_sales, transition
+
+
+@receiver(pre_save, sender=Order)
+def remember_payment_status(sender, instance, **kwargs):
+    instance._previous_payment_status = None
+    if instance.pk:
+        instance._previous_payment_status = (
+            Order.objects.filter(pk=instance.pk).values_list('payment_status', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Order)
+def update_sales_rollups(sender, instance, created=False, **kwargs):
+    if created:
+        transaction.on_commit(lambda: apply_order_placed(instance.created_at))
+    old_status = getattr(instance, '_previous_payment_status', None)
+    new_status = instance.payment_status
+    if any(transition(old_status, new_status)):
+        # Deferred to commit so the order's items are in place
+        transaction.on_commit(lambda: apply_payment_change(instance.pk, old_status, new_status))
+
+
+@receiver(pre_delete, sender=Order)
+def remember_sales(sender, instance, **kwargs):
+    instance._previous_sales = order_sales(instance.pk)
+
+
+@receiver(post_delete, sender=Order)
+def uncount_deleted_order(sender, instance, **kwargs):
+    sales = getattr(instance, '_previous_sales', None)
+    if sales is not None:
+        transaction.on_commit(lambda: apply_order_deleted(sales))
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_fulfillment_counts(sender, instance, **kwargs):
+    invalidate_counts(instance.vendor_id)
@@ -0,0 +1,138 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from products.cache import invalidate
+from products.models import Product
+from .models import StockReservation
+
+SWEEP_BATCH_SIZE = 5000
+
+
+class InsufficientStock(Exception):
+    def __init__(self, names=()):
+        self.names = list(names)
+        super().__init__(', '.join(self.names))
+
+
+class UnknownProducts(Exception):
+    def __init__(self, ids):
+        self.ids = sorted(ids)
+        super().__init__(self.ids)
+
+
+def held_units(exclude=None):
+    """
+    Units of the outer product held by unexpired reservations, as a
+    subquery on ``OuterRef('pk')`` served by the (product, expires_at)
+    index. Reservations matching the ``exclude`` Q are not counted.
+    """
+    holds = StockReservation.objects.filter(product=OuterRef('pk'), expires_at__gt=timezone.now())
+    if exclude is not None:
+        holds = holds.exclude(exclude)
+    total = holds.order_by().values('product').annotate(total=Sum('quantity')).values('total')
+    return Coalesce(Subquery(total), 0, output_field=IntegerField())
+
+
+def available_stock(product_ids):
+    """``{product_id: units not held by any reservation}`` in one query."""
+    return dict(
+        Product.objects.filter(pk__in=product_ids).annotate(available=F('quantity') - held_units()).values_list(
+            'pk', 'available'
+        )
+    )
+
+
+def own_holds(user, reservation):
+    return Q(user=user, token=reservation) if reservation is not None else None
+
+
+def short_products(quantities, user=None, reservation=None):
+    """Names of the products whose available stock is below the quantity asked for."""
+    rows = Product.objects.filter(pk__in=list(quantities)).annotate(
+        available=F('quantity') - held_units(own_holds(user, reservation))
+    ).values_list('pk', 'name', 'available')
+    return [name for pk, name, available in rows if available < quantities[pk]]
+
+
+def reserve_stock(user, quantities, ttl=None):
+    """
+    Hold ``{product_id: quantity}`` for ``user`` for ``ttl`` seconds
+    (STOCK_RESERVATION_TTL by default) and return the reservation token and
+    its expiry. The user's earlier holds are released first, so abandoning a
+    checkout and starting another cannot pile up stock. Raises
+    UnknownProducts or InsufficientStock and holds nothing if any product
+    falls short.
+    """
+    ttl = settings.STOCK_RESERVATION_TTL if ttl is None else ttl
+    token = uuid.uuid4()
+    with transaction.atomic():
+        StockReservation.objects.filter(user=user).delete()
+        # Locking the product rows serializes reservations and checkouts of
+        # the same product; the order keeps concurrent reservers from deadlocking.
+        products = list(
+            Product.objects.select_for_update().filter(pk__in=quantities, is_active=True).annotate(
+                available=F('quantity') - held_units()
+            ).order_by('pk').only('pk', 'name', 'quantity')
+        )
+        missing = set(quantities) - {product.pk for product in products}
+        if missing:
+            raise UnknownProducts(missing)
+        short = [product.name for product in products if product.available < quantities[product.pk]]
+        if short:
+            raise InsufficientStock(short)
+
+        expires_at = timezone.now() + timedelta(seconds=ttl)
+        StockReservation.objects.bulk_create([
+            StockReservation(token=token, user=user, product_id=pk, quantity=quantity, expires_at=expires_at)
+            for pk, quantity in quantities.items()
+        ])
+    return token, expires_at
+
+
+def release_reservation(user, token):
+    """Drop the user's holds under ``token``; returns whether there were any."""
+    deleted, _ = StockReservation.objects.filter(user=user, token=token).delete()
+    return bool(deleted)
+
+
+def decrement_stock(quantities, user=None, reservation=None):
+    """
+    Decrement stock for ``{product_id: quantity}`` in a single conditional
+    UPDATE. Rows only change while they still hold enough units that are
+    not reserved by other checkouts, so concurrent checkouts can never drive
+    stock below zero or take held units. Units ``user`` holds under
+    ``reservation`` count as available and the reservation is consumed. Must
+    run inside a transaction: InsufficientStock is raised when any product
+    falls short so the caller rolls back the rows that were decremented.
+    """
+    needed = Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+    own = own_holds(user, reservation)
+
+    updated = Product.objects.filter(pk__in=list(quantities), quantity__gte=held_units(own) + needed).update(
+        quantity=F('quantity') - needed
+    )
+    if updated != len(quantities):
+        raise InsufficientStock()
+    if own is not None:
+        StockReservation.objects.filter(own).delete()
+    invalidate('catalog', *[f'product:{pk}' for pk in quantities])
+
+
+def sweep_expired_reservations(batch_size=SWEEP_BATCH_SIZE):
+    """Delete expired reservations in batches; returns how many were removed."""
+    removed = 0
+    now = timezone.now()
+    while True:
+        ids = list(StockReservation.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return removed
+        removed += StockReservation.objects.filter(pk__in=ids).delete()[0]
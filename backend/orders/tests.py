@@ -1,3 +1,703 @@
-from django.test import TestCase
+import multiprocessing
+import random
+import threading
+import time
+from decimal import ROUND_HALF_UP, Decimal
+from fractions import Fraction
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from products.models import Category, Product, ProductImage
+from users.models import Address, User, Vendor
+from .models import DailySales, DailyVendorProductSales, Order, OrderItem, StockReservation
+from .numbering import MAX_SEQUENCE, SnowflakeOrderNumberGenerator
+from .pricing import price_cart
+from .fulfillment import vendor_orders
+from .projections import order_payloads, order_rows, summary_rows
+from .rollups import backfill
+from .serializers import OrderCreateSerializer, OrderSerializer
+from .stock import (
+    InsufficientStock, UnknownProducts, available_stock, reserve_stock, sweep_expired_reservations,
+)
+
+
+def make_catalog():
+    vendor_user = User.objects.create_user(email='vendor@example.com', password='pass12345', name='Vendor', role='vendor')
+    vendor = Vendor.objects.create(user=vendor_user, business_name='Spice World')
+    turmeric = Product.objects.create(vendor=vendor, name='Turmeric', slug='turmeric', price=Decimal('150.00'), quantity=5)
+    pepper = Product.objects.create(vendor=vendor, name='Pepper', slug='pepper', price=Decimal('90.00'), quantity=2)
+    return vendor, turmeric, pepper
+
+
+def place_order(user, items, **data):
+    serializer = OrderCreateSerializer(
+        data={'payment_method': 'cod', 'items': items, **data},
+        context={'request': SimpleNamespace(user=user)},
+    )
+    serializer.is_valid(raise_exception=True)
+    return serializer.save()
+
+
+class OrderCreateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor, cls.turmeric, cls.pepper = make_catalog()
+        cls.customer = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+
+    def test_creates_order_and_decrements_stock(self):
+        order = place_order(self.customer, [
+            {'product': self.turmeric.id, 'quantity': 2, 'price': 150},
+            {'product': self.pepper.id, 'quantity': 1, 'price': 90},
+        ])
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(set(order.items.values_list('vendor_id', flat=True)), {self.vendor.id})
+        self.turmeric.refresh_from_db()
+        self.pepper.refresh_from_db()
+        self.assertEqual((self.turmeric.quantity, self.pepper.quantity), (3, 1))
+
+    def test_totals_use_stored_prices(self):
+        order = place_order(self.customer, [
+            {'product': self.turmeric.id, 'quantity': 2, 'price': 1},
+            {'product': self.pepper.id, 'quantity': 1},
+        ])
+        self.assertEqual(order.subtotal, Decimal('390.00'))
+        self.assertEqual(order.tax, Decimal('70.20'))
+        self.assertEqual(order.total, Decimal('460.20'))
+        self.assertEqual(order.items.get(product=self.turmeric).price, Decimal('150.00'))
+
+    def test_insufficient_stock_rolls_back_everything(self):
+        with self.assertRaisesMessage(serializers.ValidationError, 'Pepper'):
+            place_order(self.customer, [
+                {'product': self.turmeric.id, 'quantity': 1, 'price': 150},
+                {'product': self.pepper.id, 'quantity': 3, 'price': 90},
+            ])
+        self.turmeric.refresh_from_db()
+        self.assertEqual(self.turmeric.quantity, 5)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_repeated_lines_are_checked_together(self):
+        with self.assertRaises(serializers.ValidationError):
+            place_order(self.customer, [
+                {'product': self.pepper.id, 'quantity': 2, 'price': 90},
+                {'product': self.pepper.id, 'quantity': 1, 'price': 90},
+            ])
+        self.pepper.refresh_from_db()
+        self.assertEqual(self.pepper.quantity, 2)
+
+    def test_unknown_product_is_rejected(self):
+        with self.assertRaisesMessage(serializers.ValidationError, 'Unknown products'):
+            place_order(self.customer, [{'product': 999999, 'quantity': 1, 'price': 1}])
+
+    def test_addresses_must_belong_to_the_customer(self):
+        other = User.objects.create_user(email='other@example.com', password='pass12345', name='Other')
+        theirs = Address.objects.create(
+            user=other, address_line1='1 Lane', city='Kochi', state='Kerala', postal_code='682001',
+        )
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        for field in ('shipping_address', 'billing_address'):
+            response = client.post('/api/orders/', {
+                'payment_method': 'cod', field: theirs.id, 'items': [{'product': self.pepper.id, 'quantity': 1}],
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(field, response.json())
+        self.assertFalse(Order.objects.exists())
+
+        mine = Address.objects.create(
+            user=self.customer, address_line1='2 Lane', city='Pune', state='Maharashtra', postal_code='411001',
+        )
+        order = place_order(self.customer, [{'product': self.pepper.id, 'quantity': 1}], shipping_address=mine.id)
+        self.assertEqual(order.shipping_address, mine)
+
+    def test_query_count_does_not_grow_with_items(self):
+        # savepoint, product fetch, stock update, order insert in its own savepoint, item insert, release
+        with self.assertNumQueries(8):
+            place_order(self.customer, [
+                {'product': self.turmeric.id, 'quantity': 1, 'price': 150},
+                {'product': self.pepper.id, 'quantity': 1, 'price': 90},
+            ])
+
+
+class StockReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor, cls.turmeric, cls.pepper = make_catalog()
+        cls.customer = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+        cls.rival = User.objects.create_user(email='rival@example.com', password='pass12345', name='Rival')
+
+    def test_held_units_are_kept_for_the_holder(self):
+        token, _ = reserve_stock(self.customer, {self.pepper.id: 2})
+        self.assertEqual(available_stock([self.pepper.id]), {self.pepper.id: 0})
+
+        with self.assertRaises(InsufficientStock):
+            reserve_stock(self.rival, {self.pepper.id: 1})
+        with self.assertRaisesMessage(serializers.ValidationError, 'Pepper'):
+            place_order(self.rival, [{'product': self.pepper.id, 'quantity': 1}])
+
+        order = place_order(self.customer, [{'product': self.pepper.id, 'quantity': 2}], reservation=token)
+        self.assertEqual(order.items.get().quantity, 2)
+        self.pepper.refresh_from_db()
+        self.assertEqual(self.pepper.quantity, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_holds_free_their_units_and_are_swept(self):
+        reserve_stock(self.customer, {self.pepper.id: 2, self.turmeric.id: 1}, ttl=0)
+        self.assertEqual(available_stock([self.pepper.id]), {self.pepper.id: 2})
+        place_order(self.rival, [{'product': self.pepper.id, 'quantity': 2}])
+        self.assertEqual(sweep_expired_reservations(batch_size=1), 2)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_a_new_reservation_replaces_the_previous_one(self):
+        reserve_stock(self.customer, {self.pepper.id: 2})
+        token, _ = reserve_stock(self.customer, {self.pepper.id: 1})
+        self.assertEqual(list(StockReservation.objects.values_list('token', 'quantity')), [(token, 1)])
+        with self.assertRaises(UnknownProducts):
+            reserve_stock(self.customer, {999999: 1})
+
+    def test_reservation_endpoints(self):
+        client = APIClient()
+        response = client.post('/api/orders/reservations/', {'items': []}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+        client.force_authenticate(self.customer)
+        response = client.post(
+            '/api/orders/reservations/', {'items': [{'product': self.turmeric.id, 'quantity': 6}]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        response = client.post(
+            '/api/orders/reservations/', {'items': [{'product': self.turmeric.id, 'quantity': 2}]}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        token = response.json()['reservation']
+
+        response = client.post('/api/orders/', {
+            'payment_method': 'card', 'reservation': token,
+            'items': [{'product': self.turmeric.id, 'quantity': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['items'][0]['quantity'], 2)
+        self.assertEqual(client.delete(f'/api/orders/reservations/{token}/').status_code, 404)
+
+
+class OrderSerializerQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor, _, _ = make_catalog()
+        cls.customer = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+
+    def make_order(self, items):
+        order = Order.objects.create(
+            user=self.customer, order_number=f'TEST{items}', payment_method='cod',
+            subtotal=0, total=0,
+        )
+        for i in range(items):
+            product = Product.objects.create(vendor=self.vendor, name=f'Item {i}', slug=f'item-{items}-{i}', price=10)
+            ProductImage.objects.create(product=product, image=f'product_images/{i}-extra.jpg')
+            ProductImage.objects.create(product=product, image=f'product_images/{i}.jpg', is_primary=True)
+            OrderItem.objects.create(order=order, product=product, vendor=self.vendor, quantity=1, price=10, total=10)
+        return order
+
+    def render(self, order):
+        return OrderSerializer(Order.objects.for_serialization().get(pk=order.pk)).data
+
+    def test_constant_queries_regardless_of_item_count(self):
+        for items in (1, 50):
+            order = self.make_order(items)
+            # order (with addresses), items (with products), primary images
+            with self.assertNumQueries(3):
+                data = self.render(order)
+            self.assertEqual(len(data['items']), items)
+
+    def test_primary_image_is_rendered(self):
+        order = self.make_order(1)
+        details = self.render(order)['items'][0]['product_details']
+        self.assertEqual(details['image'], '/media/product_images/0.jpg')
+
+        ProductImage.objects.filter(is_primary=True).delete()
+        details = self.render(order)['items'][0]['product_details']
+        self.assertIsNone(details['image'])
+
+
+class OrderProjectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor, turmeric, pepper = make_catalog()
+        customer = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+        home = Address.objects.create(
+            user=customer, address_line1='123 Main St', city='Pune', state='Maharashtra', postal_code='411001',
+        )
+        ProductImage.objects.create(product=turmeric, image='product_images/t.jpg', is_primary=True)
+        place_order(customer, [{'product': turmeric.id, 'quantity': 2}, {'product': pepper.id, 'quantity': 1}],
+                    shipping_address=home.id, notes='Leave at the door')
+        Order.objects.create(user=customer, order_number='EMPTY1', payment_method='card', subtotal=0, total=0)
+
+    def test_matches_serializer(self):
+        queryset = Order.objects.order_by('-created_at', '-id')
+        expected = OrderSerializer(queryset.for_serialization(), many=True).data
+        self.assertEqual(
+            JSONRenderer().render(order_payloads(order_rows(queryset))), JSONRenderer().render(expected)
+        )
+
+    def test_two_queries(self):
+        with self.assertNumQueries(2):
+            order_payloads(order_rows(Order.objects.all()))
+
+
+class OrderHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor, cls.turmeric, cls.pepper = make_catalog()
+        cls.customer = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+        home = Address.objects.create(
+            user=cls.customer, address_line1='123 Main St', city='Pune', state='Maharashtra', postal_code='411001',
+        )
+        cls.orders = [
+            place_order(cls.customer, [{'product': cls.turmeric.id, 'quantity': 1}], shipping_address=home.id),
+            place_order(cls.customer, [{'product': cls.turmeric.id, 'quantity': 1}, {'product': cls.pepper.id, 'quantity': 1}]),
+            Order.objects.create(user=cls.customer, order_number='EMPTY1', payment_method='card', subtotal=0, total=0),
+        ]
+        cls.other = User.objects.create_user(email='other@example.com', password='pass12345', name='Other')
+        cls.others_order = place_order(cls.other, [{'product': cls.pepper.id, 'quantity': 1}])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def test_lists_own_orders_newest_first_in_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/orders/', {'page_size': 2}).json()
+        self.assertEqual(
+            [(order['order_number'], order['item_count']) for order in data['results']],
+            [('EMPTY1', 0), (self.orders[1].order_number, 2)],
+        )
+        self.assertEqual(set(data['results'][0]), {
+            'id', 'order_number', 'status', 'payment_status', 'total', 'item_count', 'created_at',
+        })
+        data = self.client.get(data['next']).json()
+        self.assertEqual([order['id'] for order in data['results']], [self.orders[0].id])
+        self.assertIsNone(data['next'])
+
+    def test_detail_renders_the_full_order(self):
+        order = self.orders[0]
+        response = self.client.get(f'/api/orders/{order.id}/')
+        expected = OrderSerializer(Order.objects.for_serialization().get(pk=order.pk)).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_other_customers_orders_are_hidden(self):
+        self.assertEqual(self.client.get(f'/api/orders/{self.others_order.id}/').status_code, 404)
+        self.assertNotIn(self.others_order.id, [order['id'] for order in self.client.get('/api/orders/').json()['results']])
+
+    def test_requires_authentication(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/orders/').status_code, 401)
+        self.assertEqual(client.get(f'/api/orders/{self.orders[0].id}/').status_code, 401)
+
+    def test_history_uses_the_user_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan text is SQLite specific')
+        queryset = summary_rows(Order.objects.filter(user=self.customer)).order_by('-created_at', '-id')[:10]
+        plan = queryset.explain()
+        self.assertIn('order_user_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class VendorFulfillmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor, cls.turmeric, cls.pepper = make_catalog()
+        other_user = User.objects.create_user(email='other@example.com', password='pass12345', name='Other', role='vendor')
+        other_vendor = Vendor.objects.create(user=other_user, business_name='Tea House')
+        cls.tea = Product.objects.create(vendor=other_vendor, name='Tea', slug='tea', price=Decimal('50.00'), quantity=9)
+        cls.customer = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+        home = Address.objects.create(
+            user=cls.customer, address_line1='123 Main St', city='Pune', state='Maharashtra', postal_code='411001',
+        )
+        cls.first = place_order(cls.customer, [{'product': cls.turmeric.id, 'quantity': 1}], shipping_address=home.id)
+        cls.second = place_order(cls.customer, [
+            {'product': cls.turmeric.id, 'quantity': 1}, {'product': cls.pepper.id, 'quantity': 1},
+            {'product': cls.tea.id, 'quantity': 1},
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendor.user)
+
+    def test_lists_own_lines_grouped_by_order(self):
+        with self.assertNumQueries(4):
+            data = self.client.get('/api/orders/vendor/orders/').json()
+        self.assertEqual(
+            [(group['order_number'], [item['product_name'] for item in group['items']]) for group in data['results']],
+            [(self.second.order_number, ['Turmeric', 'Pepper']), (self.first.order_number, ['Turmeric'])],
+        )
+        self.assertEqual(data['results'][1]['shipping_address_details']['city'], 'Pune')
+        self.assertEqual(data['counts']['pending'], 3)
+
+        data = self.client.get('/api/orders/vendor/orders/', {'page_size': 1}).json()
+        data = self.client.get(data['next']).json()
+        self.assertEqual([group['order'] for group in data['results']], [self.first.id])
+
+    def test_lines_take_their_orders_date(self):
+        self.first.items.create(product=self.pepper, vendor=self.vendor, quantity=1, price=90, total=90)
+        OrderItem.objects.bulk_create([
+            OrderItem(order_id=self.second.id, product=self.pepper, vendor=self.vendor, quantity=1, price=90, total=90),
+        ])
+        for order in (self.first, self.second):
+            self.assertEqual(set(order.items.values_list('order_created_at', flat=True)), {order.created_at})
+
+        # A later page still lists the order with its new line
+        data = self.client.get('/api/orders/vendor/orders/', {'page_size': 1}).json()
+        data = self.client.get(data['next']).json()
+        self.assertEqual([len(group['items']) for group in data['results']], [2])
+
+    def test_status_filter(self):
+        item = self.second.items.get(product=self.pepper)
+        OrderItem.objects.filter(pk=item.pk).update(status='shipped')
+        data = self.client.get('/api/orders/vendor/orders/', {'status': 'shipped'}).json()
+        self.assertEqual([[line['id'] for line in group['items']] for group in data['results']], [[item.id]])
+        self.assertEqual(self.client.get('/api/orders/vendor/orders/', {'status': 'lost'}).status_code, 400)
+
+    def test_bulk_update_is_one_statement_and_scoped_to_the_vendor(self):
+        tea_line = self.second.items.get(product=self.tea)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get('/api/orders/vendor/orders/').json()['counts']['shipped'], 0)
+            with self.assertNumQueries(2):
+                response = self.client.patch('/api/orders/vendor/orders/items/', {
+                    'orders': [self.second.id], 'items': [tea_line.id], 'status': 'shipped', 'tracking_number': 'TRK1',
+                }, format='json')
+        self.assertEqual(response.json(), {'updated': 2})
+        tea_line.refresh_from_db()
+        self.assertEqual(tea_line.status, 'pending')
+        self.assertEqual(
+            set(OrderItem.objects.filter(tracking_number='TRK1').values_list('product', flat=True)),
+            {self.turmeric.id, self.pepper.id},
+        )
+        counts = self.client.get('/api/orders/vendor/orders/').json()['counts']
+        self.assertEqual((counts['pending'], counts['shipped']), (1, 2))
+
+    def test_counts_are_cached_until_lines_change(self):
+        self.client.get('/api/orders/vendor/orders/')
+        with self.assertNumQueries(3):
+            self.client.get('/api/orders/vendor/orders/')
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.customer, [{'product': self.pepper.id, 'quantity': 1}])
+        self.assertEqual(self.client.get('/api/orders/vendor/orders/').json()['counts']['pending'], 4)
+
+    def test_update_validation_and_access(self):
+        url = '/api/orders/vendor/orders/items/'
+        self.assertEqual(self.client.patch(url, {'status': 'shipped'}, format='json').status_code, 400)
+        self.assertEqual(self.client.patch(url, {'items': [1]}, format='json').status_code, 400)
+        self.assertEqual(self.client.patch(url, {'items': [1], 'status': 'lost'}, format='json').status_code, 400)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/orders/vendor/orders/').status_code, 403)
+        self.assertEqual(self.client.patch(url, {'items': [1], 'status': 'shipped'}, format='json').status_code, 403)
+
+    def test_vendor_page_uses_the_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan text is SQLite specific')
+        plan = vendor_orders(self.vendor).order_by('-order_created_at', '-order_id')[:10].explain()
+        self.assertIn('COVERING INDEX orderitem_vendor_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor, cls.turmeric, cls.pepper = make_catalog()
+        cls.customer = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+
+    def make_order(self, lines, payment_status='pending'):
+        total = sum(Decimal(price) * quantity for _, quantity, price in lines)
+        order = Order.objects.create(
+            user=self.customer, order_number=f'ORD{Order.objects.count()}', payment_method='card',
+            payment_status=payment_status, subtotal=total, total=total,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, vendor=self.vendor, quantity=quantity,
+                      price=price, total=Decimal(price) * quantity)
+            for product, quantity, price in lines
+        ])
+        return order
+
+    def set_status(self, order, payment_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            order.payment_status = payment_status
+            order.save()
+
+    def snapshot(self):
+        daily = list(DailySales.objects.values_list('orders', 'revenue', 'refunded_orders', 'refunds'))
+        products = dict(DailyVendorProductSales.objects.values_list('product_id', 'units'))
+        revenue = dict(DailyVendorProductSales.objects.values_list('product_id', 'revenue'))
+        return daily, products, revenue
+
+    def test_paid_and_refunded_transitions(self):
+        first = self.make_order([(self.turmeric, 2, '150'), (self.pepper, 1, '90')])
+        second = self.make_order([(self.turmeric, 1, '150')])
+
+        self.set_status(first, 'paid')
+        self.set_status(second, 'paid')
+        daily, units, revenue = self.snapshot()
+        self.assertEqual(daily, [(2, Decimal('540'), 0, Decimal('0'))])
+        self.assertEqual(units, {self.turmeric.id: 3, self.pepper.id: 1})
+        self.assertEqual(revenue[self.turmeric.id], Decimal('450'))
+
+        self.set_status(second, 'refunded')
+        daily, units, _ = self.snapshot()
+        self.assertEqual(daily, [(1, Decimal('390'), 1, Decimal('150'))])
+        self.assertEqual(units, {self.turmeric.id: 2, self.pepper.id: 1})
+
+    def test_refunds_are_counted_by_current_status(self):
+        unpaid = self.make_order([(self.pepper, 1, '90')])
+        reversed_refund = self.make_order([(self.turmeric, 1, '150')])
+        self.set_status(unpaid, 'refunded')
+        self.set_status(reversed_refund, 'paid')
+        self.set_status(reversed_refund, 'refunded')
+        self.assertEqual(self.snapshot()[0], [(0, Decimal('0'), 2, Decimal('240'))])
+
+        self.set_status(reversed_refund, 'paid')
+        daily, units, _ = self.snapshot()
+        self.assertEqual(daily, [(1, Decimal('150'), 1, Decimal('90'))])
+        self.assertEqual(units, {self.turmeric.id: 1})
+
+        incremental = self.snapshot()
+        list(backfill())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_non_payment_changes_are_ignored(self):
+        order = self.make_order([(self.pepper, 1, '90')])
+        self.set_status(order, 'failed')
+        self.assertFalse(DailySales.objects.exists())
+
+        self.set_status(order, 'paid')
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = 'shipped'
+            order.save()
+        self.assertEqual(self.snapshot()[0], [(1, Decimal('90'), 0, Decimal('0'))])
+
+    def test_backfill_matches_incremental_rollups(self):
+        paid = self.make_order([(self.turmeric, 2, '150'), (self.pepper, 1, '90')])
+        refunded = self.make_order([(self.turmeric, 1, '150')])
+        self.make_order([(self.pepper, 1, '90')])
+        self.set_status(paid, 'paid')
+        self.set_status(refunded, 'paid')
+        self.set_status(refunded, 'refunded')
+        incremental = self.snapshot()
+
+        list(backfill(chunk_size=1))
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_placed_orders_are_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            kept = self.make_order([(self.pepper, 1, '90')])
+            self.make_order([(self.turmeric, 1, '150')], payment_status='paid')
+            deleted = self.make_order([(self.turmeric, 1, '150')])
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted.delete()
+        self.set_status(kept, 'failed')
+        placed = list(DailySales.objects.values_list('placed_orders', 'orders'))
+        self.assertEqual(placed, [(2, 1)])
+
+        list(backfill())
+        self.assertEqual(list(DailySales.objects.values_list('placed_orders', 'orders')), placed)
+
+    def test_deleted_orders_leave_every_rollup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            kept = self.make_order([(self.turmeric, 1, '150'), (self.pepper, 1, '90')])
+            paid = self.make_order([(self.turmeric, 2, '150'), (self.pepper, 1, '90')])
+            refunded = self.make_order([(self.pepper, 1, '90')])
+        for order in (kept, paid, refunded):
+            self.set_status(order, 'paid')
+        self.set_status(refunded, 'refunded')
+        with self.captureOnCommitCallbacks(execute=True):
+            paid.delete()
+            Order.objects.filter(pk=refunded.pk).delete()
+        incremental = self.snapshot(), list(DailySales.objects.values_list('placed_orders', flat=True))
+        self.assertEqual(incremental[0][0], [(1, Decimal('240'), 0, Decimal('0'))])
+        self.assertEqual(incremental[0][1], {self.turmeric.id: 1, self.pepper.id: 1})
+
+        list(backfill())
+        self.assertEqual((self.snapshot(), list(DailySales.objects.values_list('placed_orders', flat=True))), incremental)
+
+    def test_vendor_analytics_reads_rollups(self):
+        self.set_status(self.make_order([(self.turmeric, 2, '150'), (self.pepper, 1, '90')]), 'paid')
+        client = APIClient()
+        client.force_authenticate(self.vendor.user)
+        # vendor, totals, months, top products, categories, product count
+        with self.assertNumQueries(6):
+            data = client.get('/api/orders/vendor/analytics/', {'timeRange': 'week'}).data
+        self.assertEqual(data['totalSales'], Decimal('390'))
+        self.assertEqual(data['totalUnits'], 3)
+        self.assertEqual(data['topProducts'][0]['name'], 'Turmeric')
+        self.assertEqual(data['salesByCategory'], [{'category': 'Uncategorized', 'sales': Decimal('390')}])
+
+        client.force_authenticate(self.customer)
+        self.assertEqual(client.get('/api/orders/vendor/analytics/').status_code, 403)
+
+
+def reference_quote(lines, discount, rates, tiers):
+    """Straightforward exact-arithmetic pricing used to check the engine."""
+    def money(value):
+        return Decimal(value.numerator) / Decimal(value.denominator)
+
+    subtotal = sum((Fraction(product.price) * quantity for product, quantity in lines), Fraction(0))
+    discount = min(max(Fraction(discount), Fraction(0)), subtotal)
+    discount = Fraction(money(discount).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+    tax = Fraction(0)
+    for product, quantity in lines:
+        rate = Fraction(rates.get(product.category.slug, rates['default']))
+        line_total = Fraction(product.price) * quantity
+        tax += rate * (line_total - discount * line_total / subtotal)
+    shipping = Fraction(0)
+    for minimum, cost in sorted(tiers, key=lambda tier: Decimal(tier[0])):
+        if subtotal - discount >= Fraction(minimum):
+            shipping = Fraction(cost)
+    return {
+        'subtotal': money(subtotal),
+        'discount': money(discount),
+        'tax': money(tax).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+        'shipping_cost': money(shipping),
+    }
+
+
+class PricingTests(SimpleTestCase):
+    rates = {'default': '0.18', 'bakery': '0.05', 'herbal': '0.12'}
+    tiers = [('0', '49'), ('500', '25'), ('1000', '0')]
+
+    def cart(self, rng, size):
+        categories = [Category(id=i, slug=slug) for i, slug in enumerate(('food', 'bakery', 'herbal'), 1)]
+        return [
+            (Product(price=Decimal(rng.randint(1, 500000)) / 100, category=rng.choice(categories)), rng.randint(1, 9))
+            for _ in range(size)
+        ]
+
+    def test_matches_reference_implementation(self):
+        rng = random.Random(1234)
+        with override_settings(ORDER_TAX_RATES=self.rates, ORDER_SHIPPING_RATES=self.tiers):
+            for _ in range(300):
+                lines = self.cart(rng, rng.randint(1, 40))
+                discount = Decimal(rng.randint(0, 300000)) / 100
+                quote = price_cart(lines, discount=discount)
+                expected = reference_quote(lines, discount, self.rates, self.tiers)
+                for field, value in expected.items():
+                    self.assertEqual(getattr(quote, field), value, field)
+                self.assertEqual(
+                    quote.total,
+                    quote.subtotal - quote.discount + quote.tax + quote.shipping_cost,
+                )
+                self.assertEqual(sum(line.total for line in quote.lines), quote.subtotal)
+
+    def test_discount_is_capped_at_subtotal(self):
+        lines = self.cart(random.Random(5), 3)
+        quote = price_cart(lines, discount=Decimal('1e9'))
+        self.assertEqual(quote.discount, quote.subtotal)
+        self.assertEqual(quote.tax, Decimal('0.00'))
+
+
+def generate_numbers(worker_id, count):
+    generator = SnowflakeOrderNumberGenerator(worker_id=worker_id)
+    return [generator() for _ in range(count)]
+
+
+class OrderNumberTests(TestCase):
+    def test_numbers_are_fixed_width_and_increasing(self):
+        numbers = generate_numbers(worker_id=3, count=5000)
+        self.assertEqual(len(set(numbers)), len(numbers))
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual({len(number) for number in numbers}, {16})
+        self.assertTrue(all(number.startswith('ORD') for number in numbers))
+
+    def test_sequence_overflow_waits_for_next_millisecond(self):
+        ticks = iter([1_800_000_000_000] * (MAX_SEQUENCE + 2) + [1_800_000_000_001] * 2)
+        generator = SnowflakeOrderNumberGenerator(worker_id=0, clock=lambda: next(ticks))
+        ids = [generator.next_id() for _ in range(MAX_SEQUENCE + 2)]
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_clock_moving_backwards_stays_monotonic(self):
+        ticks = iter([1_800_000_000_005, 1_800_000_000_001, 1_800_000_000_006])
+        generator = SnowflakeOrderNumberGenerator(worker_id=0, clock=lambda: next(ticks))
+        ids = [generator.next_id() for _ in range(3)]
+        self.assertEqual(ids, sorted(set(ids)))
+
+    def test_rejects_out_of_range_worker(self):
+        with self.assertRaises(ValueError):
+            SnowflakeOrderNumberGenerator(worker_id=1024)
+
+    def test_unique_across_processes(self):
+        context = multiprocessing.get_context('fork')
+        with context.Pool(4) as pool:
+            batches = pool.starmap(generate_numbers, [(worker_id, 20000) for worker_id in range(4)])
+        numbers = [number for batch in batches for number in batch]
+        self.assertEqual(len(set(numbers)), len(numbers))
+
+    def test_orders_use_generated_numbers(self):
+        _, turmeric, _ = make_catalog()
+        customer = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+        first = place_order(customer, [{'product': turmeric.id, 'quantity': 1, 'price': 150}])
+        second = place_order(customer, [{'product': turmeric.id, 'quantity': 1, 'price': 150}])
+        self.assertLess(first.order_number, second.order_number)
+
+    def test_taken_numbers_are_retried(self):
+        _, turmeric, _ = make_catalog()
+        customer = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+        taken = place_order(customer, [{'product': turmeric.id, 'quantity': 1, 'price': 150}]).order_number
+        # Another worker with the same id produced it first
+        numbers = iter([taken, 'ORD0000000000001'])
+        with mock.patch('orders.numbering.generate_order_number', lambda: next(numbers)):
+            order = place_order(customer, [{'product': turmeric.id, 'quantity': 1, 'price': 150}])
+        self.assertEqual(order.order_number, 'ORD0000000000001')
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """
+    Many buyers race for the last units; the conditional stock update must
+    never sell more than what is on the shelf.
+    """
+
+    buyers = 12
+
+    def test_no_overselling(self):
+        _, turmeric, _ = make_catalog()
+        customers = [
+            User.objects.create_user(email=f'buyer{i}@example.com', password='pass12345', name=f'Buyer {i}')
+            for i in range(self.buyers)
+        ]
+        barrier = threading.Barrier(self.buyers)
+        outcomes = []
+
+        def buy(customer):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        place_order(customer, [{'product': turmeric.id, 'quantity': 1, 'price': 150}])
+                        outcomes.append('sold')
+                        return
+                    except serializers.ValidationError:
+                        outcomes.append('rejected')
+                        return
+                    except OperationalError:
+                        # Lock timeouts/deadlocks: the client retries the checkout.
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(customer,)) for customer in customers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        turmeric.refresh_from_db()
+        self.assertEqual(outcomes.count('sold'), 5)
+        self.assertEqual(outcomes.count('rejected'), self.buyers - 5)
+        self.assertEqual(turmeric.quantity, 0)
+        self.assertEqual(OrderItem.objects.filter(product=turmeric).count(), 5)
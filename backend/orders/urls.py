@@ -1,8 +1,15 @@
 from django.urls import path
-from .views import orders, order_detail
+from .views import (
+    orders, order_detail, reservations, reservation_detail, vendor_analytics, vendor_order_items, vendor_orders,
+)
 
 urlpatterns = [
     path('', orders, name='orders'),
     path('<int:order_id>/', order_detail, name='order_detail'),
+    path('reservations/', reservations, name='reservations'),
+    path('reservations/<uuid:token>/', reservation_detail, name='reservation_detail'),
+    path('vendor/orders/', vendor_orders, name='vendor_orders'),
+    path('vendor/orders/items/', vendor_order_items, name='vendor_order_items'),
+    path('vendor/analytics/', vendor_analytics, name='vendor_analytics'),
 ]
 
@@ -1,96 +1,153 @@
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
 from django.http import JsonResponse
+from django.utils import timezone
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
 
-# Mock data for development
-mock_orders = [
-    {
-        "id": 1,
-        "order_number": "ORD12345",
-        "user": {
-            "id": 1,
-            "name": "John Doe",
-            "email": "john@example.com"
-        },
-        "shipping_address_details": {
-            "address_line1": "123 Main St",
-            "address_line2": "Apt 4B",
-            "city": "Pune",
-            "state": "Maharashtra",
-            "postal_code": "411001",
-            "country": "India"
-        },
-        "billing_address_details": {
-            "address_line1": "123 Main St",
-            "address_line2": "Apt 4B",
-            "city": "Pune",
-            "state": "Maharashtra",
-            "postal_code": "411001",
-            "country": "India"
-        },
-        "status": "delivered",
-        "payment_status": "paid",
-        "payment_method": "card",
-        "subtotal": 650,
-        "shipping_cost": 0,
-        "tax": 117,
-        "discount": 0,
-        "total": 767,
-        "created_at": "2023-06-15T10:30:00Z",
-        "items": [
-            {
-                "id": 1,
-                "product": 1,
-                "product_details": {
-                    "id": 1,
-                    "name": "Organic Turmeric Powder",
-                    "image": "/placeholder.svg?height=100&width=100"
-                },
-                "vendor": 1,
-                "quantity": 2,
-                "price": 150,
-                "total": 300
-            },
-            {
-                "id": 2,
-                "product": 3,
-                "product_details": {
-                    "id": 3,
-                    "name": "Herbal Tea",
-                    "image": "/placeholder.svg?height=100&width=100"
-                },
-                "vendor": 3,
-                "quantity": 1,
-                "price": 200,
-                "total": 200
-            },
-            {
-                "id": 3,
-                "product": 4,
-                "product_details": {
-                    "id": 4,
-                    "name": "Fresh Cookies",
-                    "image": "/placeholder.svg?height=100&width=100"
-                },
-                "vendor": 4,
-                "quantity": 1,
-                "price": 150,
-                "total": 150
-            }
-        ]
-    }
-]
+from ecommerce.pagination import KeysetPagination
+from products.models import Product
+from users.models import Vendor
+from . import fulfillment
+from .models import DailyVendorProductSales, Order
+from .projections import order_payloads, order_rows, summary_payloads, summary_rows
+from .serializers import (
+    FulfillmentUpdateSerializer, OrderCreateSerializer, OrderSerializer, StockReservationSerializer,
+)
+from .stock import release_reservation
 
-@api_view(['GET'])
+@api_view(['GET', 'POST'])
 @permission_classes([AllowAny])
 def orders(request):
-    return JsonResponse(mock_orders, safe=False)
+    if request.method == 'POST':
+        return create_order(request)
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    # One range scan of order_user_created_idx per page
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(summary_rows(Order.objects.filter(user=request.user)), request)
+    return paginator.get_paginated_response(summary_payloads(page))
+
+def create_order(request):
+    """Place an order; pass the checkout's ``reservation`` to use the units it holds."""
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    serializer = OrderCreateSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    order = serializer.save()
+    return Response(OrderSerializer(Order.objects.for_serialization().get(pk=order.pk)).data, status=201)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def order_detail(request, order_id):
-    order = next((o for o in mock_orders if o['id'] == order_id), None)
-    if order:
-        return JsonResponse(order)
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    # OrderSerializer's payload, items and addresses included, in two queries
+    payloads = order_payloads(order_rows(Order.objects.filter(user=request.user, pk=order_id)))
+    if payloads:
+        return Response(payloads[0])
     return JsonResponse({"error": "Order not found"}, status=404)
 
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def reservations(request):
+    """
+    Hold the checkout's ``items`` for STOCK_RESERVATION_TTL seconds while
+    the customer pays. Replaces the customer's previous reservation.
+    """
+    serializer = StockReservationSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+    return Response(serializer.data, status=201)
+
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def reservation_detail(request, token):
+    if not release_reservation(request.user, token):
+        return JsonResponse({"error": "Reservation not found"}, status=404)
+    return Response(status=204)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def vendor_orders(request):
+    """
+    The vendor's orders, newest first, each with the vendor's lines of it;
+    ``status`` keeps the orders and lines in that fulfillment status.
+    ``counts`` has the vendor's lines per status.
+    """
+    vendor = Vendor.objects.filter(user=request.user).first()
+    if vendor is None:
+        return JsonResponse({"error": "Vendor profile not found"}, status=403)
+    
+    status = request.GET.get('status') or None
+    if status is not None and status not in fulfillment.STATUSES:
+        return JsonResponse({"error": "Unknown status"}, status=400)
+    
+    paginator = fulfillment.VendorOrderPagination()
+    page = paginator.paginate_queryset(fulfillment.vendor_orders(vendor, status), request)
+    response = paginator.get_paginated_response(fulfillment.order_groups(vendor, page, status))
+    response.data['counts'] = fulfillment.status_counts(vendor)
+    return response
+
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def vendor_order_items(request):
+    """Set the ``status`` and/or ``tracking_number`` of the vendor's chosen lines in one UPDATE."""
+    vendor = Vendor.objects.filter(user=request.user).first()
+    if vendor is None:
+        return JsonResponse({"error": "Vendor profile not found"}, status=403)
+    
+    serializer = FulfillmentUpdateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    changes = {field: data[field] for field in ('status', 'tracking_number') if field in data}
+    updated = fulfillment.update_lines(vendor, changes, items=data.get('items', ()), orders=data.get('orders', ()))
+    return Response({'updated': updated})
+
+
+ANALYTICS_TIME_RANGES = {'week': 7, 'month': 30, 'year': 365}
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def vendor_analytics(request):
+    vendor = Vendor.objects.filter(user=request.user).first()
+    if vendor is None:
+        return JsonResponse({"error": "Vendor profile not found"}, status=403)
+    
+    days = ANALYTICS_TIME_RANGES.get(request.GET.get('timeRange'), ANALYTICS_TIME_RANGES['month'])
+    since = timezone.localdate() - timedelta(days=days - 1)
+    # Reads O(days x products) rollup rows via the (vendor, date, product) key
+    rows = DailyVendorProductSales.objects.filter(vendor=vendor, date__gte=since).order_by()
+    
+    totals = rows.aggregate(sales=Sum('revenue'), units=Sum('units'))
+    sales_by_month = rows.annotate(month=TruncMonth('date')).values('month').annotate(
+        sales=Sum('revenue')
+    ).order_by('month')
+    top_products = rows.values('product_id', 'product__name').annotate(
+        sales=Sum('revenue'), units=Sum('units')
+    ).order_by('-sales')[:5]
+    sales_by_category = rows.values('product__category__name').annotate(
+        sales=Sum('revenue')
+    ).order_by('-sales')
+    
+    return Response({
+        'totalSales': totals['sales'] or 0,
+        'totalUnits': totals['units'] or 0,
+        'totalProducts': Product.objects.filter(vendor=vendor).count(),
+        'salesByMonth': [
+            {'month': item['month'].strftime('%b %Y'), 'sales': item['sales']} for item in sales_by_month
+        ],
+        'topProducts': [
+            {'id': item['product_id'], 'name': item['product__name'], 'sales': item['sales'], 'units': item['units']}
+            for item in top_products
+        ],
+        'salesByCategory': [
+            {'category': item['product__category__name'] or 'Uncategorized', 'sales': item['sales']}
+            for item in sales_by_category
+        ],
+    })
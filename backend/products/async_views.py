@@ -0,0 +1,57 @@
+"""
+Async versions of the hot catalog reads, routed by ecommerce.asgi_urls.
+They return the same bytes as the DRF views in products.views and share
+their cache entries; other methods are handed to those views.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from ecommerce.aio import async_get, fetch, render
+from ecommerce.pagination import KeysetPagination
+from . import views
+from .cache import cached_response
+from .catalog import filter_products
+from .models import Category
+from .projections import product_payloads, product_rows
+from .serializers import CategorySerializer, ProductSerializer
+
+
+@cached_response('catalog')
+@async_get(views.featured_products)
+async def featured_products(request):
+    featured = product_rows(filter_products({'featured': 'true'}))[:views.FEATURED_LIMIT]
+    return render(await sync_to_async(product_payloads)(featured, request))
+
+
+@cached_response('categories')
+@async_get(views.categories)
+async def categories(request):
+    queryset = Category.objects.filter(is_active=True)
+    serializer = CategorySerializer(await fetch(queryset), many=True, context={'request': request})
+    return render(serializer.data)
+
+
+@cached_response('catalog')
+@async_get(views.products)
+async def products(request):
+    queryset = product_rows(filter_products(request.GET))
+
+    paginator = KeysetPagination()
+    try:
+        page = await paginator.apaginate_queryset(queryset, Request(request))
+    except NotFound as error:
+        return render({'detail': error.detail}, status=error.status_code)
+    payloads = await sync_to_async(product_payloads)(page, request)
+    return render(paginator.get_paginated_response(payloads).data)
+
+
+@cached_response('catalog-detail', 'product:{product_id}')
+@async_get(views.product_detail)
+async def product_detail(request, product_id):
+    product = await views.catalog_queryset().filter(is_active=True, id=product_id).afirst()
+    if product:
+        serializer = ProductSerializer(product, context={'request': request})
+        return render(serializer.data)
+    return JsonResponse({"error": "Product not found"}, status=404)
@@ -0,0 +1,326 @@
+"""
+Streaming product import and export for vendors.
+
+A row is a product's full state, keyed by ``sku`` within the vendor:
+``sku, name, category, description, price, compare_price, cost_price,
+quantity, is_featured, is_active, variants, images``. In JSONL ``variants``
+is a list of ``{"name", "value"}`` and ``images`` a list of ``{"image",
+"alt_text", "is_primary"}``. In CSV they are ``Size=250g;Pack=2`` and
+``path/a.jpg;path/b.jpg`` (the first image is primary). When a row carries
+``variants`` or ``images`` they replace the product's current ones; when it
+leaves them out they are not touched.
+"""
+import csv
+import hashlib
+import io
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+from django.utils.text import slugify
+from rest_framework import serializers
+
+from ecommerce.db import upsert_options
+from .cache import invalidate
+from .models import Category, Product, ProductImage, ProductVariant
+from .search import get_index
+
+FORMATS = ('csv', 'jsonl')
+BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+
+COLUMNS = (
+    'sku', 'name', 'category', 'description', 'price', 'compare_price', 'cost_price',
+    'quantity', 'is_featured', 'is_active', 'variants', 'images',
+)
+PRODUCT_FIELDS = (
+    'category_id', 'name', 'description', 'price', 'compare_price', 'cost_price',
+    'quantity', 'is_featured', 'is_active',
+)
+
+
+class VariantRowSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100)
+    value = serializers.CharField(max_length=100)
+
+
+class ImageRowSerializer(serializers.Serializer):
+    image = serializers.CharField(max_length=100)
+    alt_text = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True, default=None)
+    is_primary = serializers.BooleanField(default=False)
+
+
+class ProductRowSerializer(serializers.Serializer):
+    sku = serializers.CharField(max_length=100)
+    name = serializers.CharField(max_length=255)
+    category = serializers.CharField(required=False, allow_null=True, default=None)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True, default=None)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    compare_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True, default=None)
+    cost_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True, default=None)
+    quantity = serializers.IntegerField(min_value=0, default=0)
+    is_featured = serializers.BooleanField(default=False)
+    is_active = serializers.BooleanField(default=True)
+    variants = VariantRowSerializer(many=True, required=False)
+    images = ImageRowSerializer(many=True, required=False)
+
+    def validate_category(self, value):
+        """Accept a category id, slug or name; resolved against the lookup passed in the context."""
+        if value in (None, ''):
+            return None
+        category_id = self.context['categories'].get(str(value).lower())
+        if category_id is None:
+            raise serializers.ValidationError('Unknown category.')
+        return category_id
+
+
+class ImportReport:
+    __slots__ = ('created', 'updated', 'failed', 'errors')
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, row, errors, sku=None):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'sku': sku, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'updated': self.updated, 'failed': self.failed, 'errors': self.errors}
+
+
+def category_lookup():
+    """``{id, slug or lowercased name: id}`` for resolving the ``category`` column."""
+    lookup = {}
+    for category_id, slug, name in Category.objects.values_list('id', 'slug', 'name'):
+        lookup[name.lower()] = category_id
+        lookup[slug.lower()] = category_id
+        lookup[str(category_id)] = category_id
+    return lookup
+
+
+def import_slug(vendor_id, name, sku):
+    # Derived from (vendor, sku) so it can never collide with another product's
+    # slug; on MySQL a slug conflict would otherwise turn the upsert into an
+    # update of the wrong row.
+    digest = hashlib.sha1(f'{vendor_id}:{sku}'.encode()).hexdigest()[:10]
+    return f'{slugify(name)[:30]}-{vendor_id}-{digest}'.lstrip('-')
+
+
+def split_csv_row(row):
+    """Turn a CSV row into the JSONL shape: blanks are dropped, nested columns are split."""
+    data = {}
+    for column, value in row.items():
+        if column is None or value is None:
+            continue
+        value = value.strip()
+        if column == 'variants':
+            pairs = [item.partition('=') for item in value.split(';') if item.strip()]
+            data['variants'] = [{'name': name.strip(), 'value': val.strip()} for name, _, val in pairs]
+        elif column == 'images':
+            paths = [path.strip() for path in value.split(';') if path.strip()]
+            data['images'] = [{'image': path, 'is_primary': i == 0} for i, path in enumerate(paths)]
+        elif value != '':
+            data[column] = value
+    return data
+
+
+def read_rows(stream, file_format):
+    """Yield ``(row number, data or error message)`` from a text stream, one row at a time."""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, split_csv_row(row)
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as error:
+            yield number, f'Invalid JSON: {error}'
+            continue
+        yield number, data if isinstance(data, dict) else 'Each line must be a JSON object.'
+
+
+def field_value(row, field):
+    value = getattr(row, field)
+    return value.name if isinstance(value, FieldFile) else value
+
+
+def reconcile_children(model, wanted, key_fields, value_fields):
+    """
+    Make each product's ``model`` rows match ``wanted`` (``{product id:
+    [dict, ...]}``) using one SELECT and at most one DELETE, one bulk UPDATE
+    and one bulk INSERT. An item carrying the ``id`` of one of the product's
+    rows is matched to that row, any other item on ``key_fields``. Matched
+    rows are only written when a field differs, so their ids survive; fields
+    an item leaves out keep their current values. Ids belonging to other
+    products are ignored. Returns whether anything was written.
+    """
+    fields = (*key_fields, *value_fields)
+    existing = {
+        row.pk: row
+        for row in model.objects.filter(product_id__in=list(wanted)).only('id', 'product_id', *fields)
+    }
+    by_key = {(row.product_id, *(field_value(row, field) for field in key_fields)): row for row in existing.values()}
+
+    matched = set()
+    created = set()
+    changed = set()
+    to_create = []
+    to_update = {}
+    for product_id, items in wanted.items():
+        for item in items:
+            item = dict(item)
+            row = existing.get(item.pop('id', None))
+            if row is None or row.product_id != product_id:
+                key = (product_id, *(item.get(field) for field in key_fields))
+                row = by_key.get(key)
+                if row is None:
+                    if key not in created:
+                        created.add(key)
+                        to_create.append(model(product_id=product_id, **item))
+                    continue
+            if row.pk in matched:
+                continue
+            matched.add(row.pk)
+            for field in fields:
+                if field in item and field_value(row, field) != item[field]:
+                    setattr(row, field, item[field])
+                    changed.add(field)
+                    to_update[row.pk] = row
+
+    stale = [pk for pk in existing if pk not in matched]
+    if stale:
+        model.objects.filter(pk__in=stale).delete()
+    if to_update:
+        update_fields = [field for field in fields if field in changed]
+        for row in to_update.values():
+            # bulk_update skips pre_save, which is what stores a new upload
+            for field in update_fields:
+                setattr(row, field, model._meta.get_field(field).pre_save(row, False))
+        model.objects.bulk_update(list(to_update.values()), update_fields)
+    if to_create:
+        model.objects.bulk_create(to_create)
+    return bool(stale or to_update or to_create)
+
+
+def save_batch(vendor, rows, report):
+    """Upsert one batch of validated rows (``{sku: data}``) and sync their variants and images."""
+    skus = list(rows)
+    existing = set(Product.objects.filter(vendor=vendor, sku__in=skus).values_list('sku', flat=True))
+    products = []
+    for sku, data in rows.items():
+        fields = {field: data.get(field) for field in PRODUCT_FIELDS if field != 'category_id'}
+        products.append(Product(
+            vendor=vendor, sku=sku, category_id=data['category'],
+            slug=import_slug(vendor.pk, data['name'], sku), **fields
+        ))
+
+    with transaction.atomic():
+        # On MySQL only unique_vendor_sku can collide; see import_slug
+        Product.objects.bulk_create(
+            products, **upsert_options(Product, ['vendor', 'sku'], [*PRODUCT_FIELDS, 'updated_at'])
+        )
+        ids = dict(Product.objects.filter(vendor=vendor, sku__in=skus).values_list('sku', 'id'))
+        variants = {ids[sku]: data['variants'] for sku, data in rows.items() if 'variants' in data}
+        images = {ids[sku]: data['images'] for sku, data in rows.items() if 'images' in data}
+        if variants:
+            reconcile_children(ProductVariant, variants, ('name', 'value'), ())
+        if images:
+            reconcile_children(ProductImage, images, ('image',), ('alt_text', 'is_primary'))
+
+        # bulk_create sends no signals, so announce the changes here
+        product_ids = list(ids.values())
+        invalidate('catalog', *(f'product:{product_id}' for product_id in product_ids))
+        transaction.on_commit(lambda: get_index().record(product_ids))
+
+    report.updated += len(existing)
+    report.created += len(rows) - len(existing)
+
+
+def import_products(vendor, stream, file_format, batch_size=BATCH_SIZE):
+    """
+    Validate and upsert rows from ``stream`` for ``vendor``, ``batch_size``
+    at a time, so memory use does not grow with the file. Invalid rows are
+    reported and skipped; a SKU repeated within a batch keeps its last row.
+    """
+    report = ImportReport()
+    # One serializer validates every row: building its fields per row costs
+    # more than the validation itself.
+    validator = ProductRowSerializer(context={'categories': category_lookup()})
+    rows = read_rows(stream, file_format)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return report
+        valid = {}
+        for number, data in chunk:
+            if isinstance(data, str):
+                report.fail(number, {'non_field_errors': [data]})
+                continue
+            try:
+                row = validator.run_validation(data)
+            except serializers.ValidationError as error:
+                report.fail(number, error.detail, sku=data.get('sku'))
+                continue
+            valid[row['sku']] = row
+        if valid:
+            save_batch(vendor, valid, report)
+
+
+def export_rows(vendor):
+    """Each of the vendor's products as an import row, read in chunks."""
+    queryset = Product.objects.filter(vendor=vendor).select_related('category').prefetch_related(
+        'variants', 'images'
+    ).order_by('pk')
+    for product in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'sku': product.sku,
+            'name': product.name,
+            'category': product.category.slug if product.category else None,
+            'description': product.description,
+            'price': product.price,
+            'compare_price': product.compare_price,
+            'cost_price': product.cost_price,
+            'quantity': product.quantity,
+            'is_featured': product.is_featured,
+            'is_active': product.is_active,
+            'variants': [{'name': variant.name, 'value': variant.value} for variant in product.variants.all()],
+            'images': [
+                {'image': image.image.name, 'alt_text': image.alt_text, 'is_primary': image.is_primary}
+                for image in product.images.all()
+            ],
+        }
+
+
+class Echo:
+    """File-like object whose ``write`` hands back what it was given, for ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        row['variants'] = ';'.join(f"{variant['name']}={variant['value']}" for variant in row['variants'])
+        row['images'] = ';'.join(image['image'] for image in row['images'])
+        yield writer.writerow(['' if row[column] is None else row[column] for column in COLUMNS])
+
+
+def export_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def text_stream(uploaded_file):
+    return io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
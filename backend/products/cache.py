@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+import zlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import parse_etags, quote_etag
+
+LOCK_STRIPES = [threading.Lock() for _ in range(64)]
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def _generation_key(token):
+    return f'catalog:gen:{token}'
+
+
+def _new_generation():
+    # Time-based, so a generation key that was evicted never comes back
+    # with a value that matches entries cached under the old one.
+    return time.time_ns() // 1000
+
+
+def generations(tokens):
+    cache = get_cache()
+    keys = [_generation_key(token) for token in tokens]
+    found = cache.get_many(keys)
+    missing = {key: _new_generation() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def invalidate(*tokens):
+    """Bump the generation of each token after the current transaction commits."""
+    def bump():
+        get_cache().set_many({_generation_key(token): _new_generation() for token in tokens}, None)
+    transaction.on_commit(bump)
+
+
+def _cache_key(request, versions):
+    # Parameter order does not matter: ?a=1&b=2 and ?b=2&a=1 share an entry
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.sha1(f'{request.path}?{query}'.encode()).hexdigest()
+    versions = '.'.join(str(generation) for generation in versions)
+    return f'catalog:response:{versions}:{digest}'
+
+
+def _release(cache, lock_key, token):
+    # A lock that timed out may have been taken by another process since;
+    # that one is left alone
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _single_flight(key, compute):
+    """
+    Return the cached value for ``key`` or compute it once. Threads in this
+    process serialise on a striped lock; other processes are held off with a
+    short-lived ``cache.add`` lock and poll for the result instead of running
+    the same queries. Pollers do not hold the stripe, so other keys on it
+    are not kept waiting.
+    """
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    timeout = settings.CATALOG_CACHE_LOCK_TIMEOUT
+
+    def fill(owned):
+        try:
+            value = compute()
+            if value is not None:
+                cache.set(key, value, settings.CATALOG_CACHE_TIMEOUT)
+            return value
+        finally:
+            if owned:
+                _release(cache, lock_key, token)
+
+    with LOCK_STRIPES[zlib.crc32(key.encode()) % len(LOCK_STRIPES)]:
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.add(lock_key, token, timeout):
+            return fill(owned=True)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.02)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    # The other process is too slow or gone: compute here, under its lock once that expired
+    return fill(owned=cache.add(lock_key, token, timeout))
+
+
+async def _asingle_flight(key, compute):
+    """
+    _single_flight for coroutines. Only the ``cache.add`` lock is used, so
+    waiting requests in this process poll too rather than block the event
+    loop. The cache is called synchronously: Django's async cache methods
+    are thread hops, which cost more than a cache round trip.
+    """
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    timeout = settings.CATALOG_CACHE_LOCK_TIMEOUT
+    owned = cache.add(lock_key, token, timeout)
+    if not owned:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        owned = cache.add(lock_key, token, timeout)
+    try:
+        value = await compute()
+        if value is not None:
+            cache.set(key, value, settings.CATALOG_CACHE_TIMEOUT)
+        return value
+    finally:
+        if owned:
+            _release(cache, lock_key, token)
+
+
+def _cacheable(request):
+    return request.method == 'GET' and 'text/html' not in request.META.get('HTTP_ACCEPT', '')
+
+
+def _entry(response):
+    """What is cached for a rendered response, or None when it is not a success."""
+    if hasattr(response, 'render'):
+        response.render()
+    if response.status_code != 200:
+        return None
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    return (etag, response['Content-Type'], response.content)
+
+
+def _cached(request, entry):
+    etag, content_type, content = entry
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    response['Vary'] = 'Accept'
+    return response
+
+
+def cached_response(*tokens):
+    """
+    Cache successful JSON responses of a public GET view per query string.
+
+    ``tokens`` name the invalidation scopes the response depends on; view
+    keyword arguments can be interpolated, e.g. ``'product:{product_id}'``.
+    Responses carry an ETag and a matching ``If-None-Match`` gets a 304.
+    Coroutine views get an async wrapper sharing the same entries.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not _cacheable(request):
+                    return await view(request, *args, **kwargs)
+
+                key = _cache_key(request, generations([token.format(**kwargs) for token in tokens]))
+                rendered = []
+
+                async def compute():
+                    response = await view(request, *args, **kwargs)
+                    rendered.append(response)
+                    return _entry(response)
+
+                entry = await _asingle_flight(key, compute)
+                return rendered[0] if entry is None else _cached(request, entry)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+
+            key = _cache_key(request, generations([token.format(**kwargs) for token in tokens]))
+            rendered = []
+
+            def compute():
+                response = view(request, *args, **kwargs)
+                rendered.append(response)
+                return _entry(response)
+
+            entry = _single_flight(key, compute)
+            return rendered[0] if entry is None else _cached(request, entry)
+        return wrapper
+    return decorator
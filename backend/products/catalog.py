@@ -0,0 +1,92 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q, Subquery
+
+from .models import Category, Product
+
+# Public sort keys mapped to index-backed orderings. Every ordering ends on
+# ``-id`` so pages are stable when many rows share the same sort value.
+ORDERING_OPTIONS = {
+    '-created_at': ('-created_at', '-id'),
+    'created_at': ('created_at', 'id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    '-rating': ('-rating_average', '-id'),
+}
+DEFAULT_ORDERING = '-created_at'
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def _parse_decimal(value):
+    try:
+        value = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    if not value.is_finite():
+        return None
+    return value
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def category_ids(value):
+    """
+    Resolve a category reference (id, slug or name) into a subquery of the
+    ids of that category and everything below it, so the product filter runs
+    on ``category_id`` and can use the composite index.
+    """
+    category_id = _parse_int(value)
+    if category_id is not None:
+        selected = Category.objects.filter(pk=category_id)
+    else:
+        selected = Category.objects.filter(Q(slug__iexact=value) | Q(name__iexact=value))
+    return Category.objects.filter(path__startswith=Subquery(selected.values('path')[:1])).values('id')
+
+
+def filter_products(params, queryset=None):
+    """
+    Apply catalog filters and ordering from a query-parameter mapping.
+
+    Supported parameters: ``category`` (id, slug or name), ``vendor``,
+    ``featured``, ``in_stock``, ``min_price``, ``max_price``, ``min_rating``
+    and ``ordering`` (one of ``ORDERING_OPTIONS``). Unknown or malformed
+    values are ignored.
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    queryset = queryset.filter(is_active=True)
+
+    category = params.get('category')
+    if category:
+        queryset = queryset.filter(category_id__in=category_ids(category))
+
+    vendor = _parse_int(params.get('vendor'))
+    if vendor is not None:
+        queryset = queryset.filter(vendor_id=vendor)
+
+    if params.get('featured', '').lower() in TRUE_VALUES:
+        queryset = queryset.filter(is_featured=True)
+
+    if params.get('in_stock', '').lower() in TRUE_VALUES:
+        queryset = queryset.filter(quantity__gt=0)
+
+    min_price = _parse_decimal(params.get('min_price'))
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+
+    max_price = _parse_decimal(params.get('max_price'))
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+
+    min_rating = _parse_decimal(params.get('min_rating'))
+    if min_rating is not None:
+        queryset = queryset.filter(rating_average__gte=min_rating)
+
+    ordering = ORDERING_OPTIONS.get(params.get('ordering'), ORDERING_OPTIONS[DEFAULT_ORDERING])
+    return queryset.order_by(*ordering)
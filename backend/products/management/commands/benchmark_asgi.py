@@ -0,0 +1,178 @@
+import asyncio
+import importlib.util
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from itertools import count
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from products.management.seed import remove_catalog, seed_catalog
+from products.models import Product
+
+# (label, server module, command line); {port} and {threads} are filled in
+SERVERS = {
+    'wsgi': (
+        'gunicorn',
+        ['-m', 'gunicorn', 'ecommerce.wsgi:application', '--bind', '127.0.0.1:{port}', '--workers', '1',
+         '--worker-class', 'gthread', '--threads', '{threads}', '--backlog', '2048', '--log-level', 'warning'],
+    ),
+    'asgi': (
+        'uvicorn',
+        ['-m', 'uvicorn', 'ecommerce.asgi:application', '--host', '127.0.0.1', '--port', '{port}',
+         '--workers', '1', '--backlog', '2048', '--log-level', 'warning', '--no-access-log'],
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve the project under a WSGI server (gunicorn, threaded) and then under an ASGI server (uvicorn, '
+        'async views) and compare catalog read throughput with many concurrent keep-alive connections.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--duration', type=float, default=15, help='Seconds of load per server.')
+        parser.add_argument('--threads', type=int, default=32, help='Threads of the WSGI worker.')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+        parser.add_argument(
+            '--bust-cache', action='store_true',
+            help='Add a unique parameter to every request so the response cache never hits.',
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows after the run.')
+
+    def paths(self, tag):
+        ids = list(Product.objects.filter(slug__startswith=f'bench-{tag}-', is_active=True).values_list('pk', flat=True)[:200])
+        return [
+            '/api/products/',
+            '/api/products/?count=true&ordering=price',
+            '/api/products/featured/',
+            '/api/products/categories/',
+            *[f'/api/products/{pk}/' for pk in ids],
+        ]
+
+    def start(self, name, options):
+        module, argv = SERVERS[name]
+        if importlib.util.find_spec(module) is None:
+            raise CommandError(f'The {name} benchmark needs {module}: pip install {module}')
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')}
+        # Let ecommerce.asgi pick its URLconf
+        env.pop('DJANGO_ROOT_URLCONF', None)
+        argv = [arg.format(port=options['port'], threads=options['threads']) for arg in argv]
+        process = subprocess.Popen([sys.executable, *argv], cwd=settings.BASE_DIR, env=env)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', options['port']), timeout=1).close()
+                return process
+            except OSError:
+                if process.poll() is not None:
+                    break
+                time.sleep(0.2)
+        process.kill()
+        raise CommandError(f'{name} server did not start')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Seeding {options['products']} products...")
+        tag = seed_catalog(options['products'])
+        try:
+            paths = self.paths(tag)
+            for name in options['servers']:
+                process = self.start(name, options)
+                try:
+                    # Warm up: imports, connections and, unless busting it, the response cache
+                    asyncio.run(load(options['port'], paths, 20, 2, False))
+                    stats = asyncio.run(
+                        load(options['port'], paths, options['connections'], options['duration'], options['bust_cache'])
+                    )
+                finally:
+                    process.terminate()
+                    process.wait(10)
+                self.report(name, stats, options)
+        finally:
+            if not options['keep']:
+                remove_catalog(tag)
+
+    def report(self, name, stats, options):
+        latencies, errors, elapsed = stats
+        if not latencies:
+            self.stderr.write(self.style.ERROR(f'{name}: no successful responses, {errors} errors'))
+            return
+        latencies.sort()
+        self.stdout.write(
+            f"{name:<5} {len(latencies) / elapsed:8.0f} req/s with {options['connections']} connections, "
+            f'p50 {statistics.median(latencies) * 1000:.1f}ms, '
+            f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms, {errors} errors'
+        )
+
+
+async def load(port, paths, connections, duration, bust_cache):
+    """
+    Keep ``connections`` HTTP/1.1 keep-alive connections busy for
+    ``duration`` seconds, each sending its next GET as soon as the previous
+    response is in. Returns (latencies of 200 responses, errors, seconds).
+    """
+    latencies = []
+    errors = 0
+    sequence = count()
+    deadline = time.monotonic() + duration
+
+    async def client(offset):
+        nonlocal errors
+        reader = writer = None
+        while time.monotonic() < deadline:
+            n = next(sequence)
+            path = paths[(offset + n) % len(paths)]
+            if bust_cache:
+                path += f"{'&' if '?' in path else '?'}bench={n}"
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                started = time.perf_counter()
+                writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: application/json\r\n\r\n'.encode())
+                status, keep_alive = await read_response(reader)
+                if status == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+                if not keep_alive:
+                    writer.close()
+                    writer = None
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                errors += 1
+                if writer is not None:
+                    writer.close()
+                writer = None
+                await asyncio.sleep(0.05)
+        if writer is not None:
+            writer.close()
+
+    started = time.monotonic()
+    await asyncio.gather(*(client(i) for i in range(connections)))
+    return latencies, errors, time.monotonic() - started
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection', '').lower() != 'close'
@@ -0,0 +1,72 @@
+import csv
+import os
+import random
+import resource
+import tempfile
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from products.bulk import COLUMNS, export_csv, export_rows, import_products
+from products.management.seed import CATEGORY_NAMES
+from products.models import Category, Product
+from users.models import User, Vendor
+
+
+class Command(BaseCommand):
+    help = 'Import a synthetic CSV catalog for one vendor twice (insert, then upsert) and export it; report rows/sec.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--keep', action='store_true', help='Keep the imported rows after the run.')
+
+    def write_file(self, path, rows, slugs):
+        rng = random.Random(0)
+        with open(path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(COLUMNS)
+            for i in range(rows):
+                writer.writerow([
+                    f'BULK-{i}', f'Bulk Product {i}', rng.choice(slugs), 'Synthetic import row',
+                    f'{rng.randint(1000, 100000) / 100:.2f}', '', '', rng.randint(0, 200), 'false', 'true',
+                    f'Size={rng.choice(["250g", "500g", "1kg"])}', f'product_images/bulk-{i}.jpg',
+                ])
+
+    def timed_import(self, label, vendor, path, batch_size, rows):
+        started = time.perf_counter()
+        with open(path, newline='') as stream:
+            report = import_products(vendor, stream, 'csv', batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write(
+            f'{label:<8} {rows / elapsed:9.0f} rows/s  ({report.created} created, {report.updated} updated, '
+            f'{report.failed} failed, peak RSS {peak / 1024:.0f} MiB)'
+        )
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        user = User.objects.create(email=f'bench-{tag}-bulk@example.com', name='Bulk Vendor', role='vendor')
+        vendor = Vendor.objects.create(user=user, business_name='Bulk Vendor', is_approved=True)
+        categories = [
+            Category.objects.create(name=f'{name} {tag}', slug=f'bench-{tag}-{i}') for i, name in enumerate(CATEGORY_NAMES)
+        ]
+        rows = options['rows']
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'products.csv')
+            self.write_file(path, rows, [category.slug for category in categories])
+            try:
+                self.timed_import('insert', vendor, path, options['batch_size'], rows)
+                self.timed_import('upsert', vendor, path, options['batch_size'], rows)
+
+                started = time.perf_counter()
+                exported = sum(1 for _ in export_csv(export_rows(vendor))) - 1
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'export   {exported / elapsed:9.0f} rows/s')
+            finally:
+                if not options['keep']:
+                    Product.objects.filter(vendor=vendor).delete()
+                    Category.objects.filter(pk__in=[category.pk for category in categories]).delete()
+                    user.delete()
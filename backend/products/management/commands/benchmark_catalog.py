@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import reset_queries
+
+from products.catalog import filter_products
+from products.management.seed import remove_catalog, seed_catalog
+from products.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic catalog and report page-fetch latency for each catalog filter combination.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows after the run.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Seeding {options['products']} products...")
+        started = time.perf_counter()
+        tag = seed_catalog(options['products'])
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+        category = Category.objects.filter(slug__startswith=f'bench-{tag}-').first()
+        vendor_id = Product.objects.filter(slug__startswith=f'bench-{tag}-').values_list('vendor_id', flat=True).first()
+        combinations = [
+            ('default', {}),
+            ('category', {'category': category.slug}),
+            ('category+price', {'category': str(category.id), 'min_price': '100', 'max_price': '500'}),
+            ('category sort price', {'category': str(category.id), 'ordering': 'price'}),
+            ('featured', {'featured': 'true'}),
+            ('vendor', {'vendor': str(vendor_id)}),
+            ('price range', {'min_price': '100', 'max_price': '200', 'ordering': '-price'}),
+            ('in stock newest', {'in_stock': 'true'}),
+        ]
+
+        try:
+            for label, params in combinations:
+                timings = []
+                for _ in range(options['repeat']):
+                    queryset = filter_products(params)
+                    started = time.perf_counter()
+                    list(queryset[:options['page_size']])
+                    timings.append((time.perf_counter() - started) * 1000)
+                    reset_queries()
+                timings.sort()
+                p50 = timings[len(timings) // 2]
+                p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+                self.stdout.write(f'{label:<22} p50={p50:7.3f}ms  p99={p99:7.3f}ms')
+        finally:
+            if not options['keep']:
+                remove_catalog(tag)
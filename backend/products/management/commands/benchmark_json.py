@@ -0,0 +1,98 @@
+import io
+import timeit
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from ecommerce.parsers import FastJSONParser
+from ecommerce.renderers import FastJSONRenderer, orjson
+from products.management.seed import remove_catalog, seed_catalog
+from products.models import Category, Product, ProductImage, ProductVariant, Review
+from products.ratings import rebuild_ratings
+from products.serializers import CategorySerializer, ProductSerializer
+from products.tree import category_tree
+from users.admin_views import AdminDashboardView
+from users.models import User, Vendor
+from users.serializers import VendorSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Render and parse the JSON payloads of the main endpoints with the stdlib-based DRF classes and with '
+        'the orjson-based ones, and report the time per payload.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--reviews', type=int, default=20, help='Reviews on each product of the page.')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows after the run.')
+
+    def seed_nested_rows(self, tag, products, reviews):
+        reviewers = User.objects.bulk_create([
+            User(email=f'bench-{tag}-reviewer{i}@example.com', name=f'Reviewer {i}') for i in range(reviews)
+        ])
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f'product_images/bench-{i}.jpg', alt_text=product.name, is_primary=i == 0)
+            for product in products for i in range(3)
+        ])
+        ProductVariant.objects.bulk_create([
+            ProductVariant(product=product, name='Size', value=f'{grams}g')
+            for product in products for grams in (100, 250, 500)
+        ])
+        Review.objects.bulk_create([
+            Review(product=product, user=reviewer, rating=i % 5 + 1, comment='Fresh and aromatic, would buy again.')
+            for product in products for i, reviewer in enumerate(reviewers)
+        ])
+        # bulk_create sends no signals, so the stored aggregates are rebuilt
+        rebuild_ratings(Product.objects.filter(pk__in=[product.pk for product in products]))
+
+    def payloads(self, tag, page_size):
+        page = list(
+            Product.objects.for_serialization().filter(slug__startswith=f'bench-{tag}-', images__is_primary=True)
+            .order_by('-created_at', '-id')[:page_size]
+        )
+        return [
+            ('product list page', {'next': None, 'previous': None, 'results': ProductSerializer(page, many=True).data}),
+            ('product detail', ProductSerializer(page[0]).data),
+            ('categories', CategorySerializer(Category.objects.filter(is_active=True), many=True).data),
+            ('category tree', category_tree()),
+            ('admin dashboard', AdminDashboardView().build_payload()),
+            ('admin vendor list', VendorSerializer(Vendor.objects.select_related('user'), many=True).data),
+        ]
+
+    def time(self, func, repeat):
+        return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write(self.style.WARNING('orjson is not installed; both columns measure the stdlib encoder'))
+        tag = seed_catalog(options['products'])
+        try:
+            products = list(Product.objects.filter(slug__startswith=f'bench-{tag}-').order_by('-created_at', '-id')[
+                :options['page_size']
+            ])
+            self.seed_nested_rows(tag, products, options['reviews'])
+
+            repeat = options['repeat']
+            self.stdout.write(
+                f"{'payload':<20}{'size':>10}{'render':>10}{'fast':>9}{'x':>6}{'parse':>10}{'fast':>9}{'x':>6}"
+            )
+            for label, data in self.payloads(tag, options['page_size']):
+                body = JSONRenderer().render(data)
+                if FastJSONRenderer().render(data) != body:
+                    self.stderr.write(self.style.ERROR(f'{label}: the renderers disagree'))
+                render = self.time(lambda: JSONRenderer().render(data), repeat)
+                fast_render = self.time(lambda: FastJSONRenderer().render(data), repeat)
+                parse = self.time(lambda: JSONParser().parse(io.BytesIO(body)), repeat)
+                fast_parse = self.time(lambda: FastJSONParser().parse(io.BytesIO(body)), repeat)
+                self.stdout.write(
+                    f'{label:<20}{len(body) / 1024:>8.1f}KB'
+                    f'{render:>8.2f}ms{fast_render:>7.2f}ms{render / fast_render:>5.1f}x'
+                    f'{parse:>8.2f}ms{fast_parse:>7.2f}ms{parse / fast_parse:>5.1f}x'
+                )
+        finally:
+            if not options['keep']:
+                remove_catalog(tag)
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ecommerce.pagination import KeysetPagination
+from products.catalog import filter_products
+from products.management.seed import remove_catalog, seed_catalog
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic catalog and compare OFFSET and keyset page fetches at increasing depth.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=150000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100, 1000, 10000])
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows after the run.')
+
+    def median(self, fetch, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fetch()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2]
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Seeding {options['products']} products...")
+        tag = seed_catalog(options['products'])
+        size = options['page_size']
+        factory = APIRequestFactory()
+
+        try:
+            for page in options['pages']:
+                offset = (page - 1) * size
+                queryset = filter_products({})
+                if offset and not queryset[offset - 1:offset].exists():
+                    self.stdout.write(f'page {page}: catalog too small, skipped')
+                    continue
+
+                params = {'page_size': size}
+                if offset:
+                    # Cursors come from the previous page's last row, as a client would get them
+                    paginator = KeysetPagination()
+                    paginator.ordering = paginator.get_ordering(queryset)
+                    params['cursor'] = paginator.encode_cursor(queryset[offset - 1], reverse=False)
+                request = Request(factory.get('/api/products/', params))
+
+                offset_ms = self.median(lambda: list(filter_products({})[offset:offset + size]), options['repeat'])
+                keyset_ms = self.median(
+                    lambda: KeysetPagination().paginate_queryset(filter_products({}), request), options['repeat']
+                )
+                self.stdout.write(f'page {page:>6}  offset={offset_ms:8.3f}ms  keyset={keyset_ms:8.3f}ms')
+        finally:
+            if not options['keep']:
+                remove_catalog(tag)
@@ -0,0 +1,122 @@
+import random
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import reset_queries
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from orders.models import Order, OrderItem
+from orders.projections import order_payloads, order_rows
+from orders.serializers import OrderSerializer
+from products.management.seed import remove_catalog, seed_catalog
+from products.models import Product, ProductImage, ProductVariant, Review
+from products.projections import product_payloads, product_rows
+from products.ratings import rebuild_ratings
+from products.serializers import ProductSerializer
+from users.models import User, Vendor
+from users.projections import vendor_payloads, vendor_rows
+from users.serializers import VendorSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the product, vendor and order list payloads with the DRF serializers and with the row '
+        'projections, check they render the same JSON and report the time per page, queries included.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--reviews', type=int, default=10, help='Reviews on each product of the page.')
+        parser.add_argument('--items', type=int, default=5, help='Items in each order.')
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows after the run.')
+
+    def seed(self, tag, options):
+        rng = random.Random(0)
+        products = list(
+            Product.objects.filter(slug__startswith=f'bench-{tag}-').order_by('-created_at', '-id')[:options['page_size']]
+        )
+        users = User.objects.bulk_create([
+            User(email=f'bench-{tag}-customer{i}@example.com', name=f'Customer {i}') for i in range(options['reviews'])
+        ])
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f'product_images/bench-{i}.jpg', is_primary=i == 0)
+            for product in products for i in range(3)
+        ])
+        ProductVariant.objects.bulk_create([
+            ProductVariant(product=product, name='Size', value=f'{grams}g')
+            for product in products for grams in (100, 250, 500)
+        ])
+        Review.objects.bulk_create([
+            Review(product=product, user=user, rating=rng.randint(1, 5), comment='Fresh and aromatic.')
+            for product in products for user in users
+        ])
+        rebuild_ratings(Product.objects.filter(pk__in=[product.pk for product in products]))
+
+        orders = Order.objects.bulk_create([
+            Order(
+                user=rng.choice(users), order_number=f'B{tag}{i}', payment_method='card',
+                subtotal=Decimal('500.00'), tax=Decimal('90.00'), total=Decimal('590.00'),
+            )
+            for i in range(options['page_size'])
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order, product=product, vendor_id=product.vendor_id, quantity=1,
+                price=product.price, total=product.price,
+            )
+            for order in orders for product in rng.sample(products, options['items'])
+        ])
+        return users
+
+    def cases(self, tag, page_size, request):
+        products = Product.objects.filter(slug__startswith=f'bench-{tag}-', images__isnull=False).distinct().order_by(
+            '-created_at', '-id'
+        )
+        vendors = Vendor.objects.filter(user__email__startswith=f'bench-{tag}-').order_by('-created_at', '-id')
+        orders = Order.objects.filter(order_number__startswith=f'B{tag}').order_by('-created_at', '-id')
+        context = {'request': request}
+        return [
+            (
+                'products',
+                lambda: ProductSerializer(products.for_serialization()[:page_size], many=True, context=context).data,
+                lambda: product_payloads(product_rows(products)[:page_size], request),
+            ),
+            (
+                'vendors',
+                lambda: VendorSerializer(vendors.select_related('user')[:page_size], many=True, context=context).data,
+                lambda: vendor_payloads(vendor_rows(vendors)[:page_size], request),
+            ),
+            (
+                'orders',
+                lambda: OrderSerializer(orders.for_serialization()[:page_size], many=True).data,
+                lambda: order_payloads(order_rows(orders)[:page_size]),
+            ),
+        ]
+
+    def time(self, build, repeat):
+        def run():
+            build()
+            reset_queries()
+        return min(timeit.repeat(run, number=1, repeat=repeat)) * 1000
+
+    def handle(self, *args, **options):
+        tag = seed_catalog(options['products'])
+        users = []
+        try:
+            users = self.seed(tag, options)
+            request = APIRequestFactory().get('/api/products/', HTTP_HOST='localhost')
+            self.stdout.write(f"{'payload':<10}{'serializer':>12}{'projection':>12}{'x':>7}")
+            for label, serialize, project in self.cases(tag, options['page_size'], request):
+                if JSONRenderer().render(serialize()) != JSONRenderer().render(project()):
+                    self.stderr.write(self.style.ERROR(f'{label}: the payloads differ'))
+                slow = self.time(serialize, options['repeat'])
+                fast = self.time(project, options['repeat'])
+                self.stdout.write(f'{label:<10}{slow:>10.2f}ms{fast:>10.2f}ms{slow / fast:>6.1f}x')
+        finally:
+            if not options['keep']:
+                Order.objects.filter(user__in=users).delete()
+                remove_catalog(tag)
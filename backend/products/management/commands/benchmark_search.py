@@ -0,0 +1,100 @@
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+
+from products.search import SearchIndex, build_index, make_document
+
+WORDS = [
+    'turmeric', 'pepper', 'cardamom', 'cinnamon', 'clove', 'cumin', 'saffron', 'ginger', 'garlic', 'chilli',
+    'biscuit', 'cookie', 'bread', 'rusk', 'cake', 'muffin', 'honey', 'ghee', 'jaggery', 'pickle',
+    'herbal', 'tulsi', 'neem', 'amla', 'ashwagandha', 'soap', 'shampoo', 'cleaner', 'detergent', 'polish',
+    'organic', 'premium', 'natural', 'roasted', 'ground', 'whole', 'fresh', 'classic', 'family', 'pack',
+]
+
+
+def synthetic_vocabulary(size, rng):
+    """
+    Pseudo-words with Zipf-like weights, so descriptions have a realistic
+    long tail. The product words sit in the tail; names carry them instead.
+    """
+    words = [''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(4, 10))) for _ in range(size)] + WORDS
+    weights = list(accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    return words, weights
+
+
+def synthetic_documents(count, vendors, categories, rng):
+    vocabulary, weights = synthetic_vocabulary(20000, rng)
+    for product_id in range(1, count + 1):
+        name = ' '.join(rng.sample(WORDS, 2) + rng.choices(vocabulary, cum_weights=weights, k=1))
+        fields = {
+            'name': f'{name} {product_id % 500}g',
+            'description': ' '.join(rng.choices(vocabulary, cum_weights=weights, k=12)),
+            'sku': f'SKU-{product_id}',
+            'category': f'Category {product_id % categories}',
+            'vendor': f'Vendor {product_id % vendors}',
+        }
+        price = Decimal(rng.randint(1000, 1000000)) / 100
+        yield make_document(product_id, fields, product_id % categories + 1, product_id % vendors + 1, price)
+
+
+class Command(BaseCommand):
+    help = (
+        'Build a search index over an in-memory synthetic catalog and report '
+        'build time and query throughput for exact, prefix, typo and filtered queries.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--vendors', type=int, default=200)
+        parser.add_argument('--categories', type=int, default=25)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'products.idx')
+            started = time.perf_counter()
+            build_index(path, synthetic_documents(options['products'], options['vendors'], options['categories'], rng))
+            self.stdout.write(
+                f"Indexed {options['products']} products in {time.perf_counter() - started:.1f}s "
+                f'({os.path.getsize(path) / 2 ** 20:.0f} MiB)'
+            )
+
+            started = time.perf_counter()
+            index = SearchIndex(path)
+            index.refresh()
+            self.stdout.write(f'Opened in {(time.perf_counter() - started) * 1000:.1f}ms')
+
+            workloads = [
+                ('exact', lambda: {'query': ' '.join(rng.sample(WORDS, 2))}),
+                ('prefix', lambda: {'query': rng.choice(WORDS)[:4]}),
+                ('typo', lambda: {'query': self.typo(rng.choice(WORDS), rng)}),
+                ('sku', lambda: {'query': f"sku-{rng.randint(1, options['products'])}"}),
+                ('filtered', lambda: {
+                    'query': rng.choice(WORDS),
+                    'categories': {rng.randint(1, options['categories'])},
+                    'min_price': 50000,
+                    'max_price': 250000,
+                }),
+            ]
+            for label, make_query in workloads:
+                timings = []
+                for _ in range(options['queries']):
+                    query = make_query()
+                    started = time.perf_counter()
+                    index.search(**query)
+                    timings.append(time.perf_counter() - started)
+                timings.sort()
+                p50 = timings[len(timings) // 2] * 1000
+                p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+                self.stdout.write(f'{label:<10} {len(timings) / sum(timings):8.1f} q/s  p50={p50:7.2f}ms  p99={p99:7.2f}ms')
+
+    @staticmethod
+    def typo(word, rng):
+        position = rng.randrange(1, len(word))
+        return word[:position] + rng.choice('aeiou') + word[position + 1:]
@@ -0,0 +1,23 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.cache import invalidate
+from products.search import build_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index from the database and fold in pending journal entries.'
+
+    def handle(self, *args, **options):
+        first = not os.path.exists(settings.SEARCH_INDEX_PATH)
+        started = time.perf_counter()
+        build_index()
+        if first:
+            # Cached searches were answered from the database until now
+            invalidate('catalog')
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {settings.SEARCH_INDEX_PATH} in {time.perf_counter() - started:.1f}s'
+        ))
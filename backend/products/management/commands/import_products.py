@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import BATCH_SIZE, FORMATS, import_products
+from users.models import Vendor
+
+
+class Command(BaseCommand):
+    help = 'Upsert a vendor\'s products from a CSV or JSONL file, streaming it in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--vendor', type=int, required=True, help='Vendor id the products belong to.')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        vendor = Vendor.objects.filter(pk=options['vendor']).first()
+        if vendor is None:
+            raise CommandError(f"Vendor {options['vendor']} does not exist")
+        file_format = options['format'] or options['path'].rpartition('.')[2].lower()
+        if file_format not in FORMATS:
+            raise CommandError('Pass --format csv or --format jsonl')
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            report = import_products(vendor, stream, file_format, batch_size=options['batch_size'])
+        for error in report.errors:
+            self.stderr.write(json.dumps(error))
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.created} created, {report.updated} updated, {report.failed} failed'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored rating aggregates on every product from approved reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        processed = rebuild_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt ratings for {processed} products'))
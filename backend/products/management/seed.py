@@ -0,0 +1,55 @@
+import random
+import uuid
+from decimal import Decimal
+
+from django.db import transaction
+
+from users.models import User, Vendor
+from products.models import Category, Product
+
+CATEGORY_NAMES = ['Food Products', 'Bakery Items', 'Spices', 'Herbal Products', 'Cleaning Solutions']
+
+
+def seed_catalog(products, vendors=20, batch_size=5000, seed=0):
+    """
+    Bulk-insert a synthetic catalog and return the run tag used in every slug
+    and email so the rows can be found (and removed) again.
+    """
+    rng = random.Random(seed)
+    tag = uuid.uuid4().hex[:8]
+
+    with transaction.atomic():
+        categories = []
+        for name in CATEGORY_NAMES:
+            slug = f'bench-{tag}-{name.lower().replace(" ", "-")}'
+            categories.append(Category.objects.create(name=f'{name} {tag}', slug=slug))
+
+        vendor_objs = []
+        for i in range(vendors):
+            user = User.objects.create(email=f'bench-{tag}-{i}@example.com', name=f'Bench Vendor {i}', role='vendor')
+            vendor_objs.append(Vendor.objects.create(user=user, business_name=f'Bench Vendor {i}', is_approved=True))
+
+    for start in range(0, products, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, products)):
+            batch.append(Product(
+                vendor=rng.choice(vendor_objs),
+                category=rng.choice(categories),
+                name=f'Bench Product {i}',
+                slug=f'bench-{tag}-{i}',
+                description='Synthetic catalog row',
+                price=Decimal(rng.randint(1000, 100000)) / 100,
+                sku=f'B{tag}{i}',
+                quantity=rng.randint(0, 200),
+                is_featured=rng.random() < 0.05,
+                is_active=rng.random() < 0.95,
+            ))
+        Product.objects.bulk_create(batch, batch_size=batch_size)
+
+    return tag
+
+
+def remove_catalog(tag):
+    Product.objects.filter(slug__startswith=f'bench-{tag}-').delete()
+    Category.objects.filter(slug__startswith=f'bench-{tag}-').delete()
+    User.objects.filter(email__startswith=f'bench-{tag}-').delete()
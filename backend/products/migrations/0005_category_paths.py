@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def path_of(category_id, seen=()):
+        if category_id not in paths:
+            parent_id = parents[category_id]
+            # A parent loop left by earlier data is cut at the repeat
+            if parent_id is None or parent_id in seen:
+                paths[category_id] = f'{category_id}/'
+            else:
+                paths[category_id] = path_of(parent_id, seen + (category_id,)) + f'{category_id}/'
+        return paths[category_id]
+
+    categories = list(Category.objects.only('id'))
+    for category in categories:
+        category.path = path_of(category.id)
+        category.depth = category.path.count('/') - 1
+    Category.objects.bulk_update(categories, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:41
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def clear_blank_and_duplicate_skus(apps, schema_editor):
+    # unique_vendor_sku cannot be added while a vendor repeats a SKU
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(sku='').update(sku=None)
+    duplicates = (
+        Product.objects.exclude(sku=None).values('vendor', 'sku')
+        .annotate(products=Count('id'), first=Min('id')).filter(products__gt=1)
+    )
+    for row in duplicates:
+        # The oldest product keeps the SKU; the others get their id appended
+        for product in Product.objects.filter(vendor=row['vendor'], sku=row['sku']).exclude(pk=row['first']):
+            suffix = f'-{product.pk}'
+            sku = row['sku'][:100 - len(suffix)] + suffix
+            if Product.objects.filter(vendor=row['vendor'], sku=sku).exists():
+                sku = None
+            Product.objects.filter(pk=product.pk).update(sku=sku)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_category_paths'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_blank_and_duplicate_skus, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('vendor', 'sku'), name='unique_vendor_sku'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Prefetch
 from users.models import Vendor
 
 class Category(models.Model):
@@ -8,6 +9,10 @@ class Category(models.Model):
     image = models.ImageField(upload_to='category_images/', blank=True, null=True)
     parent = models.ForeignKey('self', on_delete=models.SET_NULL, blank=True, null=True, related_name='children')
     is_active = models.BooleanField(default=True)
+    # Materialized ancestry, e.g. '3/8/15/' for 15 under 8 under 3; kept in
+    # step with ``parent`` by products.signals. A subtree is a prefix match.
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -18,6 +23,19 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class ProductQuerySet(models.QuerySet):
+    def for_serialization(self):
+        """
+        Load everything ProductSerializer renders in a fixed number of queries:
+        category and vendor are joined and nested rows are prefetched. Ratings
+        come from the stored aggregates on Product, see products.ratings.
+        """
+        return self.select_related('category', 'vendor').prefetch_related(
+            'images',
+            'variants',
+            Prefetch('reviews', queryset=Review.objects.filter(is_approved=True).select_related('user')),
+        )
+
 class Product(models.Model):
     vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='products')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, blank=True, null=True, related_name='products')
@@ -34,12 +52,44 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Aggregates over approved reviews, maintained by products.ratings
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_average = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_active', 'created_at'], name='product_active_created_idx'),
+            models.Index(fields=['is_active', 'category', 'created_at'], name='product_category_created_idx'),
+            models.Index(fields=['is_active', 'is_featured', 'created_at'], name='product_featured_created_idx'),
+            models.Index(fields=['is_active', 'vendor', 'created_at'], name='product_vendor_created_idx'),
+            models.Index(fields=['is_active', 'price'], name='product_active_price_idx'),
+            models.Index(fields=['is_active', 'category', 'price'], name='product_category_price_idx'),
+            models.Index(fields=['is_active', 'rating_average'], name='product_active_rating_idx'),
+            models.Index(fields=['is_active', 'category', 'rating_average'], name='product_category_rating_idx'),
+        ]
+        constraints = [
+            # Bulk imports upsert on this key; products without a SKU are unaffected
+            models.UniqueConstraint(fields=['vendor', 'sku'], name='unique_vendor_sku'),
+        ]
     
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        # A blank SKU is stored as NULL, which unique_vendor_sku lets repeat
+        if not self.sku:
+            self.sku = None
+        super().save(*args, **kwargs)
+    
     @property
     def is_in_stock(self):
         return self.quantity > 0
@@ -49,6 +99,16 @@ class Product(models.Model):
         if self.compare_price and self.compare_price > self.price:
             return int(((self.compare_price - self.price) / self.compare_price) * 100)
         return 0
+    
+    @property
+    def average_rating(self):
+        if self.rating_count:
+            return self.rating_sum / self.rating_count
+        return 0
+    
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f'rating_{star}_count') for star in range(1, 6)}
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
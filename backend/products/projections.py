@@ -0,0 +1,111 @@
+"""
+Fast read path for product lists: what ProductSerializer renders, built
+from ``values_list`` rows by plain functions instead of per-field
+serializer machinery and model instances. ProductProjectionTests keeps the
+two in step; change them together.
+"""
+from collections import defaultdict
+
+from django.db.models import F
+
+from ecommerce.projections import file_url, money, timestamp
+from users.models import Vendor
+from .models import ProductImage, ProductVariant, Review
+
+COLUMNS = (
+    'id', 'vendor_id', 'vendor_name', 'vendor_logo', 'category_id', 'category_name', 'name', 'slug',
+    'description', 'price', 'compare_price', 'sku', 'quantity', 'is_featured', 'is_active', 'created_at',
+    'rating_count', 'rating_sum', 'rating_average', 'rating_1_count', 'rating_2_count', 'rating_3_count',
+    'rating_4_count', 'rating_5_count',
+)
+
+image_storage = ProductImage._meta.get_field('image').storage
+logo_storage = Vendor._meta.get_field('logo').storage
+
+
+def product_rows(queryset):
+    """
+    ``queryset`` as named rows for product_payloads, with category and
+    vendor joined. The rows carry every field the catalog orders by, so
+    they can be paginated like the products themselves.
+    """
+    return queryset.annotate(
+        category_name=F('category__name'),
+        vendor_name=F('vendor__business_name'),
+        vendor_logo=F('vendor__logo'),
+    ).values_list(*COLUMNS, named=True)
+
+
+def nested_rows(product_ids, request):
+    """``(images, variants, reviews)`` payloads by product id, one query each."""
+    images = defaultdict(list)
+    for pk, product_id, image, alt_text, is_primary in ProductImage.objects.filter(product_id__in=product_ids).values_list(
+        'id', 'product_id', 'image', 'alt_text', 'is_primary'
+    ):
+        images[product_id].append({
+            'id': pk, 'image': file_url(image_storage, image, request), 'alt_text': alt_text, 'is_primary': is_primary,
+        })
+
+    variants = defaultdict(list)
+    for pk, product_id, name, value in ProductVariant.objects.filter(product_id__in=product_ids).values_list(
+        'id', 'product_id', 'name', 'value'
+    ):
+        variants[product_id].append({'id': pk, 'name': name, 'value': value})
+
+    reviews = defaultdict(list)
+    for pk, product_id, user_id, user_name, rating, comment, created_at in Review.objects.filter(
+        product_id__in=product_ids, is_approved=True
+    ).values_list('id', 'product_id', 'user_id', 'user__name', 'rating', 'comment', 'created_at'):
+        reviews[product_id].append({
+            'id': pk, 'user': user_id, 'user_name': user_name, 'rating': rating, 'comment': comment,
+            'created_at': timestamp(created_at),
+        })
+    return images, variants, reviews
+
+
+def discount_percentage(price, compare_price):
+    if compare_price and compare_price > price:
+        return int(((compare_price - price) / compare_price) * 100)
+    return 0
+
+
+def product_payloads(rows, request=None):
+    """``ProductSerializer(products, many=True).data`` for the products in ``rows``."""
+    rows = list(rows)
+    if not rows:
+        return []
+    images, variants, reviews = nested_rows([row.id for row in rows], request)
+    return [
+        {
+            'id': row.id,
+            'vendor': row.vendor_id,
+            'vendor_details': {
+                'id': row.vendor_id,
+                'name': row.vendor_name,
+                'logo': file_url(logo_storage, row.vendor_logo),
+            },
+            'category': row.category_id,
+            'category_name': row.category_name,
+            'name': row.name,
+            'slug': row.slug,
+            'description': row.description,
+            'price': money(row.price),
+            'compare_price': money(row.compare_price),
+            'sku': row.sku,
+            'quantity': row.quantity,
+            'is_featured': row.is_featured,
+            'is_active': row.is_active,
+            'created_at': timestamp(row.created_at),
+            'images': images.get(row.id, []),
+            'variants': variants.get(row.id, []),
+            'reviews': reviews.get(row.id, []),
+            'average_rating': row.rating_sum / row.rating_count if row.rating_count else 0,
+            'rating_count': row.rating_count,
+            'rating_histogram': {
+                1: row.rating_1_count, 2: row.rating_2_count, 3: row.rating_3_count,
+                4: row.rating_4_count, 5: row.rating_5_count,
+            },
+            'discount_percentage': discount_percentage(row.price, row.compare_price),
+        }
+        for row in rows
+    ]
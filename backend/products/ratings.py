@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
+
+from .models import Product, Review
+
+STARS = range(1, 6)
+
+
+def _average_expression():
+    return Case(
+        When(rating_count__gt=0, then=ExpressionWrapper(
+            F('rating_sum') * Value(1.0) / F('rating_count'),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        )),
+        default=Value(0),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+
+
+def counted_rating(rating, is_approved):
+    """Return the star value a review contributes, or None if it does not count."""
+    if not is_approved or rating not in STARS:
+        return None
+    return rating
+
+
+def apply_rating_change(product_id, old_rating=None, new_rating=None):
+    """
+    Move one review's contribution on ``product_id`` from ``old_rating`` to
+    ``new_rating`` (either may be None). Counters change through F()
+    expressions so concurrent reviews never overwrite each other, and the
+    average is recomputed from the locked row in the same transaction.
+    """
+    if old_rating == new_rating:
+        return
+
+    updates = {}
+    count_delta = 0
+    sum_delta = 0
+    if old_rating is not None:
+        count_delta -= 1
+        sum_delta -= old_rating
+        updates[f'rating_{old_rating}_count'] = F(f'rating_{old_rating}_count') - 1
+    if new_rating is not None:
+        count_delta += 1
+        sum_delta += new_rating
+        star_field = f'rating_{new_rating}_count'
+        updates[star_field] = updates.get(star_field, F(star_field)) + 1
+    if count_delta:
+        updates['rating_count'] = F('rating_count') + count_delta
+    if sum_delta:
+        updates['rating_sum'] = F('rating_sum') + sum_delta
+
+    with transaction.atomic():
+        products = Product.objects.filter(pk=product_id)
+        products.update(**updates)
+        products.update(rating_average=_average_expression())
+
+
+def rebuild_ratings(queryset=None, batch_size=1000):
+    """
+    Recompute the stored aggregates from approved reviews, ``batch_size``
+    products at a time. Returns the number of products processed.
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    aggregates = {'rating_count': Count('id'), 'rating_sum': Sum('rating')}
+    for star in STARS:
+        aggregates[f'rating_{star}_count'] = Count('id', filter=Q(rating=star))
+    fields = list(aggregates) + ['rating_average']
+
+    processed = 0
+    last_id = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return processed
+
+        with transaction.atomic():
+            # Lock the batch so incremental updates wait for the rebuild.
+            list(Product.objects.select_for_update().filter(pk__in=ids).values_list('pk', flat=True))
+            rows = {
+                row.pop('product'): row
+                for row in Review.objects.filter(product_id__in=ids, is_approved=True, rating__in=STARS)
+                .order_by().values('product').annotate(**aggregates)
+            }
+            products = []
+            for product_id in ids:
+                row = rows.get(product_id, {})
+                product = Product(pk=product_id)
+                for field in aggregates:
+                    setattr(product, field, row.get(field) or 0)
+                product.rating_average = Decimal(0)
+                if product.rating_count:
+                    product.rating_average = (Decimal(product.rating_sum) / product.rating_count).quantize(Decimal('0.01'))
+                products.append(product)
+            Product.objects.bulk_update(products, fields, batch_size=batch_size)
+        processed += len(ids)
+        last_id = ids[-1]
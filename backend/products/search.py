@@ -0,0 +1,599 @@
+"""
+Product search over a local inverted index.
+
+The index is a single immutable segment file that every worker memory-maps,
+plus a per-process overlay for products changed since the segment was
+written. Changes are announced by appending product ids to a journal next to
+the segment; each process replays new journal lines before searching and
+re-reads those products from the database, so all workers converge without a
+search server. ``build_index`` (or the ``build_search_index`` command)
+compacts everything back into a fresh segment. Requests never build one:
+until the first segment exists, searches fall back to a plain database
+match on product names, without ranking or facets.
+
+Segment layout, native byte order, every section 8-byte aligned::
+
+    header     magic, version, generation, documents, terms, total length, string bytes
+    documents  product id, BM25 length norm (float64), category id, vendor id, price in paise (int64 columns)
+    terms      string offsets and posting offsets (terms + 1 uint64 each), then the sorted term strings
+    postings   (document ordinal, term frequency) uint32 pairs, grouped by term
+"""
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from decimal import Decimal
+from heapq import nlargest
+from itertools import islice
+
+from django.conf import settings
+
+from .models import Product
+
+MAGIC = b'PSIX'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQQQQ')
+
+TOKEN_RE = re.compile(r'[0-9a-z]+')
+
+# Each occurrence of a token in a field adds this much to its term frequency.
+FIELD_WEIGHTS = (('name', 3), ('sku', 3), ('category', 2), ('vendor', 2), ('description', 1))
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Score multipliers for terms that only complete or nearly match a query token
+PREFIX_WEIGHT = 0.7
+FUZZY_WEIGHT = 0.5
+MAX_EXPANSIONS = 50
+MIN_PREFIX_LENGTH = 2
+
+# Share of the catalog above which a term is treated like a stop word
+COMMON_TERM_RATIO = 0.1
+# Rough cost of one binary-search lookup in postings, relative to scanning one entry
+LOOKUP_COST = 32
+
+# Lower bounds in paise; a price falls in the last bucket whose bound it reaches.
+PRICE_BUCKETS = (0, 50000, 100000, 250000, 500000)
+
+VALUE_FIELDS = (
+    'id', 'name', 'description', 'sku', 'category__name', 'vendor__business_name',
+    'category_id', 'vendor_id', 'price',
+)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def max_typos(token):
+    # Numbers and codes such as SKUs must match exactly or by prefix
+    if len(token) < 4 or not token.isalpha():
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+def within_distance(a, b, limit):
+    """Whether the Levenshtein distance between ``a`` and ``b`` is at most ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def is_near(token, term, limit):
+    """``within_distance`` behind cheap filters; each edit changes the character set by at most two."""
+    return (
+        abs(len(term) - len(token)) <= limit
+        and term.isalpha()
+        and len(set(token) ^ set(term)) <= 2 * limit
+        and within_distance(token, term, limit)
+    )
+
+
+def posting_frequency(postings, ordinal):
+    """Binary search a flat postings view (sorted by ordinal) for one document's term frequency."""
+    low, high = 0, len(postings) // 2
+    while low < high:
+        middle = (low + high) // 2
+        if postings[2 * middle] < ordinal:
+            low = middle + 1
+        else:
+            high = middle
+    if low < len(postings) // 2 and postings[2 * low] == ordinal:
+        return postings[2 * low + 1]
+    return 0
+
+
+def length_norm(length, average_length):
+    """The document-length part of the BM25 denominator."""
+    return K1 * (1 - B + B * length / average_length)
+
+
+def price_bucket(price):
+    return PRICE_BUCKETS[bisect_right(PRICE_BUCKETS, price) - 1]
+
+
+def bucket_label(lower):
+    position = PRICE_BUCKETS.index(lower)
+    if position + 1 == len(PRICE_BUCKETS):
+        return f'{lower // 100}+'
+    return f'{lower // 100}-{PRICE_BUCKETS[position + 1] // 100}'
+
+
+class Document:
+    __slots__ = ('id', 'terms', 'length', 'category_id', 'vendor_id', 'price')
+
+    def __init__(self, product_id, terms, category_id, vendor_id, price):
+        self.id = product_id
+        self.terms = terms
+        self.length = sum(terms.values())
+        self.category_id = category_id or 0
+        self.vendor_id = vendor_id
+        self.price = price
+
+
+def make_document(product_id, fields, category_id, vendor_id, price):
+    """Build a document from ``{field: text}`` and the facet values; ``price`` is a Decimal."""
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        tokens = tokenize(fields.get(field))
+        if field == 'sku' and len(tokens) > 1:
+            # 'SPC-001' is also findable as 'spc001'
+            tokens.append(''.join(tokens))
+        for token in tokens:
+            terms[token] += weight
+    return Document(product_id, dict(terms), category_id, vendor_id, int(price * 100))
+
+
+def product_documents(queryset=None):
+    """Documents for the active products in ``queryset``, read in primary key order."""
+    if queryset is None:
+        queryset = Product.objects.all()
+    rows = queryset.filter(is_active=True).order_by('pk').values_list(*VALUE_FIELDS)
+    for product_id, name, description, sku, category, vendor, category_id, vendor_id, price in rows.iterator(chunk_size=2000):
+        fields = {'name': name, 'description': description, 'sku': sku, 'category': category, 'vendor': vendor}
+        yield make_document(product_id, fields, category_id, vendor_id, price)
+
+
+def journal_path(path, generation):
+    return f'{path}.{generation}.journal'
+
+
+def write_segment(path, documents, generation):
+    ids, lengths, categories, vendors, prices = (array('q') for _ in range(5))
+    postings = defaultdict(lambda: array('I'))
+    total_length = 0
+    for ordinal, document in enumerate(documents):
+        ids.append(document.id)
+        lengths.append(document.length)
+        categories.append(document.category_id)
+        vendors.append(document.vendor_id)
+        prices.append(document.price)
+        total_length += document.length
+        for term, frequency in document.terms.items():
+            entry = postings[term]
+            entry.append(ordinal)
+            entry.append(frequency)
+
+    # Length norms depend only on the segment, so they are computed once here
+    average_length = total_length / len(ids) if ids else 1
+    norms = array('d', (length_norm(length, average_length) for length in lengths))
+
+    terms = sorted(postings)
+    encoded = [term.encode() for term in terms]
+    string_offsets = array('Q', [0])
+    posting_offsets = array('Q', [0])
+    for term, data in zip(terms, encoded):
+        string_offsets.append(string_offsets[-1] + len(data))
+        posting_offsets.append(posting_offsets[-1] + len(postings[term]) // 2)
+    strings = b''.join(encoded)
+
+    with open(path, 'wb') as handle:
+        handle.write(HEADER.pack(MAGIC, VERSION, generation, len(ids), len(terms), total_length, len(strings)))
+        for column in (ids, norms, categories, vendors, prices, string_offsets, posting_offsets):
+            handle.write(column.tobytes())
+        handle.write(strings)
+        handle.write(b'\0' * (-len(strings) % 8))
+        for term in terms:
+            handle.write(postings[term].tobytes())
+
+
+def read_generation(path):
+    with open(path, 'rb') as handle:
+        magic, version, generation, *_ = HEADER.unpack(handle.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} product search index')
+    return generation
+
+
+class TermList:
+    """Read-only sequence view of a segment's sorted terms, for ``bisect``."""
+
+    def __init__(self, segment):
+        self.segment = segment
+
+    def __len__(self):
+        return self.segment.term_count
+
+    def __getitem__(self, index):
+        return self.segment.term(index)
+
+
+class Segment:
+    def __init__(self, path):
+        with open(path, 'rb') as handle:
+            self.map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, generation, documents, terms, total_length, string_bytes = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} product search index')
+        self.generation = generation
+        self.documents = documents
+        self.term_count = terms
+        self.total_length = total_length
+
+        self.view = view = memoryview(self.map)
+        offset = HEADER.size
+        columns = []
+        for count, code in ((documents, 'q'), (documents, 'd')) + ((documents, 'q'),) * 3 + ((terms + 1, 'Q'),) * 2:
+            columns.append(view[offset:offset + count * 8].cast(code))
+            offset += count * 8
+        self.ids, self.norms, self.categories, self.vendors, self.prices, self.string_offsets, self.posting_offsets = columns
+        self.strings = view[offset:offset + string_bytes]
+        offset += string_bytes + (-string_bytes % 8)
+        self.posting_data = view[offset:].cast('I')
+        self.terms = TermList(self)
+
+    def close(self):
+        views = (
+            self.ids, self.norms, self.categories, self.vendors, self.prices, self.string_offsets,
+            self.posting_offsets, self.strings, self.posting_data, self.view,
+        )
+        for view in views:
+            view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            # A slice of the mapping is still held; it is unmapped once that is collected
+            pass
+
+    def term(self, index):
+        return str(self.strings[self.string_offsets[index]:self.string_offsets[index + 1]], 'utf-8')
+
+    def find(self, term):
+        index = bisect_left(self.terms, term)
+        if index < self.term_count and self.term(index) == term:
+            return index
+        return None
+
+    def prefix_range(self, prefix):
+        return range(bisect_left(self.terms, prefix), bisect_left(self.terms, prefix + '\uffff'))
+
+    def postings(self, index):
+        """Flat ``[ordinal, frequency, ordinal, frequency, ...]`` view of one term's postings."""
+        if index is None:
+            return ()
+        return self.posting_data[2 * self.posting_offsets[index]:2 * self.posting_offsets[index + 1]]
+
+    def similar_terms(self, token, limit):
+        # Typos in the first character are not corrected; that keeps the scan
+        # to one slice of the dictionary.
+        string_offsets = self.string_offsets
+        for index in self.prefix_range(token[0]):
+            length = string_offsets[index + 1] - string_offsets[index]
+            if abs(length - len(token)) <= limit:
+                term = self.term(index)
+                if is_near(token, term, limit):
+                    yield term
+
+
+class SearchResult:
+    __slots__ = ('count', 'ids', 'facets')
+
+    def __init__(self, count, ids, facets):
+        self.count = count
+        self.ids = ids
+        self.facets = facets
+
+
+def empty_result():
+    return SearchResult(0, [], {'category': Counter(), 'vendor': Counter(), 'price': Counter()})
+
+
+def database_search(tokens, categories=None, vendor=None, min_price=None, max_price=None, offset=0, limit=20):
+    """Active products whose names contain every token, by name; the stand-in for a missing index."""
+    products = Product.objects.filter(is_active=True)
+    for token in tokens:
+        products = products.filter(name__icontains=token)
+    if categories is not None:
+        products = products.filter(category_id__in=categories)
+    if vendor is not None:
+        products = products.filter(vendor_id=vendor)
+    if min_price is not None:
+        products = products.filter(price__gte=Decimal(min_price) / 100)
+    if max_price is not None:
+        products = products.filter(price__lte=Decimal(max_price) / 100)
+    ids = list(products.order_by('name', 'pk').values_list('pk', flat=True)[offset:offset + limit])
+    count = products.count() if ids or offset else 0
+    return SearchResult(count, ids, empty_result().facets)
+
+
+class SearchIndex:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.segment = None
+        self.segment_identity = None
+        self.journal_position = 0
+        self.reset_overlay()
+
+    def reset_overlay(self):
+        self.removed = set()  # product ids whose segment entry is stale
+        self.documents = {}  # product id -> Document, for products changed since the segment was built
+        self.postings = defaultdict(dict)  # term -> {product id: frequency}
+        self.overlay_terms = []
+
+    def journal_path(self):
+        return journal_path(self.path, self.segment.generation)
+
+    def refresh(self):
+        """Map the current segment, if one has been built, and replay the journal."""
+        with self.lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            identity = (stat.st_ino, stat.st_mtime_ns)
+            if identity != self.segment_identity:
+                # Searches hold the lock while they read the segment, so none is using the old one
+                previous, self.segment = self.segment, Segment(self.path)
+                if previous is not None:
+                    previous.close()
+                self.segment_identity = identity
+                self.journal_position = 0
+                self.reset_overlay()
+            self.replay_journal()
+
+    def replay_journal(self):
+        try:
+            with open(self.journal_path(), 'rb') as handle:
+                handle.seek(self.journal_position)
+                data = handle.read()
+        except FileNotFoundError:
+            return
+        # A line still being written is picked up on the next refresh.
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return
+        self.journal_position += end
+        product_ids = {int(line) for line in data[:end].split()}
+        documents = {document.id: document for document in product_documents(Product.objects.filter(pk__in=product_ids))}
+        for product_id in product_ids:
+            self.apply(product_id, documents.get(product_id))
+        self.overlay_terms = sorted(self.postings)
+
+    def apply(self, product_id, document):
+        self.removed.add(product_id)
+        previous = self.documents.pop(product_id, None)
+        if previous:
+            for term in previous.terms:
+                postings = self.postings[term]
+                del postings[product_id]
+                if not postings:
+                    del self.postings[term]
+        if document:
+            self.documents[product_id] = document
+            for term, frequency in document.terms.items():
+                self.postings[term][product_id] = frequency
+
+    def record(self, product_ids):
+        """
+        Announce changed products to every process using the index. Nothing
+        is recorded until a segment exists, since building one reads the
+        database anyway.
+        """
+        with self.lock:
+            if not os.path.exists(self.path):
+                return
+            self.refresh()
+            data = ''.join(f'{product_id}\n' for product_id in product_ids).encode()
+            # A single O_APPEND write, so lines from concurrent processes do not interleave
+            descriptor = os.open(self.journal_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(descriptor, data)
+            finally:
+                os.close(descriptor)
+
+    def has_term(self, term):
+        return term in self.postings or self.segment.find(term) is not None
+
+    def expand(self, token):
+        """``{term: weight}`` for the terms a query token matches: itself, completions, then near misses."""
+        matches = {}
+        if self.has_term(token):
+            matches[token] = 1.0
+        if len(token) >= MIN_PREFIX_LENGTH:
+            segment_terms = (self.segment.term(index) for index in self.segment.prefix_range(token))
+            start = bisect_left(self.overlay_terms, token)
+            overlay_terms = (term for term in self.overlay_terms[start:] if term.startswith(token))
+            for term in islice(segment_terms, MAX_EXPANSIONS):
+                matches.setdefault(term, PREFIX_WEIGHT)
+            for term in islice(overlay_terms, MAX_EXPANSIONS):
+                matches.setdefault(term, PREFIX_WEIGHT)
+        limit = max_typos(token)
+        if not matches and limit:
+            similar = (term for term in self.overlay_terms if term[0] == token[0] and is_near(token, term, limit))
+            for term in islice(self.segment.similar_terms(token, limit), MAX_EXPANSIONS):
+                matches[term] = FUZZY_WEIGHT
+            for term in islice(similar, MAX_EXPANSIONS):
+                matches[term] = FUZZY_WEIGHT
+        return matches
+
+    def score(self, tokens, enough):
+        """
+        BM25 scores keyed by segment ordinal and by overlay product id.
+
+        Terms are scored rarest first. Once rarer terms have found ``enough``
+        candidates, a term in more than ``COMMON_TERM_RATIO`` of the catalog
+        only adds to their scores instead of pulling in most of the catalog.
+        """
+        segment = self.segment
+        document_count = max(segment.documents + len(self.documents), 1)
+        average_length = segment.total_length / segment.documents if segment.documents else 1
+        norms = segment.norms
+
+        weighted = {}
+        for token in dict.fromkeys(tokens):
+            for term, weight in self.expand(token).items():
+                weighted[term] = max(weight, weighted.get(term, 0))
+        terms = []
+        for term, weight in weighted.items():
+            postings = segment.postings(segment.find(term))
+            overlay = self.postings.get(term, {})
+            terms.append((len(postings) // 2 + len(overlay), term, weight, postings, overlay))
+        terms.sort(key=lambda entry: entry[0])
+
+        segment_scores = defaultdict(float)
+        overlay_scores = defaultdict(float)
+        for frequency_count, term, weight, postings, overlay in terms:
+            idf = weight * math.log(1 + (document_count - frequency_count + 0.5) / (frequency_count + 0.5))
+            scale = idf * (K1 + 1)
+            restrict = (
+                frequency_count > COMMON_TERM_RATIO * document_count
+                and len(segment_scores) + len(overlay_scores) >= enough
+            )
+            if restrict and len(segment_scores) * LOOKUP_COST < frequency_count:
+                # Few candidates against a long posting list: look each one up
+                for ordinal in list(segment_scores):
+                    frequency = posting_frequency(postings, ordinal)
+                    if frequency:
+                        segment_scores[ordinal] += scale * frequency / (frequency + norms[ordinal])
+            else:
+                pairs = iter(postings)
+                for ordinal, frequency in zip(pairs, pairs):
+                    if restrict and ordinal not in segment_scores:
+                        continue
+                    segment_scores[ordinal] += scale * frequency / (frequency + norms[ordinal])
+            for product_id, frequency in overlay.items():
+                if restrict and product_id not in overlay_scores:
+                    continue
+                norm = length_norm(self.documents[product_id].length, average_length)
+                overlay_scores[product_id] += scale * frequency / (frequency + norm)
+        return segment_scores, overlay_scores
+
+    def search(self, query, categories=None, vendor=None, min_price=None, max_price=None, offset=0, limit=20):
+        """
+        Rank active products for ``query`` and page through them.
+
+        Filters narrow the results; each facet counts the matches under every
+        filter except its own, so the other choices stay visible. Prices are
+        in paise. Products that match only very common terms are left out of
+        the count and facets when rarer terms already filled the page.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return empty_result()
+        with self.lock:
+            self.refresh()
+            segment = self.segment
+            if segment is not None:
+                segment_scores, overlay_scores = self.score(tokens, offset + limit)
+                hits = [
+                    (score, product_id, segment.categories[ordinal], segment.vendors[ordinal], segment.prices[ordinal])
+                    for ordinal, score in segment_scores.items()
+                    if (product_id := segment.ids[ordinal]) not in self.removed
+                ]
+                for product_id, score in overlay_scores.items():
+                    document = self.documents[product_id]
+                    hits.append((score, product_id, document.category_id, document.vendor_id, document.price))
+        if segment is None:
+            # No index has been built yet; the database query runs outside the lock
+            return database_search(tokens, categories, vendor, min_price, max_price, offset, limit)
+
+        if categories is None and vendor is None and min_price is None and max_price is None:
+            matched = hits
+            category_facet = Counter(hit[2] for hit in hits if hit[2])
+            vendor_facet = Counter(hit[3] for hit in hits)
+            price_facet = Counter(price_bucket(hit[4]) for hit in hits)
+        else:
+            matched = []
+            category_facet, vendor_facet, price_facet = Counter(), Counter(), Counter()
+            for hit in hits:
+                _, _, category_id, vendor_id, price = hit
+                category_ok = categories is None or category_id in categories
+                vendor_ok = vendor is None or vendor_id == vendor
+                price_ok = (min_price is None or price >= min_price) and (max_price is None or price <= max_price)
+                if vendor_ok and price_ok and category_id:
+                    category_facet[category_id] += 1
+                if category_ok and price_ok:
+                    vendor_facet[vendor_id] += 1
+                if category_ok and vendor_ok:
+                    price_facet[price_bucket(price)] += 1
+                if category_ok and vendor_ok and price_ok:
+                    matched.append(hit)
+
+        top = nlargest(offset + limit, matched, key=lambda hit: (hit[0], -hit[1]))
+        facets = {'category': category_facet, 'vendor': vendor_facet, 'price': price_facet}
+        return SearchResult(len(matched), [hit[1] for hit in top[offset:]], facets)
+
+
+def build_index(path=None, documents=None):
+    """
+    Write a new segment from ``documents`` (all active products by default)
+    and swap it in atomically. Journal entries recorded while the build ran
+    are carried over, so no change is lost.
+    """
+    path = path or settings.SEARCH_INDEX_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    previous_journal = None
+    position = 0
+    try:
+        previous_journal = journal_path(path, read_generation(path))
+        position = os.path.getsize(previous_journal)
+    except (FileNotFoundError, ValueError):
+        pass
+
+    generation = time.time_ns()
+    temporary = f'{path}.{os.getpid()}.tmp'
+    write_segment(temporary, product_documents() if documents is None else documents, generation)
+    os.replace(temporary, path)
+
+    if previous_journal:
+        try:
+            with open(previous_journal, 'rb') as handle:
+                handle.seek(position)
+                carried = handle.read()
+            os.remove(previous_journal)
+        except FileNotFoundError:
+            carried = b''
+        carried = carried[:carried.rfind(b'\n') + 1]
+        if carried:
+            with open(journal_path(path, generation), 'ab') as handle:
+                handle.write(carried)
+    return generation
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None or _index.path != settings.SEARCH_INDEX_PATH:
+            _index = SearchIndex(settings.SEARCH_INDEX_PATH)
+        return _index
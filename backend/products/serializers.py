@@ -1,24 +1,36 @@
+from django.db import transaction
 from rest_framework import serializers
+from .bulk import reconcile_children
+from .cache import invalidate
 from .models import Category, Product, ProductImage, ProductVariant, Review
 from users.serializers import VendorSerializer
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'description', 'image', 'parent', 'is_active']
-        read_only_fields = ['id']
+        fields = ['id', 'name', 'slug', 'description', 'image', 'parent', 'depth', 'is_active']
+        read_only_fields = ['id', 'depth']
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    # Writable so an update can refer to an existing image; see ProductCreateUpdateSerializer
+    id = serializers.IntegerField(required=False)
+    
     class Meta:
         model = ProductImage
         fields = ['id', 'image', 'alt_text', 'is_primary']
-        read_only_fields = ['id']
+        extra_kwargs = {'image': {'required': False}}
+    
+    def validate(self, attrs):
+        if 'id' not in attrs and 'image' not in attrs:
+            raise serializers.ValidationError({'image': ['A new image needs a file.']})
+        return attrs
 
 class ProductVariantSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    
     class Meta:
         model = ProductVariant
         fields = ['id', 'name', 'value']
-        read_only_fields = ['id']
 
 class ReviewSerializer(serializers.ModelSerializer):
     user_name = serializers.SerializerMethodField()
@@ -38,6 +50,7 @@ class ProductSerializer(serializers.ModelSerializer):
     variants = ProductVariantSerializer(many=True, read_only=True)
     reviews = ReviewSerializer(many=True, read_only=True)
     average_rating = serializers.SerializerMethodField()
+    rating_histogram = serializers.ReadOnlyField()
     
     class Meta:
         model = Product
@@ -45,9 +58,11 @@ class ProductSerializer(serializers.ModelSerializer):
             'id', 'vendor', 'vendor_details', 'category', 'category_name', 
             'name', 'slug', 'description', 'price', 'compare_price', 
             'sku', 'quantity', 'is_featured', 'is_active', 'created_at',
-            'images', 'variants', 'reviews', 'average_rating', 'discount_percentage'
+            'images', 'variants', 'reviews', 'average_rating', 'rating_count',
+            'rating_histogram', 'discount_percentage'
         ]
-        read_only_fields = ['id', 'created_at', 'vendor_details', 'category_name', 'average_rating', 'discount_percentage']
+        read_only_fields = ['id', 'created_at', 'vendor_details', 'category_name', 'average_rating',
+                            'rating_count', 'discount_percentage']
     
     def get_category_name(self, obj):
         return obj.category.name if obj.category else None
@@ -60,10 +75,7 @@ class ProductSerializer(serializers.ModelSerializer):
         }
     
     def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / len(reviews)
-        return 0
+        return obj.average_rating
 
 class ProductCreateUpdateSerializer(serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, required=False)
@@ -77,6 +89,9 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
             'images', 'variants'
         ]
     
+    def validate_sku(self, value):
+        return value or None
+    
     def create(self, validated_data):
         images_data = validated_data.pop('images', [])
         variants_data = validated_data.pop('variants', [])
@@ -84,39 +99,40 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
         # Get the vendor from the current user
         vendor = self.context['request'].user.vendor_profile
         
-        # Create the product
-        product = Product.objects.create(vendor=vendor, **validated_data)
-        
-        # Create product images
-        for image_data in images_data:
-            ProductImage.objects.create(product=product, **image_data)
-        
-        # Create product variants
-        for variant_data in variants_data:
-            ProductVariant.objects.create(product=product, **variant_data)
+        with transaction.atomic():
+            product = Product.objects.create(vendor=vendor, **validated_data)
+            self.save_children(product, images_data, variants_data)
         
         return product
     
     def update(self, instance, validated_data):
+        """
+        Apply only what changed. Nested images are matched to the current rows
+        by ``id``, variants by ``id`` or by name and value; matched rows keep
+        their ids and unchanged ones are not written. Leaving ``images`` or
+        ``variants`` out leaves them alone.
+        """
         images_data = validated_data.pop('images', None)
         variants_data = validated_data.pop('variants', None)
         
-        # Update the product fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        changed = [attr for attr, value in validated_data.items() if getattr(instance, attr) != value]
+        with transaction.atomic():
+            if changed:
+                for attr in changed:
+                    setattr(instance, attr, validated_data[attr])
+                instance.save(update_fields=[*changed, 'updated_at'])
+            if self.save_children(instance, images_data, variants_data) and not changed:
+                # reconcile_children writes in bulk, which sends no signals
+                invalidate('catalog', f'product:{instance.pk}')
         
-        # Update images if provided
+        return instance
+    
+    def save_children(self, product, images_data, variants_data):
+        written = False
         if images_data is not None:
-            instance.images.all().delete()
-            for image_data in images_data:
-                ProductImage.objects.create(product=instance, **image_data)
-        
-        # Update variants if provided
+            written |= reconcile_children(
+                ProductImage, {product.pk: images_data}, ('image',), ('alt_text', 'is_primary')
+            )
         if variants_data is not None:
-            instance.variants.all().delete()
-            for variant_data in variants_data:
-                ProductVariant.objects.create(product=instance, **variant_data)
-        
-        return instance
-
+            written |= reconcile_children(ProductVariant, {product.pk: variants_data}, ('name', 'value'), ())
+        return written
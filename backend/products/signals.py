@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.models import Vendor
+from .cache import invalidate
+from .models import Category, Product, ProductImage, ProductVariant, Review
+from .ratings import apply_rating_change, counted_rating
+from .search import get_index
+from .tree import SEPARATOR, depth_of, move_subtree, path_for
+
+
+@receiver(pre_save, sender=Category)
+def check_category_move(sender, instance, **kwargs):
+    paths = dict(Category.objects.filter(pk__in=[instance.pk, instance.parent_id]).values_list('pk', 'path'))
+    parent_path = paths.get(instance.parent_id, '')
+    if instance.pk and f'{SEPARATOR}{instance.pk}{SEPARATOR}' in f'{SEPARATOR}{parent_path}':
+        raise ValueError('A category cannot be moved under itself or one of its descendants')
+    instance._previous_path = paths.get(instance.pk)
+    instance._parent_path = parent_path
+
+
+@receiver(post_save, sender=Category)
+def update_category_path(sender, instance, **kwargs):
+    path = path_for(instance._parent_path, instance.pk)
+    previous = instance._previous_path
+    if path == previous:
+        return
+    with transaction.atomic():
+        Category.objects.filter(pk=instance.pk).update(path=path, depth=depth_of(path))
+        if previous:
+            move_subtree(previous, path)
+    instance.path = path
+    instance.depth = depth_of(path)
+
+
+@receiver(post_delete, sender=Category)
+def promote_orphaned_categories(sender, instance, **kwargs):
+    # Children were detached by SET_NULL; their subtrees become top-level.
+    if instance.path:
+        move_subtree(instance.path, '')
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk:
+        previous = Review.objects.filter(pk=instance.pk).values('product_id', 'rating', 'is_approved').first()
+        if previous:
+            instance._previous_rating = (
+                previous['product_id'],
+                counted_rating(previous['rating'], previous['is_approved']),
+            )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, **kwargs):
+    new_rating = counted_rating(instance.rating, instance.is_approved)
+    previous = getattr(instance, '_previous_rating', None)
+    if previous and previous[0] != instance.product_id:
+        # The review moved to another product: take it off the old one first.
+        apply_rating_change(previous[0], old_rating=previous[1])
+        previous = None
+    apply_rating_change(instance.product_id, old_rating=previous[1] if previous else None, new_rating=new_rating)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    apply_rating_change(instance.product_id, old_rating=counted_rating(instance.rating, instance.is_approved))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_responses(sender, instance, **kwargs):
+    invalidate('catalog', f'product:{instance.pk}')
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_product_children(sender, instance, **kwargs):
+    invalidate('catalog', f'product:{instance.product_id}')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_responses(sender, instance, **kwargs):
+    # Category names are embedded in every product payload
+    invalidate('catalog', 'categories', 'catalog-detail')
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def invalidate_vendor_responses(sender, instance, **kwargs):
+    # Vendor details are embedded in each of its product payloads
+    invalidate('catalog', 'catalog-detail')
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def update_search_index(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: get_index().record([product_id]))
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, **kwargs):
+    # The category name is indexed with each product; vendor renames are
+    # picked up by the next build_search_index run.
+    product_ids = list(instance.products.values_list('pk', flat=True))
+    if product_ids:
+        transaction.on_commit(lambda: get_index().record(product_ids))
@@ -1,3 +1,812 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from ecommerce.db import upsert_options
+from ecommerce.pagination import KeysetPagination
+from ecommerce.parsers import FastJSONParser
+from ecommerce.renderers import FastJSONRenderer
+from orders.models import Order, OrderItem
+from users.models import User, Vendor
+from users.revocation import revocations
+from users.tokens import ClaimsRefreshToken
+from .cache import _single_flight
+from .catalog import filter_products
+from .models import Category, Product, ProductImage, ProductVariant, Review
+from .ratings import rebuild_ratings
+from .projections import product_payloads, product_rows
+from .serializers import ProductCreateUpdateSerializer, ProductSerializer
+from .views import catalog_queryset
+from .search import SearchIndex, build_index, get_index
+
+
+class CatalogTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='vendor@example.com', password='pass12345', name='Vendor', role='vendor')
+        cls.vendor = Vendor.objects.create(user=user, business_name='Spice World')
+        cls.spices = Category.objects.create(name='Spices', slug='spices')
+        cls.bakery = Category.objects.create(name='Bakery Items', slug='bakery')
+        cls.turmeric = cls.make_product('Turmeric', cls.spices, '150.00', is_featured=True)
+        cls.cookies = cls.make_product('Cookies', cls.bakery, '180.00')
+        cls.pepper = cls.make_product('Pepper', cls.spices, '90.00', quantity=0)
+        cls.hidden = cls.make_product('Hidden', cls.spices, '10.00', is_active=False)
+
+    @classmethod
+    def make_product(cls, name, category, price, **kwargs):
+        kwargs.setdefault('quantity', 10)
+        return Product.objects.create(
+            vendor=cls.vendor, category=category, name=name, slug=name.lower(),
+            price=Decimal(price), **kwargs
+        )
+
+
+class FilterProductsTests(CatalogTestMixin, TestCase):
+    def names(self, params):
+        return [p.name for p in filter_products(params)]
+
+    def test_excludes_inactive_products(self):
+        self.assertNotIn('Hidden', self.names({}))
+
+    def test_category_by_slug_name_or_id(self):
+        expected = {'Turmeric', 'Pepper'}
+        self.assertEqual(set(self.names({'category': 'spices'})), expected)
+        self.assertEqual(set(self.names({'category': 'SPICES'})), expected)
+        self.assertEqual(set(self.names({'category': str(self.spices.id)})), expected)
+
+    def test_price_range_and_ordering(self):
+        self.assertEqual(self.names({'min_price': '100', 'ordering': '-price'}), ['Cookies', 'Turmeric'])
+        self.assertEqual(self.names({'max_price': '160', 'ordering': 'price'}), ['Pepper', 'Turmeric'])
+
+    def test_featured_and_in_stock(self):
+        self.assertEqual(self.names({'featured': 'true'}), ['Turmeric'])
+        self.assertNotIn('Pepper', self.names({'in_stock': '1'}))
+
+    def test_malformed_values_are_ignored(self):
+        self.assertEqual(len(self.names({'min_price': 'abc', 'vendor': 'x', 'ordering': 'name'})), 3)
+        for value in ('nan', 'inf', '-inf', 'snan'):
+            self.assertEqual(len(self.names({'min_price': value, 'max_price': value})), 3)
+        self.assertEqual(self.client.get('/api/products/', {'min_price': 'nan'}).status_code, 200)
+
+
+class ProductViewTests(CatalogTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_products_are_paginated(self):
+        response = self.client.get('/api/products/', {'category': 'bakery', 'count': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(response.json()['results'][0]['name'], 'Cookies')
+
+    def test_product_detail(self):
+        response = self.client.get(f'/api/products/{self.turmeric.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['category_name'], 'Spices')
+
+        response = self.client.get(f'/api/products/{self.hidden.id}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_featured_and_categories(self):
+        response = self.client.get('/api/products/featured/')
+        self.assertEqual([p['name'] for p in response.json()], ['Turmeric'])
+
+        response = self.client.get('/api/products/categories/')
+        self.assertEqual([c['slug'] for c in response.json()], ['bakery', 'spices'])
+
+
+class ProductQueryCountTests(CatalogTestMixin, TestCase):
+    """
+    Endpoint query counts must not depend on how many products, images,
+    variants or reviews exist.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.reviewer = User.objects.create_user(email='reviewer@example.com', password='pass12345', name='Reviewer')
+
+    def grow_catalog(self, products, reviews_per_product):
+        for i in range(products):
+            product = self.make_product(f'Extra {i}', self.spices, '50.00', is_featured=True)
+            ProductImage.objects.create(product=product, image=f'product_images/{i}.jpg', is_primary=True)
+            ProductVariant.objects.create(product=product, name='Size', value=f'{i}g')
+            for rating in range(reviews_per_product):
+                Review.objects.create(product=product, user=self.reviewer, rating=rating % 5 + 1)
+
+    def assertConstantQueries(self, num, url):
+        with self.assertNumQueries(num):
+            self.client.get(url)
+        self.grow_catalog(products=8, reviews_per_product=6)
+        cache.clear()
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_products_list(self):
+        # page + images + variants + reviews
+        self.assertConstantQueries(4, '/api/products/')
+
+    def test_featured_products(self):
+        self.assertConstantQueries(4, '/api/products/featured/')
+
+    def test_product_detail(self):
+        self.assertConstantQueries(4, f'/api/products/{self.turmeric.id}/')
+
+    def test_categories(self):
+        self.assertConstantQueries(1, '/api/products/categories/')
+
+    def test_average_rating_comes_from_stored_aggregates(self):
+        for rating in (5, 4, 3):
+            Review.objects.create(product=self.turmeric, user=self.reviewer, rating=rating)
+        Review.objects.create(product=self.turmeric, user=self.reviewer, rating=1, is_approved=False)
+        response = self.client.get(f'/api/products/{self.turmeric.id}/')
+        self.assertEqual(response.json()['average_rating'], 4)
+        self.assertEqual(response.json()['rating_count'], 3)
+        self.assertEqual(len(response.json()['reviews']), 3)
+
+
+class KeysetPaginationTests(CatalogTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def walk(self, url, params, direction='next'):
+        names = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            names.extend(product['name'] for product in data['results'])
+            if not data[direction]:
+                return names, data
+            response = self.client.get(data[direction])
+
+    def test_pages_follow_the_ordering(self):
+        names, last_page = self.walk('/api/products/', {'ordering': 'price', 'page_size': 1})
+        self.assertEqual(names, ['Pepper', 'Turmeric', 'Cookies'])
+
+        previous = self.client.get(last_page['previous']).json()
+        self.assertEqual([product['name'] for product in previous['results']], ['Turmeric'])
+        self.assertEqual(self.client.get(previous['previous']).json()['previous'], None)
+
+    def test_ties_are_broken_by_id(self):
+        for i in range(3):
+            self.make_product(f'Twin {i}', self.bakery, '180.00')
+        names, _ = self.walk('/api/products/', {'ordering': '-price', 'page_size': 2})
+        self.assertEqual(names, ['Twin 2', 'Twin 1', 'Twin 0', 'Cookies', 'Turmeric', 'Pepper'])
+
+    def test_page_size_is_capped_and_count_is_opt_in(self):
+        paginator = KeysetPagination()
+        for page_size, expected in (('1000', 100), ('0', 1), ('abc', 10)):
+            request = Request(APIRequestFactory().get('/api/products/', {'page_size': page_size}))
+            self.assertEqual(paginator.get_page_size(request), expected)
+
+        for i in range(12):
+            self.make_product(f'Extra {i}', self.bakery, '5.00')
+        data = self.client.get('/api/products/').json()
+        self.assertNotIn('count', data)
+
+        data = self.client.get('/api/products/', {'count': '1'}).json()
+        self.assertEqual((data['count'], data['count_exact'], len(data['results'])), (15, True, 10))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/products/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+
+class FastJSONTests(CatalogTestMixin, TestCase):
+    def assertRendersLikeDRF(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_product_payload_matches_json_renderer(self):
+        ProductImage.objects.create(product=self.turmeric, image='product_images/t.jpg', alt_text='Haldi \u2028 pot')
+        ProductVariant.objects.create(product=self.turmeric, name='Size', value='100g')
+        products = catalog_queryset().filter(is_active=True)
+        self.assertRendersLikeDRF(ProductSerializer(products, many=True).data)
+
+    def test_python_values_match_json_renderer(self):
+        self.assertRendersLikeDRF({
+            'amount': Decimal('767.50'),
+            'date': timezone.now(),
+            'naive': datetime(2023, 6, 15, 10, 30, 0, 123456),
+            'day': date(2023, 6, 15),
+            'token': uuid.uuid4(),
+            'label': gettext_lazy('Pending'),
+            'histogram': {5: 2, 4: 0},
+            'big': 2 ** 70,
+            'name': 'Café',
+        })
+
+    def test_parser(self):
+        parsed = FastJSONParser().parse(io.BytesIO('{"name": "Café", "items": [1, 2.5]}'.encode()))
+        self.assertEqual(parsed, {'name': 'Café', 'items': [1, 2.5]})
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"name": '))
+
+    def test_api_round_trip(self):
+        response = APIClient().get(f'/api/products/{self.turmeric.id}/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['price'], '150.00')
+
+
+class ProductProjectionTests(CatalogTestMixin, TestCase):
+    """product_payloads must render exactly what ProductSerializer does."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.vendor.logo = 'vendor_logos/spice.png'
+        cls.vendor.save()
+        cls.turmeric.compare_price = Decimal('199.99')
+        cls.turmeric.description = 'Ground \u2028 fresh'
+        cls.turmeric.save()
+        cls.make_product('Loose Tea', None, '75.50', sku='TEA-1')
+        ProductImage.objects.create(product=cls.turmeric, image='product_images/t2.jpg')
+        ProductImage.objects.create(product=cls.turmeric, image='product_images/t1.jpg', alt_text='Jar', is_primary=True)
+        ProductVariant.objects.create(product=cls.turmeric, name='Size', value='100g')
+        ProductVariant.objects.create(product=cls.turmeric, name='Size', value='250g')
+        reviewer = User.objects.create_user(email='reviewer@example.com', password='pass12345', name='Reviewer')
+        Review.objects.create(product=cls.turmeric, user=reviewer, rating=5, comment='Great')
+        Review.objects.create(product=cls.turmeric, user=reviewer, rating=3)
+        Review.objects.create(product=cls.cookies, user=reviewer, rating=1, is_approved=False)
+
+    def assertSameAsSerializer(self, request=None):
+        queryset = Product.objects.order_by('-created_at', '-id')
+        context = {'request': request} if request else {}
+        expected = ProductSerializer(queryset.for_serialization(), many=True, context=context).data
+        self.assertEqual(
+            JSONRenderer().render(product_payloads(product_rows(queryset), request)), JSONRenderer().render(expected)
+        )
+
+    def test_matches_serializer(self):
+        self.assertSameAsSerializer()
+        self.assertSameAsSerializer(APIRequestFactory().get('/api/products/'))
+
+    def test_list_endpoints(self):
+        client = APIClient()
+        results = client.get('/api/products/', {'page_size': 2}).json()['results']
+        self.assertEqual([product['name'] for product in results], ['Loose Tea', 'Pepper'])
+        featured = client.get('/api/products/featured/').json()
+        self.assertEqual(featured[0]['images'][0]['image'], 'http://testserver/media/product_images/t1.jpg')
+        self.assertEqual(featured[0]['rating_histogram'], {'1': 0, '2': 0, '3': 1, '4': 0, '5': 1})
+
+
+class CategoryTreeTests(CatalogTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.food = Category.objects.create(name='Food Products', slug='food')
+        self.spices.parent = self.food
+        self.spices.save()
+        self.whole = Category.objects.create(name='Whole Spices', slug='whole-spices', parent=self.spices)
+        self.make_product('Cloves', self.whole, '60.00')
+
+    def assertPath(self, category, *ancestors):
+        category.refresh_from_db()
+        self.assertEqual(category.path, ''.join(f'{ancestor.pk}/' for ancestor in (*ancestors, category)))
+        self.assertEqual(category.depth, len(ancestors))
+
+    def test_paths_follow_saves_and_moves(self):
+        self.assertPath(self.whole, self.food, self.spices)
+
+        self.spices.parent = self.bakery
+        self.spices.save()
+        self.assertPath(self.spices, self.bakery)
+        self.assertPath(self.whole, self.bakery, self.spices)
+
+        self.spices.parent = self.whole
+        with self.assertRaises(ValueError):
+            self.spices.save()
+
+    def test_deleting_a_category_promotes_its_children(self):
+        self.spices.delete()
+        self.assertPath(self.whole)
+        self.assertPath(self.food)
+
+    def test_filters_include_subcategories(self):
+        names = {p.name for p in filter_products({'category': 'food'})}
+        self.assertEqual(names, {'Turmeric', 'Pepper', 'Cloves'})
+        self.assertEqual({p.name for p in filter_products({'category': str(self.whole.id)})}, {'Cloves'})
+
+    def test_tree_snapshot(self):
+        for depth in range(5):
+            Category.objects.create(name=f'Level {depth}', slug=f'level-{depth}', parent=Category.objects.last())
+
+        # categories + product counts, however deep the tree
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/products/categories/tree/').json()
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/categories/tree/')
+
+        roots = {node['slug']: node for node in data['categories']}
+        self.assertEqual(roots['food']['product_count'], 3)
+        spices = roots['food']['children'][0]
+        self.assertEqual((spices['slug'], spices['product_count']), ('spices', 3))
+        self.assertEqual(spices['children'][0]['product_count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_product('Star Anise', self.whole, '75.00')
+        updated = self.client.get('/api/products/categories/tree/').json()
+        self.assertNotEqual(updated['version'], data['version'])
+        self.assertEqual({node['slug']: node['product_count'] for node in updated['categories']}['food'], 4)
+
+
+class RatingAggregateTests(CatalogTestMixin, TestCase):
+    def setUp(self):
+        self.reviewer = User.objects.create_user(email='reviewer@example.com', password='pass12345', name='Reviewer')
+
+    def review(self, rating, **kwargs):
+        return Review.objects.create(product=self.turmeric, user=self.reviewer, rating=rating, **kwargs)
+
+    def assertRatings(self, count, total, histogram):
+        self.turmeric.refresh_from_db()
+        self.assertEqual(self.turmeric.rating_count, count)
+        self.assertEqual(self.turmeric.rating_sum, total)
+        self.assertEqual(self.turmeric.rating_histogram, dict(zip(range(1, 6), histogram)))
+        expected_average = Decimal(total) / count if count else 0
+        self.assertAlmostEqual(self.turmeric.rating_average, expected_average, places=2)
+
+    def test_incremental_updates(self):
+        first = self.review(5)
+        second = self.review(3)
+        self.assertRatings(2, 8, [0, 0, 1, 0, 1])
+
+        second.rating = 4
+        second.save()
+        self.assertRatings(2, 9, [0, 0, 0, 1, 1])
+
+        first.delete()
+        self.assertRatings(1, 4, [0, 0, 0, 1, 0])
+
+    def test_only_approved_reviews_count(self):
+        pending = self.review(2, is_approved=False)
+        self.assertRatings(0, 0, [0, 0, 0, 0, 0])
+
+        pending.is_approved = True
+        pending.save()
+        self.assertRatings(1, 2, [0, 1, 0, 0, 0])
+
+        pending.is_approved = False
+        pending.save()
+        self.assertRatings(0, 0, [0, 0, 0, 0, 0])
+
+    def test_rebuild_matches_incremental_state(self):
+        self.review(5)
+        self.review(4)
+        self.review(1, is_approved=False)
+        Product.objects.update(rating_count=0, rating_sum=0, rating_average=0, rating_5_count=0, rating_4_count=0)
+
+        self.assertEqual(rebuild_ratings(batch_size=2), Product.objects.count())
+        self.assertRatings(2, 9, [0, 0, 0, 1, 1])
+
+    def test_filter_and_sort_by_rating(self):
+        self.review(5)
+        Review.objects.create(product=self.cookies, user=self.reviewer, rating=3)
+        self.assertEqual([p.name for p in filter_products({'min_rating': '4'})], ['Turmeric'])
+        self.assertEqual(len(filter_products({'min_rating': 'nan'})), 3)
+        self.assertEqual([p.name for p in filter_products({'ordering': '-rating'})][:2], ['Turmeric', 'Cookies'])
+
+
+class CatalogResponseCacheTests(CatalogTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_hits_skip_the_database(self):
+        first = self.client.get('/api/products/', {'category': 'spices', 'ordering': 'price'})
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/products/', {'ordering': 'price', 'category': 'spices'})
+        self.assertEqual(first.content, second.content)
+        self.assertNotEqual(first.content, self.client.get('/api/products/').content)
+
+    def test_etag_revalidation(self):
+        etag = self.client.get('/api/products/featured/')['ETag']
+        response = self.client.get('/api/products/featured/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_product_changes_invalidate_list_and_detail(self):
+        self.client.get('/api/products/')
+        self.client.get(f'/api/products/{self.cookies.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.turmeric.name = 'Golden Turmeric'
+            self.turmeric.save()
+        names = [p['name'] for p in self.client.get('/api/products/').json()['results']]
+        self.assertIn('Golden Turmeric', names)
+        # Other products keep their cached detail
+        with self.assertNumQueries(0):
+            self.client.get(f'/api/products/{self.cookies.id}/')
+
+    def test_category_changes_invalidate_details(self):
+        self.client.get(f'/api/products/{self.cookies.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bakery.name = 'Bakery'
+            self.bakery.save()
+        self.assertEqual(self.client.get(f'/api/products/{self.cookies.id}/').json()['category_name'], 'Bakery')
+
+    def test_variant_and_vendor_changes_invalidate_details(self):
+        self.client.get(f'/api/products/{self.cookies.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductVariant.objects.create(product=self.cookies, name='Pack', value='500g')
+        data = self.client.get(f'/api/products/{self.cookies.id}/').json()
+        self.assertEqual([variant['value'] for variant in data['variants']], ['500g'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vendor.business_name = 'Spice Town'
+            self.vendor.save()
+        data = self.client.get(f'/api/products/{self.cookies.id}/').json()
+        self.assertEqual(data['vendor_details']['name'], 'Spice Town')
+        names = {product['vendor_details']['name'] for product in self.client.get('/api/products/').json()['results']}
+        self.assertEqual(names, {'Spice Town'})
+
+    def test_errors_are_not_cached(self):
+        self.client.get(f'/api/products/{self.hidden.id}/')
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/products/{self.hidden.id}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_single_flight_recompute(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'payload'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(_single_flight('catalog:test', compute)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['payload'] * 8)
+
+    @override_settings(CATALOG_CACHE_LOCK_TIMEOUT=0.3)
+    def test_waiting_on_another_process_keeps_the_stripe_free(self):
+        # Held by another process, which never finishes
+        cache.set('catalog:slow:lock', 'theirs')
+        neighbour = next(
+            f'catalog:other:{n}' for n in range(10000)
+            if zlib.crc32(f'catalog:other:{n}'.encode()) % 64 == zlib.crc32(b'catalog:slow') % 64
+        )
+        waiter = threading.Thread(target=lambda: _single_flight('catalog:slow', lambda: 'late'))
+        waiter.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        self.assertEqual(_single_flight(neighbour, lambda: 'fast'), 'fast')
+        self.assertLess(time.monotonic() - started, 0.2)
+        waiter.join()
+
+        self.assertEqual(cache.get('catalog:slow'), 'late')
+        # Not this process's lock to delete
+        self.assertEqual(cache.get('catalog:slow:lock'), 'theirs')
+
+
+@override_settings(ROOT_URLCONF='ecommerce.asgi_urls')
+class AsyncCatalogViewTests(CatalogTestMixin, TransactionTestCase):
+    """
+    The async read path must answer exactly like the DRF views. A
+    TransactionTestCase, because the list's count runs on its own connection.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.setUpTestData()
+        ProductImage.objects.create(product=self.turmeric, image='product_images/t.jpg', is_primary=True)
+        ProductVariant.objects.create(product=self.turmeric, name='Size', value='100g')
+        reviewer = User.objects.create_user(email='reviewer@example.com', password='pass12345', name='Reviewer')
+        Review.objects.create(product=self.turmeric, user=reviewer, rating=4)
+
+    def sync_get(self, url, **params):
+        with override_settings(ROOT_URLCONF='ecommerce.urls'):
+            response = Client().get(url, params)
+        cache.clear()
+        return response
+
+    async def test_responses_match_the_sync_views(self):
+        urls = [
+            ('/api/products/', {'count': 'true', 'page_size': '2'}),
+            ('/api/products/', {'category': 'spices', 'ordering': 'price'}),
+            (f'/api/products/{self.turmeric.id}/', {}),
+            (f'/api/products/{self.hidden.id}/', {}),
+            ('/api/products/featured/', {}),
+            ('/api/products/categories/', {}),
+            ('/api/orders/1/', {}),
+        ]
+        for url, params in urls:
+            expected = await sync_to_async(self.sync_get)(url, **params)
+            response = await AsyncClient().get(url, params)
+            self.assertEqual(response.status_code, expected.status_code, url)
+            self.assertEqual(response.content, expected.content, url)
+            self.assertEqual(response.get('ETag'), expected.get('ETag'), url)
+
+    async def test_order_history_matches_the_sync_views(self):
+        def place():
+            revocations.clear()
+            user = User.objects.get(email='reviewer@example.com')
+            order = Order.objects.create(user=user, order_number='ASYNC1', payment_method='cod', subtotal=150, total=150)
+            OrderItem.objects.create(order=order, product=self.turmeric, vendor=self.turmeric.vendor, quantity=1,
+                                     price=150, total=150)
+            return order, str(ClaimsRefreshToken.for_user(user).access_token)
+
+        order, access = await sync_to_async(place)()
+        for url in ('/api/orders/', f'/api/orders/{order.id}/', '/api/orders/0/'):
+            with override_settings(ROOT_URLCONF='ecommerce.urls'):
+                expected = await sync_to_async(Client().get)(url, headers={'Authorization': f'Bearer {access}'})
+            response = await AsyncClient().get(url, headers={'Authorization': f'Bearer {access}'})
+            self.assertEqual(response.status_code, expected.status_code, url)
+            self.assertEqual(response.content, expected.content, url)
+        self.assertEqual((await AsyncClient().get('/api/orders/', headers={'Authorization': 'Bearer bad'})).status_code, 401)
+
+    async def test_cursor_pages_and_errors(self):
+        client = AsyncClient()
+        first = (await client.get('/api/products/', {'page_size': '2'})).json()
+        second = (await client.get(first['next'])).json()
+        self.assertEqual([p['name'] for p in first['results'] + second['results']], ['Pepper', 'Cookies', 'Turmeric'])
+        response = await client.get('/api/products/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_other_methods_reach_the_drf_views(self):
+        client = AsyncClient()
+        self.assertEqual((await client.post('/api/orders/', {}, content_type='application/json')).status_code, 401)
+        self.assertEqual((await client.delete('/api/products/featured/')).status_code, 405)
+
+
+class ProductSearchTests(CatalogTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'products.idx')
+        override = override_settings(SEARCH_INDEX_PATH=self.path)
+        override.enable()
+        self.addCleanup(override.disable)
+        build_index()
+        self.client = APIClient()
+
+    def search(self, query, **params):
+        response = self.client.get('/api/products/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, query, **params):
+        return [product['name'] for product in self.search(query, **params)['results']]
+
+    def test_exact_prefix_and_typo_matches(self):
+        self.assertEqual(self.names('turmeric'), ['Turmeric'])
+        self.assertEqual(self.names('turm'), ['Turmeric'])
+        self.assertEqual(self.names('tumeric'), ['Turmeric'])
+        self.assertEqual(self.names('hidden'), [])
+        self.assertEqual(self.names(''), [])
+
+    def test_ranking_prefers_name_matches(self):
+        self.make_product('Shortbread', self.bakery, '50.00', description='Crumbly, like cookies')
+        build_index()
+        self.assertEqual(self.names('cookies'), ['Cookies', 'Shortbread'])
+
+    def test_facets_ignore_their_own_filter(self):
+        data = self.search('spice world', category='bakery')
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['name'], 'Cookies')
+        categories = {facet['name']: facet['count'] for facet in data['facets']['category']}
+        self.assertEqual(categories, {'Spices': 2, 'Bakery Items': 1})
+        self.assertEqual(data['facets']['vendor'], [{'id': self.vendor.id, 'name': 'Spice World', 'count': 1}])
+        self.assertEqual(data['facets']['price'], [{'range': '0-500', 'count': 1}])
+
+        data = self.search('spice world', max_price='100', page_size=1)
+        self.assertEqual([product['name'] for product in data['results']], ['Pepper'])
+
+    def test_non_finite_and_huge_price_bounds(self):
+        self.assertEqual(self.search('spice world', min_price='nan', max_price='inf')['count'], 3)
+        self.assertEqual(self.search('spice world', max_price='1e999999')['count'], 3)
+        self.assertEqual(self.search('spice world', min_price='1e999999')['count'], 0)
+
+    def test_changes_reach_every_index_through_the_journal(self):
+        get_index().refresh()
+        other_process = SearchIndex(self.path)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cookies.name = 'Shortbread'
+            self.cookies.save()
+            self.pepper.delete()
+
+        for index in (get_index(), other_process):
+            self.assertEqual(index.search('shortbread').ids, [self.cookies.id])
+            self.assertEqual(index.search('cookies').ids, [])
+            self.assertEqual(index.search('pepper').ids, [])
+
+        build_index()
+        self.assertEqual(other_process.search('shortbread').ids, [self.cookies.id])
+        self.assertEqual(other_process.documents, {})
+
+    def test_rebuilds_unmap_the_previous_segment(self):
+        index = SearchIndex(self.path)
+        index.refresh()
+        previous = index.segment
+        build_index()
+        self.assertEqual(index.search('turmeric').ids, [self.turmeric.id])
+        self.assertTrue(previous.map.closed)
+
+    def test_searches_fall_back_to_the_database_until_an_index_is_built(self):
+        path = os.path.join(os.path.dirname(self.path), 'missing', 'products.idx')
+        index = SearchIndex(path)
+        result = index.search('TURM')
+        self.assertEqual((result.count, result.ids), (1, [self.turmeric.id]))
+        self.assertEqual(index.search('e', max_price=10000).ids, [self.pepper.id])
+        self.assertEqual(index.search('pepp', vendor=self.vendor.id).ids, [self.pepper.id])
+        self.assertFalse(os.path.exists(path))
+
+
+class BulkImportExportTests(CatalogTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendor.user)
+
+    def upload(self, name, content, **data):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post('/api/products/vendor/import/', {'file': upload, **data}, format='multipart')
+
+    def test_csv_import_creates_then_updates_by_sku(self):
+        csv_file = (
+            'sku,name,category,price,quantity,variants,images\n'
+            'CHL-1,Chilli Powder,spices,120.00,5,Size=250g;Size=500g,product_images/chilli.jpg\n'
+            'BRD-1,Rye Bread,Bakery Items,60.00,3,,\n'
+            'BAD-1,Broken,spices,not-a-price,1,,\n'
+            'BAD-2,Lost,unknown,10.00,1,,\n'
+        )
+        response = self.upload('products.csv', csv_file)
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual((report['created'], report['updated'], report['failed']), (2, 0, 2))
+        self.assertEqual([(error['row'], error['sku']) for error in report['errors']], [(4, 'BAD-1'), (5, 'BAD-2')])
+        self.assertIn('price', report['errors'][0]['errors'])
+        self.assertIn('category', report['errors'][1]['errors'])
+
+        chilli = Product.objects.get(vendor=self.vendor, sku='CHL-1')
+        self.assertEqual(chilli.category, self.spices)
+        self.assertEqual(sorted(chilli.variants.values_list('value', flat=True)), ['250g', '500g'])
+        self.assertEqual(chilli.images.get().is_primary, True)
+        kept = chilli.variants.get(value='250g').pk
+
+        response = self.upload('products.csv', 'sku,name,price,variants\nCHL-1,Chilli Powder,99.00,Size=250g\n')
+        self.assertEqual(response.json()['updated'], 1)
+        chilli.refresh_from_db()
+        self.assertEqual(chilli.price, Decimal('99.00'))
+        self.assertEqual(list(chilli.variants.values_list('pk', flat=True)), [kept])
+        self.assertEqual(chilli.images.count(), 1)
+
+    def test_import_without_conflict_targets(self):
+        # MySQL: ON DUPLICATE KEY UPDATE cannot be given the unique fields
+        features = connection.features
+        with mock.patch.object(features, 'supports_update_conflicts_with_target', False):
+            self.assertNotIn('unique_fields', upsert_options(Product, ['vendor', 'sku'], ['name']))
+            response = self.upload('products.csv', 'sku,name,category,price\nCHL-1,Chilli Powder,spices,120.00\n')
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(
+            upsert_options(Product, ['vendor', 'sku'], ['name'])['unique_fields'], ['vendor', 'sku']
+        )
+
+    def test_blank_skus_are_stored_as_null(self):
+        serializer = ProductCreateUpdateSerializer(
+            data={'name': 'Chilli', 'price': '10.00', 'sku': ''}, context={'request': SimpleNamespace(user=self.vendor.user)}
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertIsNone(serializer.save().sku)
+        self.assertIsNone(self.make_product('Clove', self.spices, '20.00', sku='').sku)
+        self.assertEqual(Product.objects.filter(vendor=self.vendor, sku=None).count(), 6)
+
+    def test_jsonl_import_reports_malformed_lines(self):
+        lines = [
+            '{"sku": "TEA-1", "name": "Green Tea", "price": "45.50", "images": '
+            '[{"image": "product_images/tea.jpg", "alt_text": "Tea", "is_primary": true}]}',
+            '{"sku": "TEA-2", "name": ',
+            '["not", "an", "object"]',
+        ]
+        response = self.upload('upload.txt', '\n'.join(lines), file_format='jsonl')
+        report = response.json()
+        self.assertEqual((report['created'], report['failed']), (1, 2))
+        self.assertEqual([error['row'] for error in report['errors']], [2, 3])
+        tea = Product.objects.get(sku='TEA-1')
+        self.assertEqual(tea.images.get().alt_text, 'Tea')
+        self.assertEqual(tea.category, None)
+
+    def test_export_round_trips_through_import(self):
+        for product in Product.objects.filter(vendor=self.vendor):
+            Product.objects.filter(pk=product.pk).update(sku=f'FIX-{product.pk}')
+        self.upload('products.csv', 'sku,name,category,price,variants\nCHL-1,Chilli,spices,120.00,Size=250g;Heat=Hot\n')
+        for file_format in ('csv', 'jsonl'):
+            response = self.client.get('/api/products/vendor/export/', {'file_format': file_format})
+            self.assertEqual(response.status_code, 200)
+            content = b''.join(response.streaming_content).decode()
+            self.assertIn('CHL-1', content)
+
+            report = self.upload(f'products.{file_format}', content).json()
+            self.assertEqual(report['failed'], 0)
+            self.assertEqual((report['created'], report['updated']), (0, 5))
+        self.assertEqual(Product.objects.get(sku='CHL-1').variants.count(), 2)
+
+    def test_requires_a_vendor_and_a_known_format(self):
+        self.assertEqual(self.upload('products.xlsx', 'x').status_code, 400)
+        self.client.force_authenticate(User.objects.create_user(email='c@example.com', password='pass12345', name='C'))
+        self.assertEqual(self.upload('products.csv', 'sku,name,price\n').status_code, 403)
+        self.assertEqual(self.client.get('/api/products/vendor/export/').status_code, 403)
+
+
+class ProductNestedUpdateTests(CatalogTestMixin, TestCase):
+    def setUp(self):
+        self.product = self.cookies
+        self.front = ProductImage.objects.create(product=self.product, image='product_images/front.jpg', is_primary=True)
+        self.back = ProductImage.objects.create(product=self.product, image='product_images/back.jpg', alt_text='Back')
+        self.small = ProductVariant.objects.create(product=self.product, name='Size', value='250g')
+        self.large = ProductVariant.objects.create(product=self.product, name='Size', value='500g')
+
+    def serializer(self, **data):
+        payload = {'name': 'Cookies', 'price': '180.00', 'category': self.bakery.id, **data}
+        serializer = ProductCreateUpdateSerializer(self.product, data=payload)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer
+
+    def update(self, **data):
+        return self.serializer(**data).save()
+
+    def test_unchanged_product_is_not_written(self):
+        serializer = self.serializer(
+            images=[{'id': self.front.id, 'is_primary': True}, {'id': self.back.id, 'alt_text': 'Back'}],
+            variants=[{'id': self.small.id, 'name': 'Size', 'value': '250g'}, {'name': 'Size', 'value': '500g'}],
+        )
+        # the savepoint pair and one SELECT each for images and variants
+        with self.assertNumQueries(4):
+            serializer.save()
+
+    def test_changes_keep_the_ids_of_matched_rows(self):
+        self.update(
+            price='175.00',
+            images=[{'id': self.back.id, 'alt_text': 'Reverse', 'is_primary': True}],
+            variants=[
+                {'id': self.small.id, 'name': 'Size', 'value': '200g'},
+                {'name': 'Size', 'value': '500g'},
+                {'name': 'Pack', 'value': '2'},
+            ],
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, Decimal('175.00'))
+        self.assertEqual(
+            list(self.product.images.values_list('id', 'alt_text', 'is_primary')), [(self.back.id, 'Reverse', True)]
+        )
+        variants = dict(self.product.variants.values_list('value', 'id'))
+        self.assertEqual(variants['200g'], self.small.id)
+        self.assertEqual(variants['500g'], self.large.id)
+        self.assertEqual(set(variants), {'200g', '500g', '2'})
+
+    def test_omitted_children_are_left_alone_and_foreign_ids_ignored(self):
+        other = ProductVariant.objects.create(product=self.turmeric, name='Size', value='1kg')
+        self.update(variants=[{'id': other.id, 'name': 'Size', 'value': '1kg'}])
+        self.assertEqual(self.product.images.count(), 2)
+        self.assertEqual(list(self.product.variants.values_list('value', flat=True)), ['1kg'])
+        self.assertTrue(ProductVariant.objects.filter(pk=other.pk, product=self.turmeric).exists())
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.db.models import Count, F, Value
+from django.db.models.functions import Concat, Substr
+
+from .cache import generations, get_cache
+from .models import Category, Product
+
+SEPARATOR = '/'
+
+
+def path_for(parent_path, category_id):
+    return f'{parent_path}{category_id}{SEPARATOR}'
+
+
+def depth_of(path):
+    return path.count(SEPARATOR) - 1
+
+
+def ancestor_ids(path):
+    return [int(part) for part in path.split(SEPARATOR)[:-1]]
+
+
+def move_subtree(old_path, new_path):
+    """Rewrite the path and depth of every category under ``old_path`` in one UPDATE."""
+    Category.objects.filter(path__startswith=old_path).exclude(path=old_path).update(
+        path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+        depth=F('depth') + (depth_of(new_path) - depth_of(old_path)),
+    )
+
+
+def build_tree():
+    """
+    Active categories nested under their parents, each with the number of
+    active products in its whole subtree. Two queries however deep the tree
+    is; a category under an inactive parent is left out with its subtree.
+    """
+    rows = Category.objects.filter(is_active=True).order_by('depth', 'name').values(
+        'id', 'name', 'slug', 'parent_id', 'path'
+    )
+    direct_counts = dict(
+        Product.objects.filter(is_active=True, category__isnull=False).order_by().values_list('category_id').annotate(
+            Count('id')
+        )
+    )
+
+    nodes = {}
+    roots = []
+    for row in rows:
+        parent_id = row.pop('parent_id')
+        path = row.pop('path')
+        if parent_id is not None and parent_id not in nodes:
+            continue
+        node = dict(row, product_count=0, children=[])
+        nodes[row['id']] = node
+        (nodes[parent_id]['children'] if parent_id is not None else roots).append(node)
+        count = direct_counts.get(row['id'], 0)
+        for ancestor_id in ancestor_ids(path):
+            nodes[ancestor_id]['product_count'] += count
+    return roots
+
+
+def category_tree():
+    """
+    The category tree as a snapshot shared through the catalog cache. The
+    version changes whenever a category or product changes, so a stale tree
+    is never served and clients can compare versions.
+    """
+    version = '.'.join(str(generation) for generation in generations(['categories', 'catalog']))
+    key = f'catalog:tree:{version}'
+    cache = get_cache()
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = {'version': version, 'categories': build_tree()}
+        cache.set(key, snapshot, settings.CATALOG_CACHE_TIMEOUT)
+    return snapshot
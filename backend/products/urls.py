@@ -1,10 +1,17 @@
 from django.urls import path
-from .views import featured_products, categories, products, product_detail
+from .views import (
+    featured_products, categories, categories_tree, products, product_detail, search_products,
+    import_vendor_products, export_vendor_products,
+)
 
 urlpatterns = [
     path('', products, name='products'),
     path('<int:product_id>/', product_detail, name='product_detail'),
     path('featured/', featured_products, name='featured_products'),
     path('categories/', categories, name='categories'),
+    path('categories/tree/', categories_tree, name='categories_tree'),
+    path('search/', search_products, name='search_products'),
+    path('vendor/import/', import_vendor_products, name='import_vendor_products'),
+    path('vendor/export/', export_vendor_products, name='export_vendor_products'),
 ]
 
@@ -1,197 +1,179 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
-
-# Mock data for development
-mock_categories = [
-    {"id": 1, "name": "Food Products", "slug": "food", "description": "Fresh and packaged food items", "image": "/placeholder.svg?height=200&width=200"},
-    {"id": 2, "name": "Bakery Items", "slug": "bakery", "description": "Fresh baked goods", "image": "/placeholder.svg?height=200&width=200"},
-    {"id": 3, "name": "Spices", "slug": "spices", "description": "Organic spices and seasonings", "image": "/placeholder.svg?height=200&width=200"},
-    {"id": 4, "name": "Herbal Products", "slug": "herbal", "description": "Natural herbal remedies", "image": "/placeholder.svg?height=200&width=200"},
-    {"id": 5, "name": "Cleaning Solutions", "slug": "cleaning", "description": "Eco-friendly cleaning products", "image": "/placeholder.svg?height=200&width=200"},
-]
-
-mock_products = [
-    {
-        "id": 1,
-        "name": "Organic Turmeric Powder",
-        "slug": "organic-turmeric-powder",
-        "description": "100% organic turmeric powder, freshly ground and packed.",
-        "price": 150,
-        "compare_price": 180,
-        "quantity": 100,
-        "is_featured": True,
-        "is_active": True,
-        "category": 3,
-        "category_name": "Spices",
-        "vendor": 1,
-        "vendor_details": {
-            "id": 1,
-            "name": "Spice World",
-            "logo": "/placeholder.svg?height=100&width=100"
-        },
-        "images": [
-            {"id": 1, "image": "/placeholder.svg?height=400&width=400", "alt_text": "Turmeric Powder", "is_primary": True}
-        ],
-        "reviews": [],
-        "average_rating": 4.5,
-        "discount_percentage": 17
-    },
-    {
-        "id": 2,
-        "name": "Whole Wheat Flour",
-        "slug": "whole-wheat-flour",
-        "description": "Stone-ground whole wheat flour, perfect for making chapatis and breads.",
-        "price": 120,
-        "compare_price": 140,
-        "quantity": 50,
-        "is_featured": True,
-        "is_active": True,
-        "category": 1,
-        "category_name": "Food Products",
-        "vendor": 2,
-        "vendor_details": {
-            "id": 2,
-            "name": "Organic Farms",
-            "logo": "/placeholder.svg?height=100&width=100"
-        },
-        "images": [
-            {"id": 2, "image": "/placeholder.svg?height=400&width=400", "alt_text": "Whole Wheat Flour", "is_primary": True}
-        ],
-        "reviews": [],
-        "average_rating": 4.2,
-        "discount_percentage": 14
-    },
-    {
-        "id": 3,
-        "name": "Herbal Tea",
-        "slug": "herbal-tea",
-        "description": "A blend of medicinal herbs that helps boost immunity and improve digestion.",
-        "price": 200,
-        "compare_price": 250,
-        "quantity": 30,
-        "is_featured": True,
-        "is_active": True,
-        "category": 4,
-        "category_name": "Herbal Products",
-        "vendor": 3,
-        "vendor_details": {
-            "id": 3,
-            "name": "Herbal Life",
-            "logo": "/placeholder.svg?height=100&width=100"
-        },
-        "images": [
-            {"id": 3, "image": "/placeholder.svg?height=400&width=400", "alt_text": "Herbal Tea", "is_primary": True}
-        ],
-        "reviews": [],
-        "average_rating": 4.8,
-        "discount_percentage": 20
-    },
-    {
-        "id": 4,
-        "name": "Fresh Cookies",
-        "slug": "fresh-cookies",
-        "description": "Freshly baked cookies made with whole wheat flour and jaggery.",
-        "price": 180,
-        "compare_price": 200,
-        "quantity": 20,
-        "is_featured": True,
-        "is_active": True,
-        "category": 2,
-        "category_name": "Bakery Items",
-        "vendor": 4,
-        "vendor_details": {
-            "id": 4,
-            "name": "Happy Bakery",
-            "logo": "/placeholder.svg?height=100&width=100"
-        },
-        "images": [
-            {"id": 4, "image": "/placeholder.svg?height=400&width=400", "alt_text": "Fresh Cookies", "is_primary": True}
-        ],
-        "reviews": [],
-        "average_rating": 4.6,
-        "discount_percentage": 10
-    },
-    {
-        "id": 5,
-        "name": "Natural Floor Cleaner",
-        "slug": "natural-floor-cleaner",
-        "description": "Eco-friendly floor cleaner made with natural ingredients.",
-        "price": 250,
-        "compare_price": 300,
-        "quantity": 40,
-        "is_featured": False,
-        "is_active": True,
-        "category": 5,
-        "category_name": "Cleaning Solutions",
-        "vendor": 5,
-        "vendor_details": {
-            "id": 5,
-            "name": "Eco Clean",
-            "logo": "/placeholder.svg?height=100&width=100"
-        },
-        "images": [
-            {"id": 5, "image": "/placeholder.svg?height=400&width=400", "alt_text": "Natural Floor Cleaner", "is_primary": True}
-        ],
-        "reviews": [],
-        "average_rating": 4.3,
-        "discount_percentage": 17
-    },
-    {
-        "id": 6,
-        "name": "Organic Honey",
-        "slug": "organic-honey",
-        "description": "Pure organic honey collected from forest beehives.",
-        "price": 350,
-        "compare_price": 400,
-        "quantity": 25,
-        "is_featured": False,
-        "is_active": True,
-        "category": 1,
-        "category_name": "Food Products",
-        "vendor": 2,
-        "vendor_details": {
-            "id": 2,
-            "name": "Organic Farms",
-            "logo": "/placeholder.svg?height=100&width=100"
-        },
-        "images": [
-            {"id": 6, "image": "/placeholder.svg?height=400&width=400", "alt_text": "Organic Honey", "is_primary": True}
-        ],
-        "reviews": [],
-        "average_rating": 4.9,
-        "discount_percentage": 13
-    }
-]
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+
+from ecommerce.pagination import KeysetPagination
+from users.models import Vendor
+from .bulk import FORMATS, export_csv, export_jsonl, export_rows, import_products, text_stream
+from .cache import cached_response
+from .catalog import _parse_decimal, _parse_int, category_ids, filter_products
+from .models import Category, Product
+from .projections import product_payloads, product_rows
+from .search import bucket_label, get_index
+from .serializers import CategorySerializer, ProductSerializer
+from .tree import category_tree
+
+FEATURED_LIMIT = 12
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+FACET_LIMIT = 10
+MAX_PRICE = 10 ** Product._meta.get_field('price').max_digits
+
+
+def catalog_queryset():
+    return Product.objects.for_serialization()
+
 
+@cached_response('catalog')
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def featured_products(request):
-    featured = [p for p in mock_products if p.get('is_featured', False)]
-    return JsonResponse(featured, safe=False)
+    featured = product_rows(filter_products({'featured': 'true'}))[:FEATURED_LIMIT]
+    return Response(product_payloads(featured, request))
 
+
+@cached_response('categories')
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def categories(request):
-    return JsonResponse(mock_categories, safe=False)
+    queryset = Category.objects.filter(is_active=True)
+    serializer = CategorySerializer(queryset, many=True, context={'request': request})
+    return Response(serializer.data)
+
+
+@cached_response('categories', 'catalog')
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def categories_tree(request):
+    """Nested active categories with product counts per subtree, from the cached snapshot."""
+    return Response(category_tree())
 
+
+@cached_response('catalog')
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def products(request):
-    # Filter by category if provided
-    category = request.GET.get('category')
-    if category:
-        filtered_products = [p for p in mock_products if p.get('category_name', '').lower() == category.lower()]
-    else:
-        filtered_products = mock_products
-    
-    return JsonResponse(filtered_products, safe=False)
+    queryset = product_rows(filter_products(request.GET))
+
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    return paginator.get_paginated_response(product_payloads(page, request))
+
 
+@cached_response('catalog-detail', 'product:{product_id}')
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def product_detail(request, product_id):
-    product = next((p for p in mock_products if p['id'] == product_id), None)
+    product = catalog_queryset().filter(is_active=True, id=product_id).first()
     if product:
-        return JsonResponse(product)
+        serializer = ProductSerializer(product, context={'request': request})
+        return Response(serializer.data)
     return JsonResponse({"error": "Product not found"}, status=404)
 
+
+def _paise(value):
+    amount = _parse_decimal(value)
+    if amount is None:
+        return None
+    # Bounds beyond any storable price are clamped so scaling cannot overflow
+    return int(min(max(amount, -MAX_PRICE), MAX_PRICE) * 100)
+
+
+def _facet(counts, names):
+    return [
+        {'id': key, 'name': names.get(key, ''), 'count': count}
+        for key, count in counts.most_common(FACET_LIMIT)
+    ]
+
+
+@cached_response('catalog')
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_products(request):
+    """
+    Full-text product search: ``q`` plus optional ``category``, ``vendor``,
+    ``min_price`` and ``max_price`` filters, paged with ``page`` and
+    ``page_size``. Results are ranked; facets count matches per category,
+    vendor and price range.
+    """
+    params = request.GET
+    page = max(_parse_int(params.get('page')) or 1, 1)
+    page_size = min(max(_parse_int(params.get('page_size')) or SEARCH_PAGE_SIZE, 1), MAX_SEARCH_PAGE_SIZE)
+    category = params.get('category')
+
+    result = get_index().search(
+        params.get('q', ''),
+        categories=set(Category.objects.filter(id__in=category_ids(category)).values_list('id', flat=True)) if category else None,
+        vendor=_parse_int(params.get('vendor')),
+        min_price=_paise(params.get('min_price')),
+        max_price=_paise(params.get('max_price')),
+        offset=(page - 1) * page_size,
+        limit=page_size,
+    )
+
+    found = {row.id: row for row in product_rows(Product.objects.filter(is_active=True, id__in=result.ids))}
+    results = product_payloads([found[product_id] for product_id in result.ids if product_id in found], request)
+
+    facets = result.facets
+    category_names = dict(Category.objects.filter(id__in=list(facets['category'])).values_list('id', 'name'))
+    vendor_names = dict(Vendor.objects.filter(id__in=list(facets['vendor'])).values_list('id', 'business_name'))
+    return Response({
+        'count': result.count,
+        'results': results,
+        'facets': {
+            'category': _facet(facets['category'], category_names),
+            'vendor': _facet(facets['vendor'], vendor_names),
+            'price': [
+                {'range': bucket_label(lower), 'count': count}
+                for lower, count in sorted(facets['price'].items())
+            ],
+        },
+    })
+
+
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_vendor_products(request):
+    """
+    Upsert the vendor's products from an uploaded CSV or JSONL ``file``
+    (see products.bulk for the columns). ``file_format`` overrides the
+    format implied by the file name. Responds with per-row errors.
+    """
+    vendor = Vendor.objects.filter(user=request.user).first()
+    if vendor is None:
+        return JsonResponse({"error": "Vendor profile not found"}, status=403)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({"error": "No file uploaded"}, status=400)
+    file_format = request.data.get('file_format') or upload.name.rpartition('.')[2].lower()
+    if file_format not in FORMATS:
+        return JsonResponse({"error": "Unsupported file format"}, status=400)
+
+    report = import_products(vendor, text_stream(upload), file_format)
+    return Response(report.as_dict())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_vendor_products(request):
+    """Stream the vendor's products as CSV (default) or JSONL (``?file_format=jsonl``)."""
+    vendor = Vendor.objects.filter(user=request.user).first()
+    if vendor is None:
+        return JsonResponse({"error": "Vendor profile not found"}, status=403)
+
+    file_format = request.GET.get('file_format', 'csv')
+    if file_format not in FORMATS:
+        return JsonResponse({"error": "Unsupported file format"}, status=400)
+
+    rows = export_rows(vendor)
+    response = StreamingHttpResponse(
+        export_csv(rows) if file_format == 'csv' else export_jsonl(rows),
+        content_type=EXPORT_CONTENT_TYPES[file_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+    return response
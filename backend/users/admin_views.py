@@ -1,40 +1,49 @@
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.db.models import Sum, Count
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
 from .models import User, Vendor, Customer
+from .projections import vendor_payloads, vendor_rows
 from .serializers import UserSerializer, VendorSerializer, CustomerSerializer
 from products.models import Product
-from orders.models import Order, OrderItem
+from orders.models import DailySales, DailyVendorProductSales, Order
 
 class IsAdminUser(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated and request.user.role == 'admin'
 
+DASHBOARD_CACHE_KEY = 'admin_dashboard'
+DASHBOARD_CACHE_TIMEOUT = 60
+# Top products are the best sellers of this many days, today included
+DASHBOARD_TOP_PRODUCTS_DAYS = 30
+
 class AdminDashboardView(APIView):
     permission_classes = [IsAdminUser]
     
     def get(self, request):
-        # Get total sales
-        total_sales = Order.objects.filter(payment_status='paid').aggregate(Sum('total'))['total__sum'] or 0
-        
-        # Get total orders
-        total_orders = Order.objects.count()
-        
-        # Get total products
-        total_products = Product.objects.count()
-        
-        # Get total customers
-        total_customers = Customer.objects.count()
-        
-        # Get total vendors
-        total_vendors = Vendor.objects.count()
+        payload = cache.get(DASHBOARD_CACHE_KEY)
+        if payload is None:
+            payload = self.build_payload()
+            cache.set(DASHBOARD_CACHE_KEY, payload, DASHBOARD_CACHE_TIMEOUT)
+        return Response(payload)
+    
+    def build_payload(self):
+        # Every query reads the daily rollups (orders.rollups) or an index
+        # range, so none of them grows with the order history
+        order_stats = DailySales.objects.aggregate(
+            total_orders=Sum('placed_orders'),
+            total_sales=Sum('revenue'),
+        )
         
         # Get recent orders
-        recent_orders = Order.objects.order_by('-created_at')[:5]
-        recent_orders_data = []
-        for order in recent_orders:
-            recent_orders_data.append({
+        recent_orders = Order.objects.select_related('user').order_by('-created_at')[:5]
+        recent_orders_data = [
+            {
                 'id': order.id,
                 'order_number': order.order_number,
                 'date': order.created_at,
@@ -45,43 +54,44 @@ class AdminDashboardView(APIView):
                     'name': order.user.name,
                     'email': order.user.email
                 }
-            })
+            } for order in recent_orders
+        ]
         
-        # Get top selling products
-        top_products = Product.objects.annotate(
-            units_sold=Sum('orderitem__quantity')
-        ).order_by('-units_sold')[:5]
+        # Get top selling products: paid units and revenue of the recent days
+        since = timezone.localdate() - timedelta(days=DASHBOARD_TOP_PRODUCTS_DAYS - 1)
+        top_products = list(
+            DailyVendorProductSales.objects.filter(date__gte=since).values('product').annotate(
+                units_sold=Sum('units'),
+                revenue=Sum('revenue'),
+            ).filter(units_sold__gt=0).order_by('-units_sold')[:5]
+        )
+        products = Product.objects.select_related('category', 'vendor').in_bulk(
+            [row['product'] for row in top_products]
+        )
         
         top_products_data = []
-        for product in top_products:
-            if product.units_sold:
-                revenue = OrderItem.objects.filter(
-                    product=product, 
-                    order__payment_status='paid'
-                ).aggregate(Sum('total'))['total__sum'] or 0
-                
-                top_products_data.append({
-                    'id': product.id,
-                    'name': product.name,
-                    'category': product.category.name if product.category else 'Uncategorized',
-                    'price': product.price,
-                    'unitsSold': product.units_sold,
-                    'revenue': revenue,
-                    'vendor': {
-                        'id': product.vendor.id,
-                        'name': product.vendor.business_name
-                    }
-                })
+        for row in top_products:
+            product = products[row['product']]
+            top_products_data.append({
+                'id': product.id,
+                'name': product.name,
+                'category': product.category.name if product.category else 'Uncategorized',
+                'price': product.price,
+                'unitsSold': row['units_sold'],
+                'revenue': row['revenue'] or 0,
+                'vendor': {
+                    'id': product.vendor.id,
+                    'name': product.vendor.business_name
+                }
+            })
         
-        # Get sales by month
-        from django.db.models.functions import TruncMonth
-        sales_by_month = Order.objects.filter(
-            payment_status='paid'
-        ).annotate(
-            month=TruncMonth('created_at')
+        # Get sales by month from the daily rollup
+        sales_by_month = DailySales.objects.annotate(
+            month=TruncMonth('date')
         ).values('month').annotate(
-            total=Sum('total')
-        ).order_by('month')
+            total=Sum('revenue'),
+            paid_orders=Sum('orders'),
+        ).filter(paid_orders__gt=0).order_by('month')
         
         sales_by_month_data = [
             {
@@ -90,26 +100,31 @@ class AdminDashboardView(APIView):
             } for item in sales_by_month
         ]
         
-        return Response({
-            'totalSales': total_sales,
-            'totalOrders': total_orders,
-            'totalProducts': total_products,
-            'totalCustomers': total_customers,
-            'totalVendors': total_vendors,
+        return {
+            'totalSales': order_stats['total_sales'] or 0,
+            'totalOrders': order_stats['total_orders'] or 0,
+            'totalProducts': Product.objects.count(),
+            'totalCustomers': Customer.objects.count(),
+            'totalVendors': Vendor.objects.count(),
             'recentOrders': recent_orders_data,
             'topProducts': top_products_data,
             'salesByMonth': sales_by_month_data
-        })
+        }
 
 class AdminCustomerListView(generics.ListAPIView):
     permission_classes = [IsAdminUser]
     serializer_class = CustomerSerializer
-    queryset = Customer.objects.all()
+    queryset = Customer.objects.select_related('user')
 
 class AdminVendorListView(generics.ListAPIView):
     permission_classes = [IsAdminUser]
     serializer_class = VendorSerializer
-    queryset = Vendor.objects.all()
+    queryset = Vendor.objects.select_related('user')
+    
+    def list(self, request, *args, **kwargs):
+        # Same payload as serializer_class, built from rows; see users.projections
+        page = self.paginate_queryset(vendor_rows(self.filter_queryset(self.get_queryset())))
+        return self.get_paginated_response(vendor_payloads(page, request))
 
 class AdminVendorDetailView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAdminUser]
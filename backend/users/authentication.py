@@ -0,0 +1,32 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+from .revocation import is_revoked
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication without a user query: request.user is built from the
+    token's claims (see users.tokens) with ``id``, ``role``, ``vendor_id``
+    and ``customer_id`` set, and any other field loads the rest of the row
+    the first time it is read. Revoked tokens are refused; deactivating or
+    deleting a user revokes their tokens (see users.revocation), which
+    replaces the per-request ``is_active`` check. Tokens issued without the
+    claims load the user as before.
+    """
+
+    def get_user(self, validated_token):
+        if is_revoked(validated_token):
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        if 'role' not in validated_token or api_settings.USER_ID_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        user = User.from_db(
+            None, [api_settings.USER_ID_FIELD, 'role'],
+            [validated_token[api_settings.USER_ID_CLAIM], validated_token['role']],
+        )
+        user.vendor_id = validated_token.get('vendor_id')
+        user.customer_id = validated_token.get('customer_id')
+        return user
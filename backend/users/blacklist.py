@@ -0,0 +1,117 @@
+"""
+Blacklisted refresh tokens. Each is one BlacklistedToken row, its JTI and
+the day it expires, and rows for days that are over are dropped by the
+purge_token_blacklist command, so the table only ever holds tokens that
+could still be presented.
+
+Each process also keeps one Bloom filter per expiry day, filled from the
+rows created since its last look (at most every
+JWT_REVOCATION_SYNC_INTERVAL seconds). A token is looked up in the
+database only when its day's filter may contain it, so a refresh with a
+valid token costs no lookup however many tokens have been issued. Rotation
+does not depend on the filters being current: blacklisting the presented
+token is an insert on its JTI, and a token already used loses that insert.
+"""
+import hashlib
+import math
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import BlacklistedToken
+from .revocation import SYNC_OVERLAP
+
+BUCKET_SECONDS = 24 * 60 * 60
+
+
+def bucket(token):
+    return token['exp'] // BUCKET_SECONDS
+
+
+def current_bucket():
+    return int(time.time()) // BUCKET_SECONDS
+
+
+class BloomFilter:
+    """A set of strings that can answer "maybe" for a string never added, at about ``error_rate`` of lookups."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+
+class Blacklist:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.filters = {}
+        self.lock = threading.Lock()
+        self.synced_at = None
+        self.sync_from = None
+
+    def clear(self):
+        with self.lock:
+            self.filters.clear()
+            self.synced_at = self.sync_from = None
+
+    def remember(self, jti, day):
+        if day not in self.filters:
+            self.filters[day] = BloomFilter(self.capacity)
+        self.filters[day].add(jti)
+
+    def sync(self):
+        now = timezone.now()
+        today = current_bucket()
+        rows = BlacklistedToken.objects.filter(bucket__gte=today)
+        if self.sync_from is not None:
+            rows = rows.filter(created_at__gte=self.sync_from)
+        for jti, day in rows.values_list('jti', 'bucket').iterator():
+            self.remember(jti.hex, day)
+        for day in [day for day in self.filters if day < today]:
+            del self.filters[day]
+        self.sync_from = now - SYNC_OVERLAP
+        self.synced_at = time.monotonic()
+
+    def may_contain(self, token):
+        with self.lock:
+            if self.synced_at is None or time.monotonic() - self.synced_at >= settings.JWT_REVOCATION_SYNC_INTERVAL:
+                self.sync()
+            bloom = self.filters.get(bucket(token))
+            return bloom is not None and token[api_settings.JTI_CLAIM] in bloom
+
+    def contains(self, token):
+        jti = token[api_settings.JTI_CLAIM]
+        return self.may_contain(token) and BlacklistedToken.objects.filter(jti=uuid.UUID(jti)).exists()
+
+    def add(self, token):
+        """Blacklist ``token``; False when it already was."""
+        jti = token[api_settings.JTI_CLAIM]
+        try:
+            with transaction.atomic():
+                BlacklistedToken.objects.create(jti=uuid.UUID(jti), bucket=bucket(token))
+        except IntegrityError:
+            return False
+        with self.lock:
+            self.remember(jti, bucket(token))
+        return True
+
+
+blacklist = Blacklist(settings.JWT_BLACKLIST_BLOOM_CAPACITY)
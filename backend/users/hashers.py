@@ -0,0 +1,115 @@
+"""
+Password hashers whose cost comes from settings.PASSWORD_HASHING, and which
+can compute their hashes in a pool of worker processes.
+
+Django rehashes a password when its user logs in and the stored hash was
+made by another hasher than the first of PASSWORD_HASHERS, or with other
+costs than the configured ones (``must_update``), so raising or lowering a
+cost here upgrades every active account as it signs in.
+"""
+import base64
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.hashers import get_hasher
+
+_pool = None
+_pool_lock = threading.Lock()
+# Set in the pool's processes, which hash in their own thread
+_in_worker = False
+
+
+def _start_worker():
+    global _in_worker
+    _in_worker = True
+    django.setup()
+
+
+def _call(algorithm, method, args):
+    return getattr(get_hasher(algorithm), method)(*args)
+
+
+def get_pool():
+    """The hashing pool, or None when PASSWORD_HASHING['processes'] is 0 (hash in the calling thread)."""
+    global _pool
+    processes = settings.PASSWORD_HASHING['processes']
+    if _in_worker or not processes:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the server process has threads and open connections
+            os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
+            _pool = ProcessPoolExecutor(
+                processes, mp_context=multiprocessing.get_context('spawn'), initializer=_start_worker,
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+class PooledHasherMixin:
+    """
+    Runs ``encode`` and ``verify``, the CPU-bound parts, in the hashing
+    pool. The request thread waits without holding a core, and a burst of
+    logins cannot take more cores than the pool has.
+    """
+
+    def encode(self, *args):
+        pool = get_pool()
+        if pool is None:
+            return super().encode(*args)
+        return pool.submit(_call, self.algorithm, 'encode', args).result()
+
+    def verify(self, *args):
+        pool = get_pool()
+        if pool is None:
+            return super().verify(*args)
+        return pool.submit(_call, self.algorithm, 'verify', args).result()
+
+
+def cost(algorithm, name):
+    return property(lambda self: settings.PASSWORD_HASHING[algorithm][name])
+
+
+class Argon2PasswordHasher(PooledHasherMixin, hashers.Argon2PasswordHasher):
+    time_cost = cost('argon2', 'time_cost')
+    memory_cost = cost('argon2', 'memory_cost')
+    parallelism = cost('argon2', 'parallelism')
+
+
+class SizedScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """Django's scrypt hasher, allowed the memory each hash needs rather than OpenSSL's 32 MB default."""
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        self._check_encode_args(password, salt)
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        # About 128 * n * r * p bytes, plus headroom
+        hash_ = hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+
+class ScryptPasswordHasher(PooledHasherMixin, SizedScryptPasswordHasher):
+    work_factor = cost('scrypt', 'work_factor')
+    block_size = cost('scrypt', 'block_size')
+    parallelism = cost('scrypt', 'parallelism')
+
+
+class PBKDF2PasswordHasher(PooledHasherMixin, hashers.PBKDF2PasswordHasher):
+    iterations = cost('pbkdf2', 'iterations')
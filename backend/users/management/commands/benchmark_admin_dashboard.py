@@ -0,0 +1,103 @@
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from orders.models import DailySales, DailyVendorProductSales, Order
+from orders.rollups import DAILY_KEY, increment
+from products.models import Product
+from users.admin_views import AdminDashboardView
+from users.models import User, Vendor
+
+ORDER_TOTAL = Decimal('100.00')
+
+
+def add_orders_to_rollups(first, last, days, sign=1):
+    """Count orders ``first`` to ``last`` - 1, the nth placed ``n % days`` days ago, in the daily rollup."""
+    today = timezone.localdate()
+    placed = {}
+    for n in range(first, last):
+        day = (today - timedelta(days=n % days),)
+        placed[day] = placed.get(day, 0) + sign
+    increment(DailySales, DAILY_KEY, {
+        day: {'placed_orders': count, 'orders': count, 'revenue': count * ORDER_TOTAL}
+        for day, count in placed.items()
+    })
+
+
+class Command(BaseCommand):
+    help = (
+        'Grow the order history to each size, with its daily rollups, and time an uncached build of the '
+        'admin dashboard at that size, queries included.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000, 10000000])
+        parser.add_argument('--days', type=int, default=730, help='Days of history the orders are spread over.')
+        parser.add_argument('--products', type=int, default=500, help='Products selling on every day.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keep', action='store_true', help='Keep the generated rows after the run.')
+
+    def grow(self, user, tag, rows, size, days):
+        # Orders are inserted without signals, so their day's rollup is written here
+        while rows < size:
+            batch = min(10000, size - rows)
+            Order.objects.bulk_create([
+                Order(
+                    user=user, order_number=f'B{tag}{rows + i}', payment_method='card', payment_status='paid',
+                    subtotal=ORDER_TOTAL, total=ORDER_TOTAL,
+                )
+                for i in range(batch)
+            ])
+            add_orders_to_rollups(rows, rows + batch, days)
+            rows += batch
+        return rows
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(email=f'bench-dashboard-{tag}@example.com', name='Benchmark')
+        vendor = Vendor.objects.create(user=user, business_name='Bench Vendor', is_approved=True)
+        products = Product.objects.bulk_create([
+            Product(vendor=vendor, name=f'Bench {i}', slug=f'bench-{tag}-{i}', price=ORDER_TOTAL)
+            for i in range(options['products'])
+        ])
+        today = timezone.localdate()
+        for day in range(options['days']):
+            DailyVendorProductSales.objects.bulk_create([
+                DailyVendorProductSales(
+                    date=today - timedelta(days=day), vendor=vendor, product=product, units=i % 7 + 1,
+                    revenue=(i % 7 + 1) * ORDER_TOTAL,
+                )
+                for i, product in enumerate(products)
+            ])
+        view = AdminDashboardView()
+        rows = 0
+        try:
+            self.stdout.write(f"{'orders':>10}{'p50':>10}{'max':>10}{'queries':>9}")
+            for size in options['sizes']:
+                rows = self.grow(user, tag, rows, size, options['days'])
+                view.build_payload()  # warm the connection and query caches
+                timings = []
+                reset_queries()
+                with CaptureQueriesContext(connection) as queries:
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        view.build_payload()
+                        timings.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f'{rows:>10}{statistics.median(timings) * 1000:>8.2f}ms{max(timings) * 1000:>8.2f}ms'
+                    f'{len(queries) / options["repeat"]:>9.1f}'
+                )
+        finally:
+            if not options['keep']:
+                add_orders_to_rollups(0, rows, options['days'], sign=-1)
+                # Deleting through the ORM would load every order and count each one out again
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DELETE FROM {Order._meta.db_table} WHERE user_id = %s', [user.pk])
+                user.delete()
@@ -0,0 +1,82 @@
+import os
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from users.hashers import shutdown_pool
+from users.models import User
+
+# (label, hasher, PASSWORD_HASHING entry)
+COSTS = [
+    ('pbkdf2 600k', 'pbkdf2', {'iterations': 600000}),
+    ('scrypt n=2^14', 'scrypt', {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1}),
+    ('scrypt n=2^15', 'scrypt', {'work_factor': 2 ** 15, 'block_size': 8, 'parallelism': 1}),
+    ('argon2 t=1 m=47M', 'argon2', {'time_cost': 1, 'memory_cost': 47 * 1024, 'parallelism': 1}),
+    ('argon2 t=2 m=19M', 'argon2', {'time_cost': 2, 'memory_cost': 19 * 1024, 'parallelism': 1}),
+    ('argon2 t=3 m=12M', 'argon2', {'time_cost': 3, 'memory_cost': 12 * 1024, 'parallelism': 1}),
+    ('argon2 t=2 m=64M', 'argon2', {'time_cost': 2, 'memory_cost': 64 * 1024, 'parallelism': 1}),
+]
+HASHERS = {
+    'argon2': 'users.hashers.Argon2PasswordHasher',
+    'scrypt': 'users.hashers.ScryptPasswordHasher',
+    'pbkdf2': 'users.hashers.PBKDF2PasswordHasher',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Time password verification at each hasher and cost setting: logins per second per core, the '
+        'login endpoint end to end, and optionally concurrent verifications through the process pool.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument(
+            '--processes', type=int, default=0,
+            help='Also verify --concurrency passwords at once through a pool of this many processes.',
+        )
+        parser.add_argument('--concurrency', type=int, default=16)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{os.cpu_count()} CPUs')
+        self.stdout.write(f"{'setting':<18}{'verify':>10}{'logins/s/core':>15}{'login view':>12}{'pooled/s':>10}")
+        email = f'bench-hashing-{time.monotonic_ns()}@example.com'
+        try:
+            for label, name, costs in COSTS:
+                hashing = {**settings.PASSWORD_HASHING, name: costs, 'processes': 0}
+                with override_settings(PASSWORD_HASHERS=[HASHERS[name]], PASSWORD_HASHING=hashing):
+                    self.stdout.write(self.measure(label, email, hashing, options))
+        finally:
+            User.objects.filter(email=email).delete()
+
+    def measure(self, label, email, hashing, options):
+        encoded = make_password('correct horse battery')
+        verify = min(timeit.repeat(lambda: check_password('correct horse battery', encoded), number=1,
+                                   repeat=options['repeat'])) * 1000
+
+        User.objects.filter(email=email).delete()
+        User.objects.create_user(email=email, password='correct horse battery', name='Benchmark')
+        client = APIClient(HTTP_HOST='localhost')
+        body = {'email': email, 'password': 'correct horse battery'}
+        if client.post('/api/auth/login/', body, format='json').status_code != 200:
+            self.stderr.write(self.style.ERROR(f'{label}: login failed'))
+        login = min(timeit.repeat(lambda: client.post('/api/auth/login/', body, format='json'), number=1,
+                                  repeat=options['repeat'])) * 1000
+
+        pooled = ''
+        if options['processes']:
+            with override_settings(PASSWORD_HASHING={**hashing, 'processes': options['processes']}):
+                check_password('correct horse battery', encoded)  # start the workers
+                count = options['concurrency'] * 4
+                with ThreadPoolExecutor(options['concurrency']) as threads:
+                    started = time.perf_counter()
+                    list(threads.map(lambda _: check_password('correct horse battery', encoded), range(count)))
+                    pooled = f'{count / (time.perf_counter() - started):>10.1f}'
+                shutdown_pool()
+        return f'{label:<18}{verify:>8.1f}ms{1000 / verify:>15.1f}{login:>10.1f}ms{pooled}'
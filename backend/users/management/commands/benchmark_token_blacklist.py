@@ -0,0 +1,64 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+from users.blacklist import blacklist, current_bucket
+from users.models import BlacklistedToken, User
+from users.tokens import ClaimsRefreshToken, refresh_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        'Grow the refresh token blacklist to each size and time a refresh with rotation at that size, '
+        'queries included.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+        parser.add_argument('--refreshes', type=int, default=200)
+        parser.add_argument('--keep', action='store_true', help='Keep the blacklist rows after the run.')
+
+    def grow(self, rows, size):
+        # Spread over the buckets a 7-day refresh lifetime fills
+        today = current_bucket()
+        while rows < size:
+            batch = min(10000, size - rows)
+            BlacklistedToken.objects.bulk_create([
+                BlacklistedToken(jti=uuid.uuid4(), bucket=today + (rows + i) % 8) for i in range(batch)
+            ])
+            rows += batch
+        return rows
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(email=f'bench-blacklist-{time.monotonic_ns()}@example.com', name='Benchmark')
+        started_at = BlacklistedToken.objects.order_by('-created_at').values_list('created_at', flat=True).first()
+        rows = BlacklistedToken.objects.count()
+        try:
+            self.stdout.write(f"{'blacklisted':>12}{'refresh':>10}{'queries':>9}{'bloom':>10}")
+            for size in options['sizes']:
+                rows = self.grow(rows, size)
+                blacklist.clear()
+                tokens = [str(ClaimsRefreshToken.for_user(user)) for _ in range(options['refreshes'])]
+                refresh_tokens(tokens.pop())  # loads the filters
+                reset_queries()
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    for token in tokens:
+                        refresh_tokens(token)
+                    elapsed = time.perf_counter() - started
+                bloom = sum(len(bloom.bits) for bloom in blacklist.filters.values())
+                self.stdout.write(
+                    f'{rows:>12}{elapsed / len(tokens) * 1000:>8.2f}ms'
+                    f'{len(queries) / len(tokens):>9.1f}{bloom / 2 ** 20:>8.1f}MB'
+                )
+        finally:
+            if not options['keep']:
+                added = BlacklistedToken.objects.all()
+                if started_at is not None:
+                    added = added.filter(created_at__gt=started_at)
+                added.delete()
+                user.delete()
+            blacklist.clear()
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.blacklist import current_bucket
+from users.models import BlacklistedToken, TokenRevocation
+
+
+def purge(queryset, batch_size):
+    deleted = 0
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        deleted += queryset.model.objects.filter(pk__in=pks).delete()[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete blacklisted refresh tokens and token revocations that have expired. Meant to run on a '
+        'schedule, e.g. daily from cron; the tables only need what has not expired yet.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        tokens = purge(BlacklistedToken.objects.filter(bucket__lt=current_bucket()), batch_size)
+        revocations = purge(TokenRevocation.objects.filter(expires_at__lte=timezone.now()), batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {tokens} blacklisted tokens and {revocations} token revocations'
+        ))
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def copy_date_joined(apps, schema_editor):
+    # Existing profiles are dated from their user's sign-up rather than this migration
+    User = apps.get_model('users', 'User')
+    for model_name in ('Customer', 'Vendor'):
+        model = apps.get_model('users', model_name)
+        model.objects.update(
+            created_at=models.Subquery(User.objects.filter(pk=models.OuterRef('user_id')).values('date_joined')[:1])
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_date_joined, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['created_at', 'id'], name='customer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['created_at', 'id'], name='vendor_created_idx'),
+        ),
+    ]
@@ -1,8 +1,27 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # users.signals revokes tokens on save(); a bulk deactivation or role
+        # change revokes them here, for the users it changes
+        changed = models.Q()
+        if kwargs.get('is_active') is False:
+            changed |= models.Q(is_active=True)
+        if 'role' in kwargs:
+            changed |= ~models.Q(role=kwargs['role'])
+        if not changed:
+            return super().update(**kwargs)
+        from .revocation import revoke_users
+        with transaction.atomic(using=self.db):
+            user_ids = list(self.filter(changed).values_list('pk', flat=True))
+            updated = super().update(**kwargs)
+            if user_ids:
+                revoke_users(user_ids)
+        return updated
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError('The Email field must be set')
@@ -62,6 +81,14 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     def __str__(self):
         return self.email
+    
+    def refresh_from_db(self, using=None, fields=None):
+        # A user authenticated from token claims (users.authentication) has
+        # every other field deferred: the first one read loads them all
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred.issuperset(fields):
+            fields = deferred
+        super().refresh_from_db(using, fields)
 
 class Address(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='addresses')
@@ -87,6 +114,12 @@ class Vendor(models.Model):
     bank_account_number = models.CharField(max_length=20, blank=True, null=True)
     bank_ifsc = models.CharField(max_length=11, blank=True, null=True)
     is_approved = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='vendor_created_idx'),
+        ]
     
     def __str__(self):
         return self.business_name
@@ -94,6 +127,40 @@ class Vendor(models.Model):
 class Customer(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='customer_profile')
     date_of_birth = models.DateField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='customer_created_idx'),
+        ]
+    
+    def __str__(self):
+        return self.user.name
+
+class TokenRevocation(models.Model):
+    """
+    A revoked access token when ``jti`` is set, otherwise every token issued
+    to the user up to ``created_at``. Kept until ``expires_at``, when the
+    tokens it covers have expired anyway; see users.revocation. ``user_id``
+    is not a foreign key, so a deleted user's revocation outlives them.
+    """
+    user_id = models.BigIntegerField(db_index=True)
+    jti = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return self.jti or f"all tokens of user {self.user_id}"
+
+class BlacklistedToken(models.Model):
+    """
+    A refresh token that can no longer be used, by JTI. ``bucket`` is the
+    day the token expires (days since the epoch), so expired entries are
+    purged a whole bucket at a time; see users.blacklist.
+    """
+    jti = models.UUIDField(primary_key=True)
+    bucket = models.PositiveIntegerField(db_index=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
     
     def __str__(self):
-        return self.user.name
\ No newline at end of file
+        return self.jti.hex
@@ -0,0 +1,55 @@
+"""
+Fast read path for vendor lists: what VendorSerializer renders, built from
+``values_list`` rows. VendorProjectionTests keeps the two in step; change
+them together.
+"""
+from django.db.models import F
+
+from ecommerce.projections import file_url, timestamp
+from .models import Vendor
+
+COLUMNS = (
+    'id', 'created_at', 'business_name', 'business_description', 'logo', 'gst_number', 'pan_number',
+    'bank_account_name', 'bank_account_number', 'bank_ifsc', 'is_approved',
+    'user_id', 'email', 'user_name', 'phone', 'role', 'date_joined',
+)
+
+logo_storage = Vendor._meta.get_field('logo').storage
+
+
+def vendor_rows(queryset):
+    """``queryset`` as named rows for vendor_payloads, with the user joined; pageable like the vendors."""
+    return queryset.annotate(
+        email=F('user__email'),
+        user_name=F('user__name'),
+        phone=F('user__phone'),
+        role=F('user__role'),
+        date_joined=F('user__date_joined'),
+    ).values_list(*COLUMNS, named=True)
+
+
+def vendor_payloads(rows, request=None):
+    """``VendorSerializer(vendors, many=True).data`` for the vendors in ``rows``."""
+    return [
+        {
+            'id': row.id,
+            'user': {
+                'id': row.user_id,
+                'email': row.email,
+                'name': row.user_name,
+                'phone': row.phone,
+                'role': row.role,
+                'date_joined': timestamp(row.date_joined),
+            },
+            'business_name': row.business_name,
+            'business_description': row.business_description,
+            'logo': file_url(logo_storage, row.logo, request),
+            'gst_number': row.gst_number,
+            'pan_number': row.pan_number,
+            'bank_account_name': row.bank_account_name,
+            'bank_account_number': row.bank_account_number,
+            'bank_ifsc': row.bank_ifsc,
+            'is_approved': row.is_approved,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,143 @@
+"""
+Revoked tokens. Revocations are TokenRevocation rows; each process keeps
+the unexpired ones in memory and reads the new rows at most every
+JWT_REVOCATION_SYNC_INTERVAL seconds, so checking a token costs no query
+on most requests. A revocation takes effect at once in the process that
+made it and within the interval everywhere else.
+
+Tokens stand in for the per-request ``is_active`` check, so a user's tokens
+are revoked when they are deactivated, change role or are deleted: by
+users.signals on ``save()`` and ``delete()`` and by
+``User.objects.update()``. Writes that bypass these, such as raw SQL,
+leave the tokens valid until they expire.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import TokenRevocation
+
+# Each sync re-reads this far back, for rows committed after later ones
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class RevocationList:
+    """
+    Revoked JTIs, and per user the time up to which all their tokens are
+    revoked, both mapped to when the entry can be forgotten. Each holds at
+    most ``max_size`` entries, the least recently revoked going first; until
+    an evicted entry would have been forgotten, tokens not revoked in memory
+    are looked up in the table instead.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.jtis = OrderedDict()
+        self.users = OrderedDict()
+        self.lock = threading.Lock()
+        self.synced_at = None
+        self.sync_from = None
+        self.evicted_until = 0
+
+    def clear(self):
+        with self.lock:
+            self.jtis.clear()
+            self.users.clear()
+            self.synced_at = self.sync_from = None
+            self.evicted_until = 0
+
+    def remember(self, entries, key, value):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            _, evicted = entries.popitem(last=False)
+            expires = evicted[1] if entries is self.users else evicted
+            self.evicted_until = max(self.evicted_until, expires)
+
+    def add(self, jti, user_id, created_at, expires_at):
+        expires = expires_at.timestamp()
+        if jti:
+            self.remember(self.jtis, jti, expires)
+        else:
+            revoked_at, _ = self.users.get(user_id, (0, 0))
+            self.remember(self.users, user_id, (max(revoked_at, created_at.timestamp()), expires))
+
+    def prune(self, now):
+        for key in [key for key, expires in self.jtis.items() if expires <= now]:
+            del self.jtis[key]
+        for key in [key for key, (_, expires) in self.users.items() if expires <= now]:
+            del self.users[key]
+
+    def sync(self):
+        now = timezone.now()
+        rows = TokenRevocation.objects.filter(expires_at__gt=now)
+        if self.sync_from is not None:
+            rows = rows.filter(created_at__gte=self.sync_from)
+        for row in rows.order_by('created_at').values_list('jti', 'user_id', 'created_at', 'expires_at'):
+            self.add(*row)
+        self.prune(now.timestamp())
+        self.sync_from = now - SYNC_OVERLAP
+        self.synced_at = time.monotonic()
+
+    def is_revoked(self, token):
+        with self.lock:
+            if self.synced_at is None or time.monotonic() - self.synced_at >= settings.JWT_REVOCATION_SYNC_INTERVAL:
+                self.sync()
+            if token.get(api_settings.JTI_CLAIM) in self.jtis:
+                return True
+            revoked_at, _ = self.users.get(token.get(api_settings.USER_ID_CLAIM), (None, None))
+            if revoked_at is not None and token.get('iat', 0) <= revoked_at:
+                return True
+            evicted = time.time() < self.evicted_until
+        return evicted and self.is_revoked_in_table(token)
+
+    def is_revoked_in_table(self, token):
+        """is_revoked from the TokenRevocation rows alone, one query."""
+        issued_at = datetime.fromtimestamp(token.get('iat', 0), dt_timezone.utc)
+        return TokenRevocation.objects.filter(
+            Q(jti=token.get(api_settings.JTI_CLAIM))
+            | Q(jti='', user_id=token.get(api_settings.USER_ID_CLAIM), created_at__gte=issued_at),
+            expires_at__gt=timezone.now(),
+        ).exists()
+
+    def revoke(self, *rows):
+        rows = TokenRevocation.objects.bulk_create(rows)
+        with self.lock:
+            for row in rows:
+                self.add(row.jti, row.user_id, row.created_at, row.expires_at)
+
+
+revocations = RevocationList(settings.JWT_REVOCATION_CACHE_SIZE)
+
+
+def is_revoked(token):
+    return revocations.is_revoked(token)
+
+
+def revoke_token(token):
+    """Revoke the validated access token ``token`` until it expires."""
+    revocations.revoke(TokenRevocation(
+        jti=token[api_settings.JTI_CLAIM],
+        user_id=token[api_settings.USER_ID_CLAIM],
+        expires_at=datetime.fromtimestamp(token['exp'], dt_timezone.utc),
+    ))
+
+
+def revoke_user(user):
+    """Revoke every token issued to ``user`` so far, refresh tokens included."""
+    revoke_users([user.pk])
+
+
+def revoke_users(user_ids):
+    """revoke_user for each of ``user_ids``, in one insert."""
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    now = timezone.now()
+    revocations.revoke(*[
+        TokenRevocation(user_id=user_id, created_at=now, expires_at=now + lifetime) for user_id in user_ids
+    ])
@@ -62,3 +62,7 @@ class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField(required=True)
     password = serializers.CharField(required=True, write_only=True)
 
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=False)
+    all = serializers.BooleanField(default=False)
+
@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from orders.models import Order, OrderItem
+from .admin_views import DASHBOARD_CACHE_KEY
+from .models import User
+from .revocation import revoke_user
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_admin_dashboard(sender, **kwargs):
+    # After commit, so a concurrent request cannot re-cache the old state
+    transaction.on_commit(lambda: cache.delete(DASHBOARD_CACHE_KEY))
+
+
+@receiver(pre_save, sender=User)
+def revoke_stale_tokens(sender, instance, update_fields=None, **kwargs):
+    # Tokens carry the role and stand in for the is_active check, so they
+    # are revoked when either changes
+    if instance.pk is None or (update_fields is not None and not {'role', 'is_active'} & set(update_fields)):
+        return
+    if instance.get_deferred_fields() & {'role', 'is_active'}:
+        return
+    previous = User.objects.filter(pk=instance.pk).values('role', 'is_active').first()
+    if previous is None:
+        return
+    if previous['role'] != instance.role or (previous['is_active'] and not instance.is_active):
+        revoke_user(instance)
+
+
+@receiver(pre_delete, sender=User)
+def revoke_deleted_users_tokens(sender, instance, **kwargs):
+    # Kept after the user row is gone; see TokenRevocation
+    revoke_user(instance)
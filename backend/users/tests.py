@@ -1,3 +1,394 @@
-from django.test import TestCase
+import io
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from orders.models import DailyVendorProductSales, Order, OrderItem
+from products.models import Category, Product
+from .admin_views import DASHBOARD_TOP_PRODUCTS_DAYS
+from .blacklist import BloomFilter, blacklist, current_bucket
+from .hashers import shutdown_pool
+from .models import BlacklistedToken, Customer, TokenRevocation, User, Vendor
+from .projections import vendor_payloads, vendor_rows
+from .revocation import revocations
+from .serializers import VendorSerializer
+from .tokens import ClaimsRefreshToken
+
+
+class AdminDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email='admin@example.com', password='pass12345', name='Admin', role='admin')
+        vendor_user = User.objects.create_user(email='vendor@example.com', password='pass12345', name='Vendor', role='vendor')
+        cls.vendor = Vendor.objects.create(user=vendor_user, business_name='Spice World')
+        cls.customer = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+        Customer.objects.create(user=cls.customer)
+        spices = Category.objects.create(name='Spices', slug='spices')
+        cls.products = [
+            Product.objects.create(vendor=cls.vendor, category=spices, name=f'Product {i}', slug=f'product-{i}', price=10)
+            for i in range(6)
+        ]
+        with cls.captureOnCommitCallbacks(execute=True):
+            for i, product in enumerate(cls.products):
+                cls.make_order(product, quantity=i + 1, payment_status='paid' if i % 2 else 'pending')
+
+    @classmethod
+    def make_order(cls, product, quantity, payment_status='paid'):
+        total = Decimal(10 * quantity)
+        order = Order.objects.create(
+            user=cls.customer, order_number=f'ORD{Order.objects.count()}', payment_method='cod',
+            payment_status=payment_status, subtotal=total, total=total,
+        )
+        OrderItem.objects.create(order=order, product=product, vendor=cls.vendor, quantity=quantity, price=10, total=total)
+        return order
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_payload(self):
+        data = self.client.get('/api/admin/dashboard/').data
+        self.assertEqual(data['totalOrders'], 6)
+        self.assertEqual(data['totalSales'], Decimal('120'))
+        self.assertEqual(data['totalProducts'], 6)
+        self.assertEqual((data['totalCustomers'], data['totalVendors']), (1, 1))
+        self.assertEqual(len(data['recentOrders']), 5)
+        self.assertEqual(data['recentOrders'][0]['customer']['email'], 'customer@example.com')
+
+        # Paid sales only
+        top = data['topProducts']
+        self.assertEqual([p['unitsSold'] for p in top], [6, 4, 2])
+        self.assertEqual([p['revenue'] for p in top], [Decimal('60'), Decimal('40'), Decimal('20')])
+        self.assertEqual(top[0]['vendor']['name'], 'Spice World')
+        self.assertEqual(top[0]['category'], 'Spices')
+        self.assertEqual(sum(month['total'] for month in data['salesByMonth']), Decimal('120'))
+
+    def test_query_count_is_fixed_and_payload_is_cached(self):
+        # rollup totals, recent orders, top products, their details, sales by month, 3 counts
+        with self.assertNumQueries(8):
+            self.client.get('/api/admin/dashboard/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/admin/dashboard/')
+
+    def test_order_changes_invalidate_cache(self):
+        self.client.get('/api/admin/dashboard/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_order(self.products[0], quantity=10)
+        data = self.client.get('/api/admin/dashboard/').data
+        self.assertEqual(data['totalOrders'], 7)
+        self.assertEqual(data['topProducts'][0]['unitsSold'], 10)
+
+    def test_old_sales_leave_the_top_products(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_order(self.products[0], quantity=1)
+        # Rollups of sales made before the window
+        DailyVendorProductSales.objects.update(date=timezone.localdate() - timedelta(days=DASHBOARD_TOP_PRODUCTS_DAYS))
+        data = self.client.get('/api/admin/dashboard/').data
+        self.assertEqual(data['topProducts'], [])
+        self.assertEqual((data['totalOrders'], data['totalSales']), (7, Decimal('130')))
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/admin/dashboard/').status_code, 403)
+
+
+class AdminListPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email='admin@example.com', password='pass12345', name='Admin', role='admin')
+        for i in range(5):
+            user = User.objects.create_user(email=f'vendor{i}@example.com', password='pass12345', name=f'Vendor {i}', role='vendor')
+            Vendor.objects.create(user=user, business_name=f'Vendor {i}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_vendors_are_paged_newest_first(self):
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/admin/vendors/', {'page_size': 2}).data
+        self.assertEqual([vendor['business_name'] for vendor in data['results']], ['Vendor 4', 'Vendor 3'])
+        self.assertIsNone(data['previous'])
+
+        data = self.client.get(data['next']).data
+        self.assertEqual([vendor['business_name'] for vendor in data['results']], ['Vendor 2', 'Vendor 1'])
+        data = self.client.get(data['next']).data
+        self.assertEqual([vendor['business_name'] for vendor in data['results']], ['Vendor 0'])
+        self.assertIsNone(data['next'])
+
+
+class VendorProjectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            email='vendor@example.com', password='pass12345', name='Vendor', role='vendor', phone='9999999999'
+        )
+        Vendor.objects.create(
+            user=user, business_name='Spice World', business_description='Spices', logo='vendor_logos/spice.png',
+            gst_number='27AAAAA0000A1Z5', is_approved=True,
+        )
+        user = User.objects.create_user(email='new@example.com', password='pass12345', name='Newcomer', role='vendor')
+        Vendor.objects.create(user=user, business_name='Newcomer')
+
+    def test_matches_serializer(self):
+        queryset = Vendor.objects.order_by('-created_at', '-id')
+        for request in (None, APIRequestFactory().get('/api/admin/vendors/')):
+            context = {'request': request} if request else {}
+            expected = VendorSerializer(queryset.select_related('user'), many=True, context=context).data
+            self.assertEqual(
+                JSONRenderer().render(vendor_payloads(vendor_rows(queryset), request)),
+                JSONRenderer().render(expected),
+            )
+
+
+@override_settings(JWT_REVOCATION_SYNC_INTERVAL=3600)
+class ClaimsAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email='admin@example.com', password='pass12345', name='Admin', role='admin')
+        cls.vendor_user = User.objects.create_user(
+            email='vendor@example.com', password='pass12345', name='Vendor', role='vendor'
+        )
+        cls.vendor = Vendor.objects.create(user=cls.vendor_user, business_name='Spice World')
+
+    def setUp(self):
+        # The revocation list lives for the process, these rows only for the test
+        revocations.clear()
+        self.client = APIClient()
+
+    def login(self, email):
+        response = self.client.post('/api/auth/login/', {'email': email, 'password': 'pass12345'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return response.data['access']
+
+    def test_access_token_carries_claims(self):
+        token = ClaimsRefreshToken.for_user(self.vendor_user).access_token
+        self.assertEqual(
+            (token['role'], token['vendor_id'], token['customer_id']), ('vendor', self.vendor.pk, None)
+        )
+
+    def test_authorizes_without_loading_the_user(self):
+        self.login('admin@example.com')
+        self.client.get('/api/admin/vendors/')
+        # Only the vendor page; before, the user row was loaded first
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/admin/vendors/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_fields_load_together(self):
+        self.login('vendor@example.com')
+        self.client.get('/api/auth/me/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/auth/me/')
+        self.assertEqual((response.data['email'], response.data['name']), ('vendor@example.com', 'Vendor'))
+
+    def test_tokens_without_claims_still_work(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.admin).access_token}')
+        self.assertEqual(self.client.get('/api/admin/vendors/').status_code, 200)
+
+    def test_logout_revokes_the_token(self):
+        self.login('admin@example.com')
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 204)
+        self.assertEqual(self.client.get('/api/admin/vendors/').status_code, 401)
+
+    def test_deactivating_or_demoting_revokes_tokens(self):
+        self.login('vendor@example.com')
+        self.vendor_user.is_active = False
+        self.vendor_user.save()
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, 401)
+
+        revocations.clear()
+        TokenRevocation.objects.all().delete()
+        self.login('admin@example.com')
+        self.admin.role = 'customer'
+        self.admin.save(update_fields=['role'])
+        self.assertEqual(self.client.get('/api/admin/vendors/').status_code, 401)
+
+    def test_bulk_updates_revoke_tokens(self):
+        self.login('vendor@example.com')
+        User.objects.filter(role='vendor').update(name='Renamed')
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, 200)
+        User.objects.filter(role='vendor').update(is_active=False)
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, 401)
+        # Only the users the update changed
+        self.assertEqual(list(TokenRevocation.objects.values_list('user_id', flat=True)), [self.vendor_user.pk])
+
+        self.client.credentials()
+        self.login('admin@example.com')
+        User.objects.filter(pk=self.admin.pk).update(role='customer')
+        self.assertEqual(self.client.get('/api/admin/vendors/').status_code, 401)
+
+    def test_revocations_evicted_from_memory_are_still_refused(self):
+        users = [
+            User.objects.create_user(email=f'vendor{n}@example.com', password='pass12345', name='Vendor', role='vendor')
+            for n in range(5)
+        ]
+        tokens = [str(ClaimsRefreshToken.for_user(user).access_token) for user in users]
+        with mock.patch.object(revocations, 'max_size', 3):
+            User.objects.filter(pk__in=[user.pk for user in users]).update(is_active=False)
+            self.assertEqual(len(revocations.users), 3)
+            for token in tokens:
+                self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+                self.assertEqual(self.client.get('/api/auth/me/').status_code, 401)
+
+    def test_deleting_a_user_revokes_their_tokens(self):
+        self.login('admin@example.com')
+        admin_id = self.admin.pk
+        self.admin.delete()
+        self.assertEqual(self.client.get('/api/admin/dashboard/').status_code, 401)
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, 401)
+        # In other processes, once they sync
+        revocations.clear()
+        self.assertEqual(self.client.get('/api/admin/dashboard/').status_code, 401)
+        self.assertTrue(TokenRevocation.objects.filter(user_id=admin_id).exists())
+
+    def test_profiles_are_found_by_claim(self):
+        self.login('vendor@example.com')
+        self.client.get('/api/auth/vendor-profile/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/auth/vendor-profile/')
+        self.assertEqual(response.data['business_name'], 'Spice World')
+        self.assertEqual(self.client.get('/api/auth/customer-profile/').status_code, 404)
+
+    def test_revocations_from_other_processes_apply_after_sync(self):
+        access = self.login('admin@example.com')
+        self.client.get('/api/admin/vendors/')
+        jti = AccessToken(access)['jti']
+        TokenRevocation.objects.create(user_id=self.admin.pk, jti=jti, expires_at=timezone.now() + timedelta(hours=1))
+        self.assertEqual(self.client.get('/api/admin/vendors/').status_code, 200)
+        with override_settings(JWT_REVOCATION_SYNC_INTERVAL=0):
+            self.assertEqual(self.client.get('/api/admin/vendors/').status_code, 401)
+
+
+def hashing(**costs):
+    return {**settings.PASSWORD_HASHING, **costs}
+
+
+class PasswordHashingTests(TestCase):
+    def login(self, password='pass12345'):
+        return APIClient().post('/api/auth/login/', {'email': 'customer@example.com', 'password': password}, format='json')
+
+    def test_login_upgrades_hashes_from_other_hashers(self):
+        user = User.objects.create(
+            email='customer@example.com', name='Customer', password=make_password('pass12345', hasher='pbkdf2_sha256'),
+        )
+        self.assertEqual(self.login().status_code, 200)
+        user.refresh_from_db()
+        self.assertEqual(identify_hasher(user.password).algorithm, settings.PASSWORD_HASHER)
+        self.assertTrue(user.check_password('pass12345'))
+
+    @override_settings(PASSWORD_HASHERS=['users.hashers.Argon2PasswordHasher'])
+    def test_login_rehashes_when_costs_change(self):
+        user = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+        stored = user.password
+        self.login()
+        user.refresh_from_db()
+        self.assertEqual(user.password, stored)
+
+        with self.settings(PASSWORD_HASHING=hashing(argon2={'time_cost': 3, 'memory_cost': 8 * 1024, 'parallelism': 1})):
+            self.assertEqual(self.login('wrong-password').status_code, 401)
+            user.refresh_from_db()
+            self.assertEqual(user.password, stored)
+            self.assertEqual(self.login().status_code, 200)
+            user.refresh_from_db()
+        self.assertIn('$m=8192,t=3,p=1$', user.password)
+
+    @override_settings(PASSWORD_HASHERS=['users.hashers.ScryptPasswordHasher'])
+    def test_scrypt_costs(self):
+        with self.settings(PASSWORD_HASHING=hashing(scrypt={'work_factor': 2 ** 15, 'block_size': 8, 'parallelism': 1})):
+            encoded = make_password('pass12345')
+        self.assertTrue(encoded.startswith('scrypt$32768$'))
+        self.assertTrue(check_password('pass12345', encoded))
+
+    @override_settings(PASSWORD_HASHING=hashing(processes=1))
+    def test_hashes_in_worker_processes(self):
+        self.addCleanup(shutdown_pool)
+        encoded = make_password('pass12345')
+        self.assertTrue(check_password('pass12345', encoded))
+        self.assertFalse(check_password('pass54321', encoded))
+
+
+@override_settings(JWT_REVOCATION_SYNC_INTERVAL=3600)
+class RefreshTokenBlacklistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='customer@example.com', password='pass12345', name='Customer')
+
+    def setUp(self):
+        revocations.clear()
+        blacklist.clear()
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/refresh/', {'refresh': token}, format='json')
+
+    def test_rotation_blacklists_the_used_token(self):
+        first = str(ClaimsRefreshToken.for_user(self.user))
+        response = self.refresh(first)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'customer')
+        self.assertEqual(self.refresh(response.data['refresh']).status_code, 200)
+        self.assertEqual(self.refresh(first).status_code, 401)
+
+    def test_unused_tokens_are_not_looked_up(self):
+        token = ClaimsRefreshToken.for_user(self.user)
+        blacklist.contains(token)
+        with self.assertNumQueries(0):
+            self.assertFalse(blacklist.contains(token))
+
+    def test_other_processes_entries_apply_after_sync(self):
+        token = ClaimsRefreshToken.for_user(self.user)
+        self.assertFalse(blacklist.contains(token))
+        BlacklistedToken.objects.create(jti=uuid.UUID(token['jti']), bucket=token['exp'] // 86400)
+        with self.settings(JWT_REVOCATION_SYNC_INTERVAL=0):
+            self.assertTrue(blacklist.contains(token))
+        self.assertEqual(self.refresh(str(token)).status_code, 401)
+
+    def test_logout_blacklists_the_refresh_token(self):
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.client.post('/api/auth/logout/', {'refresh': str(refresh)}, format='json')
+        self.assertEqual(self.refresh(str(refresh)).status_code, 401)
+
+    def test_non_object_bodies_are_rejected(self):
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.assertEqual(self.client.post('/api/auth/logout/', [str(refresh)], format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/auth/refresh/', [str(refresh)], format='json').status_code, 400)
+        self.assertEqual(self.refresh(str(refresh)).status_code, 200)
+
+    def test_revoked_users_cannot_refresh(self):
+        refresh = str(ClaimsRefreshToken.for_user(self.user))
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.refresh(refresh).status_code, 401)
+
+    def test_purge_drops_expired_buckets(self):
+        today = current_bucket()
+        for day in (today - 2, today - 1, today, today + 6):
+            BlacklistedToken.objects.create(jti=uuid.uuid4(), bucket=day)
+        TokenRevocation.objects.create(user_id=self.user.pk, expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('purge_token_blacklist', batch_size=1, stdout=io.StringIO())
+        self.assertEqual(sorted(BlacklistedToken.objects.values_list('bucket', flat=True)), [today, today + 6])
+        self.assertFalse(TokenRevocation.objects.exists())
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000)
+        added = [uuid.uuid4().hex for _ in range(1000)]
+        for key in added:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in added))
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
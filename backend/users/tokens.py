@@ -0,0 +1,55 @@
+"""
+JWTs that carry what most requests need to know about their user, so
+users.authentication can authorize them without loading the user row.
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import blacklist
+from .models import Customer, Vendor
+from .revocation import is_revoked
+
+CLAIMS = ('role', 'vendor_id', 'customer_id')
+
+
+def user_claims(user):
+    return {
+        'role': user.role,
+        'vendor_id': Vendor.objects.filter(user=user).values_list('pk', flat=True).first(),
+        'customer_id': Customer.objects.filter(user=user).values_list('pk', flat=True).first(),
+    }
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """A refresh token with the user's CLAIMS, which its access tokens copy."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim, value in user_claims(user).items():
+            token[claim] = value
+        return token
+
+
+def refresh_tokens(raw):
+    """
+    A new access token for the refresh token ``raw`` and, with
+    ROTATE_REFRESH_TOKENS, a refresh token to use next time instead of
+    ``raw``, which BLACKLIST_AFTER_ROTATION blacklists. Raises TokenError
+    for a refresh token that is invalid, expired, revoked or blacklisted.
+    """
+    refresh = ClaimsRefreshToken(raw)
+    if is_revoked(refresh) or blacklist.contains(refresh):
+        raise TokenError(_('Token is blacklisted'))
+    data = {'access': str(refresh.access_token)}
+    if api_settings.ROTATE_REFRESH_TOKENS:
+        # Decided by the insert, so two requests racing with one token cannot both win
+        if api_settings.BLACKLIST_AFTER_ROTATION and not blacklist.add(refresh):
+            raise TokenError(_('Token is blacklisted'))
+        refresh.set_jti()
+        refresh.set_exp()
+        refresh.set_iat()
+        data['refresh'] = str(refresh)
+    return data
@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import RegisterView, LoginView, UserProfileView, AddressListCreateView, AddressDetailView, VendorProfileView, CustomerProfileView
+from .views import RegisterView, LoginView, RefreshView, LogoutView, UserProfileView, AddressListCreateView, AddressDetailView, VendorProfileView, CustomerProfileView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('refresh/', RefreshView.as_view(), name='token_refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('me/', UserProfileView.as_view(), name='user_profile'),
     path('addresses/', AddressListCreateView.as_view(), name='address_list'),
     path('addresses/<int:pk>/', AddressDetailView.as_view(), name='address_detail'),
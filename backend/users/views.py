@@ -2,13 +2,18 @@ from rest_framework import status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import RetrieveUpdateAPIView, ListCreateAPIView, RetrieveUpdateDestroyAPIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
+from django.shortcuts import get_object_or_404
+from rest_framework_simplejwt.exceptions import TokenError
+from cart.operations import merge_anonymous_cart, request_cart_token
 from .models import User, Address, Vendor, Customer
+from .revocation import revoke_token, revoke_user
 from .serializers import (
     UserSerializer, AddressSerializer, VendorSerializer, CustomerSerializer,
-    RegisterSerializer, LoginSerializer
+    RegisterSerializer, LoginSerializer, LogoutSerializer
 )
+from .blacklist import blacklist
+from .tokens import ClaimsRefreshToken, refresh_tokens
 
 class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -18,7 +23,7 @@ class RegisterView(APIView):
         if serializer.is_valid():
             user = serializer.save()
             
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsRefreshToken.for_user(user)
             
             return Response({
                 'user': UserSerializer(user).data,
@@ -40,7 +45,9 @@ class LoginView(APIView):
             user = authenticate(email=email, password=password)
             
             if user:
-                refresh = RefreshToken.for_user(user)
+                refresh = ClaimsRefreshToken.for_user(user)
+                # Carry over what the visitor put in their cart before signing in
+                merge_anonymous_cart(user, request_cart_token(request))
                 
                 return Response({
                     'user': UserSerializer(user).data,
@@ -52,6 +59,35 @@ class LoginView(APIView):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class RefreshView(APIView):
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({'detail': 'Expected an object.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            return Response(refresh_tokens(request.data.get('refresh', '')))
+        except TokenError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+class LogoutView(APIView):
+    def post(self, request):
+        serializer = LogoutSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        # request.auth is the validated access token; "all" signs out every session
+        if serializer.validated_data['all']:
+            revoke_user(request.user)
+        else:
+            revoke_token(request.auth)
+            try:
+                blacklist.add(ClaimsRefreshToken(serializer.validated_data['refresh']))
+            except (KeyError, TokenError):
+                pass
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class UserProfileView(RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     
@@ -84,15 +120,21 @@ class AddressDetailView(RetrieveUpdateDestroyAPIView):
         
         serializer.save()
 
+def profile(model, user, claim):
+    # By the id in the token's claims (users.authentication), else by user
+    pk = getattr(user, claim, None)
+    profiles = model.objects.select_related('user')
+    return get_object_or_404(profiles, pk=pk) if pk is not None else get_object_or_404(profiles, user=user)
+
 class VendorProfileView(RetrieveUpdateAPIView):
     serializer_class = VendorSerializer
     
     def get_object(self):
-        return Vendor.objects.get(user=self.request.user)
+        return profile(Vendor, self.request.user, 'vendor_id')
 
 class CustomerProfileView(RetrieveUpdateAPIView):
     serializer_class = CustomerSerializer
     
     def get_object(self):
-        return Customer.objects.get(user=self.request.user)
+        return profile(Customer, self.request.user, 'customer_id')
 